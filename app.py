@@ -1,11 +1,32 @@
 import streamlit as st
-import fitz  # PyMuPDF
-import pypdf
-from io import BytesIO
-import base64
-from PIL import Image
+from streamlit.errors import StreamlitAPIException
+import importlib
+import os
 import time
-import re
+import uuid
+
+import blob_store
+import doc_cache
+import instrumentation
+import jobs
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access.
+
+    Kept out of sys.modules on purpose: Streamlit's file watcher reads an
+    attribute of every loaded module, which would trigger the import.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+# PyMuPDF, pypdf and Pillow take most of a cold start and the home page needs
+# none of them, so the modules built on them load when a tool first does
+pdf_engine = LazyModule("pdf_engine")
+previews = LazyModule("previews")
 
 # ============================================================================
 # PAGE CONFIGURATION
@@ -20,618 +41,493 @@ st.set_page_config(
 # ============================================================================
 # PROFESSIONAL UI STYLING (Inspired by LightPDF)
 # ============================================================================
-def load_css():
-    st.markdown("""
-    <style>
-        @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap');
-
-        * {
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-        }
-
-        /* Hide Streamlit elements */
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        header {visibility: hidden;}
-        .stDeployButton {display: none;}
-
-        /* Professional Color Palette */
-        :root {
-            --primary-blue: #4A90E2;
-            --primary-green: #7ED321;
-            --primary-orange: #F5A623;
-            --primary-red: #D0021B;
-            --primary-purple: #9013FE;
-            --light-blue: #E3F2FD;
-            --light-green: #E8F5E8;
-            --light-orange: #FFF8E1;
-            --light-red: #FFEBEE;
-            --light-purple: #F3E5F5;
-            --dark-text: #2C3E50;
-            --medium-text: #5D6D7E;
-            --light-text: #85929E;
-            --border-color: #E8EAED;
-            --hover-shadow: 0 8px 25px rgba(0,0,0,0.15);
-        }
-
-        /* Main App Background */
-        .stApp {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-        }
-
-        /* Header Section */
-        .main-header {
-            background: rgba(255, 255, 255, 0.98);
-            backdrop-filter: blur(20px);
-            margin: -70px -1rem 30px -1rem;
-            padding: 20px 0;
-            box-shadow: 0 2px 20px rgba(0, 0, 0, 0.1);
-            border-bottom: 1px solid var(--border-color);
-        }
-
-        .header-content {
-            max-width: 1400px;
-            margin: 0 auto;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            padding: 0 30px;
-        }
-
-        .logo-section {
-            text-align: center;
-        }
-
-        .logo {
-            font-size: 32px;
-            font-weight: 800;
-            color: var(--primary-blue);
-            margin-bottom: 5px;
-        }
-
-        .tagline {
-            font-size: 14px;
-            color: var(--medium-text);
-            font-weight: 600;
-        }
-
-        /* Main Container */
-        .main-container {
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 20px;
-        }
-
-        /* Tool Grid Layout (LightPDF Style) */
-        .tools-grid {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(280px, 1fr));
-            gap: 20px;
-            margin: 30px 0;
-        }
-
-        .tool-card {
-            background: white;
-            border-radius: 16px;
-            padding: 30px;
-            text-align: center;
-            border: 2px solid transparent;
-            transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
-            cursor: pointer;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
-        }
-
-        .tool-card:hover {
-            transform: translateY(-5px);
-            box-shadow: var(--hover-shadow);
-            border-color: var(--primary-blue);
-        }
-
-        .tool-card.pdf-merge {
-            background: linear-gradient(135deg, var(--light-blue), white);
-        }
-
-        .tool-card.page-remove {
-            background: linear-gradient(135deg, var(--light-red), white);
-        }
-
-        .tool-card.pdf-split {
-            background: linear-gradient(135deg, var(--light-green), white);
-        }
-
-        .tool-icon {
-            font-size: 48px;
-            margin-bottom: 20px;
-            display: block;
-        }
-
-        .tool-title {
-            font-size: 20px;
-            font-weight: 700;
-            color: var(--dark-text);
-            margin-bottom: 10px;
-        }
-
-        .tool-description {
-            font-size: 14px;
-            color: var(--medium-text);
-            line-height: 1.5;
-        }
-
-        /* Workflow Container */
-        .workflow-container {
-            background: white;
-            border-radius: 20px;
-            padding: 40px;
-            margin: 30px auto;
-            max-width: 1200px;
-            box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
-        }
-
-        /* Step Cards */
-        .step-card {
-            background: white;
-            border: 2px solid var(--border-color);
-            border-radius: 16px;
-            padding: 25px;
-            margin: 20px 0;
-            transition: all 0.3s ease;
-        }
-
-        .step-card.active {
-            border-color: var(--primary-blue);
-            box-shadow: 0 0 0 3px rgba(74, 144, 226, 0.1);
-        }
-
-        .step-card.completed {
-            border-color: var(--primary-green);
-            background: linear-gradient(135deg, var(--light-green), white);
-        }
-
-        .step-header {
-            display: flex;
-            align-items: center;
-            gap: 15px;
-            margin-bottom: 20px;
-        }
-
-        .step-number {
-            width: 40px;
-            height: 40px;
-            border-radius: 50%;
-            background: var(--primary-blue);
-            color: white;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-weight: 700;
-            font-size: 18px;
-        }
-
-        .step-number.completed {
-            background: var(--primary-green);
-        }
-
-        .step-title {
-            font-size: 20px;
-            font-weight: 700;
-            color: var(--dark-text);
-        }
-
-        /* Upload Zone */
-        .upload-zone {
-            border: 3px dashed var(--primary-blue);
-            border-radius: 16px;
-            padding: 40px;
-            text-align: center;
-            background: linear-gradient(135deg, var(--light-blue), rgba(255, 255, 255, 0.8));
-            margin: 20px 0;
-            transition: all 0.3s ease;
-        }
-
-        .upload-zone:hover {
-            border-color: var(--primary-purple);
-            background: linear-gradient(135deg, var(--light-purple), rgba(255, 255, 255, 0.8));
-            transform: scale(1.02);
-        }
-
-        .upload-icon {
-            font-size: 60px;
-            color: var(--primary-blue);
-            margin-bottom: 15px;
-        }
-
-        .upload-text {
-            font-size: 20px;
-            font-weight: 700;
-            color: var(--dark-text);
-            margin-bottom: 8px;
-        }
-
-        .upload-subtext {
-            font-size: 14px;
-            color: var(--medium-text);
-        }
-
-        /* File Info Cards */
-        .file-info-card {
-            background: linear-gradient(135deg, var(--light-blue), white);
-            border: 1px solid var(--border-color);
-            border-radius: 12px;
-            padding: 20px;
-            margin: 15px 0;
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            transition: all 0.3s ease;
-        }
-
-        .file-info-card:hover {
-            transform: translateX(5px);
-            box-shadow: 0 4px 15px rgba(0, 0, 0, 0.1);
-        }
-
-        .file-details {
-            display: flex;
-            align-items: center;
-            gap: 15px;
-        }
-
-        .file-icon {
-            font-size: 32px;
-            color: var(--primary-red);
-        }
-
-        .file-text {
-            display: flex;
-            flex-direction: column;
-        }
+# The stylesheet lives in static/styles.css. Where Streamlit serves it as
+# CSS, reruns send only a <link> and the browser fetches the file once;
+# otherwise it is sent inline, read from disk once per server process.
+STYLESHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "styles.css")
+STYLESHEET_URL = "app/static/styles.css"
+
+def static_css_served():
+    """Whether this Streamlit serves static .css files with a CSS content type"""
+    try:
+        # Tornado-based releases send unlisted types as text/plain with nosniff,
+        # which browsers refuse to apply as a stylesheet
+        from streamlit.web.server.app_static_file_handler import SAFE_APP_STATIC_FILE_EXTENSIONS
+    except ImportError:
+        return True
+    return ".css" in SAFE_APP_STATIC_FILE_EXTENSIONS
+
+@st.cache_resource
+def stylesheet_markup():
+    """A <link> to the served stylesheet, or the stylesheet inline"""
+    if st.get_option("server.enableStaticServing") and static_css_served():
+        # The modification time busts browser caches when the file changes
+        return f'<link rel="stylesheet" href="{STYLESHEET_URL}?v={int(os.path.getmtime(STYLESHEET))}">'
+    with open(STYLESHEET, encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-        .file-name {
-            font-weight: 700;
-            color: var(--dark-text);
-            font-size: 16px;
-        }
+def load_css():
+    st.markdown(stylesheet_markup(), unsafe_allow_html=True)
 
-        .file-stats {
-            font-size: 12px;
-            color: var(--medium-text);
-        }
+# ============================================================================
+# UTILITY FUNCTIONS
+# ============================================================================
 
-        /* Modern Tabs */
-        .stTabs [data-baseweb="tab-list"] {
-            background: white;
-            border-radius: 12px;
-            padding: 8px;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-            gap: 8px;
-        }
+# Seconds between progress refreshes while a background merge runs
+JOB_POLL_INTERVAL = 0.5
 
-        .stTabs [data-baseweb="tab"] {
-            background: transparent;
-            border-radius: 8px;
-            color: var(--medium-text);
-            font-weight: 600;
-            padding: 12px 20px;
-            border: none;
-            transition: all 0.3s ease;
-        }
+# Thumbnails shown per preview screen
+PREVIEW_PAGE_SIZE = 8
+PREVIEW_COLUMNS = 4
 
-        .stTabs [aria-selected="true"] {
-            background: linear-gradient(135deg, var(--primary-blue), var(--primary-purple)) !important;
-            color: white !important;
-            box-shadow: 0 4px 15px rgba(74, 144, 226, 0.3);
-        }
+# Ways of splitting a PDF offered by the splitter
+SPLIT_BY_COUNT = "Every N pages"
+SPLIT_BY_RANGES = "Page ranges"
+SPLIT_BY_BOOKMARKS = "Bookmarks"
 
-        .stTabs [data-baseweb="tab"]:hover {
-            background: var(--light-blue);
-            color: var(--primary-blue);
-        }
+# Show per-stage timings and cache counters below the workflow
+DEBUG_PANEL = os.environ.get("PDF_DEBUG_PANEL", "0") == "1"
 
-        /* Insertion Point Selector */
-        .insertion-point {
-            background: white;
-            border: 2px solid var(--border-color);
-            border-radius: 12px;
-            padding: 20px;
-            margin: 15px 0;
-        }
+# Profiles kept per session for the debug panel
+PROFILE_HISTORY = 10
 
-        .insertion-point.active {
-            border-color: var(--primary-orange);
-            background: linear-gradient(135deg, var(--light-orange), white);
-        }
+# A fragment reruns only its own function when one of its widgets changes
+# (st.fragment from Streamlit 1.37, st.experimental_fragment from 1.33);
+# older releases rerun the whole script as before
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+fragment = _fragment or (lambda fn: fn)
 
-        .insertion-header {
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            margin-bottom: 15px;
-        }
+def poll_by_rerunning(fn):
+    """Without fragments, a progress area polls by rerunning the whole script"""
+    def poll(*args):
+        fn(*args)
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+    return poll
+
+# A progress area redraws on its own timer rather than rerunning the page
+polling_fragment = _fragment(run_every=JOB_POLL_INTERVAL) if _fragment else poll_by_rerunning
+
+def session_id():
+    """Identifier of this browser session in the upload store"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def to_source(pdf_info):
+    """Engine view of an uploaded PDF held in session state"""
+    handle = pdf_info['handle']
+    return pdf_engine.PdfSource(
+        name=pdf_info['name'],
+        data=blob_store.upload_store.open_mmap(handle),
+        page_count=pdf_info.get('pages'),
+        digest=handle.digest,
+        path=handle.path,
+    )
 
-        .insertion-title {
-            font-weight: 700;
-            color: var(--dark-text);
-            font-size: 16px;
-        }
+def store_upload(uploaded_file):
+    """Move an upload into the blob store; session state keeps only the handle"""
+    with instrumentation.Profile("upload", session=session_id()) as profile:
+        try:
+            with profile.stage("Storing upload"):
+                handle = blob_store.upload_store.put(session_id(), uploaded_file.name, uploaded_file)
+        except blob_store.QuotaExceeded as e:
+            st.error(f"❌ {e}")
+            return None
+        finally:
+            uploaded_file.seek(0)
+
+        pdf_info = {'name': uploaded_file.name, 'handle': handle}
+        with profile.stage("Reading document info"):
+            pdf_info.update(get_pdf_info(to_source(pdf_info)))
+    remember_profile(profile.log(size=handle.size, pages=pdf_info['pages']))
+    return pdf_info
+
+def release_upload(pdf_info):
+    """Delete an upload's blob unless another PDF in the session shares it"""
+    others = [st.session_state.mother_pdf] + st.session_state.insertions
+    digest = pdf_info['handle'].digest
+    if sum(1 for other in others if other and other['handle'].digest == digest) <= 1:
+        blob_store.upload_store.release(pdf_info['handle'])
+
+def uploads_available():
+    """False once the session's uploads were swept after sitting idle"""
+    uploads = [st.session_state.mother_pdf, st.session_state.get('split_pdf'),
+               st.session_state.get('remove_pdf')] + st.session_state.insertions
+    return all(blob_store.upload_store.exists(info['handle']) for info in uploads if info)
+
+def safe_pdf_to_images(pdf_info, page_indices, zoom=None):
+    """Safely render pages of an uploaded PDF, yielding (page index, image) pairs"""
+    try:
+        yield from previews.render_thumbnails(to_source(pdf_info), page_indices, zoom or previews.THUMBNAIL_ZOOM)
+    except (pdf_engine.PdfEngineError, blob_store.BlobNotFound) as e:
+        st.error(f"Error processing {pdf_info['name']}: {str(e)}")
 
-        /* Action Buttons */
-        .btn {
-            padding: 12px 24px;
-            font-weight: 600;
-            border-radius: 8px;
-            border: none;
-            cursor: pointer;
-            font-size: 14px;
-            transition: all 0.3s ease;
-            display: inline-flex;
-            align-items: center;
-            gap: 8px;
-        }
+def get_pdf_info(source):
+    """Page count, size, encryption flag and PDF version of an upload"""
+    try:
+        info = pdf_engine.probe(source)
+    except pdf_engine.PdfEngineError:
+        return {'pages': 0, 'size': source.size, 'encrypted': False, 'version': 'unknown'}
+    return {'pages': info.page_count, 'size': info.size, 'encrypted': info.encrypted, 'version': info.version}
 
-        .btn-primary {
-            background: linear-gradient(135deg, var(--primary-blue), var(--primary-purple));
-            color: white;
-            box-shadow: 0 4px 15px rgba(74, 144, 226, 0.3);
-        }
+def build_merge_job(mother_pdf, insertions):
+    """Engine merge job for PDFs held in session state.
 
-        .btn-primary:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 20px rgba(74, 144, 226, 0.4);
-        }
+    Each PDF may carry a 'remove_pages' PageSet; removals and insertions are
+    applied together in one writer pass.
+    """
+    return pdf_engine.MergeJob(
+        mother=to_source(mother_pdf),
+        insertions=[
+            pdf_engine.Insertion(to_source(ins), ins['after_page'], ins.get('remove_pages'))
+            for ins in insertions
+        ],
+        mother_remove_pages=mother_pdf.get('remove_pages'),
+    )
 
-        .btn-success {
-            background: linear-gradient(135deg, var(--primary-green), #5CB85C);
-            color: white;
-        }
+def run_profiled_job(job, operation, output_path, work, summarize, **context):
+    """Body shared by the background jobs; runs off the script thread, so no st.* calls.
 
-        .btn-warning {
-            background: linear-gradient(135deg, var(--primary-orange), #F0AD4E);
-            color: white;
-        }
+    `work(progress)` produces the result, with `output_path` removed if it
+    fails or is cancelled. The job is profiled under `operation`, and the
+    fields `summarize(result)` returns (result None on failure) are logged
+    with it. Returns the result and the logged profile.
+    """
+    profile = instrumentation.Profile(operation, job=job.id, **context)
+    try:
+        with profile:
+            result = work(profile.track(job.report))
+    except BaseException as e:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        if isinstance(e, jobs.JobCancelled):
+            profile.status = "cancelled"
+        profile.log(**summarize(None))
+        raise
+    return result, profile.log(**summarize(result))
+
+def run_merge_job(job, mother_pdf, insertions, output_path, prepare_dir, profile_name=None, base=None,
+                  linearize=False):
+    """Merge job body. `base` is the previous merge's MergeBase, which the
+    engine updates rather than starting over when little changed."""
+    def merge(progress):
+        return pdf_engine.merge_pdfs(
+            build_merge_job(mother_pdf, insertions), output_path, progress=progress,
+            prepare_dir=prepare_dir, profile=profile_name, base=base,
+            linearize=linearize
+        )
 
-        .btn-danger {
-            background: linear-gradient(135deg, var(--primary-red), #D9534F);
-            color: white;
-        }
+    def summarize(result):
+        fields = {'cache': doc_cache.document_cache.stats()}
+        if result is not None:
+            fields.update(backend=result.backend, pages=result.page_count, size=result.size,
+                          reused_pages=result.reused_pages, large_file=result.large_file,
+                          optimization=result.optimization and vars(result.optimization))
+        return fields
+
+    return run_profiled_job(job, "merge", output_path, merge, summarize, insertions=len(insertions))
+
+def job_memory(*pdf_infos):
+    """Memory a job over uploaded PDFs is expected to need, for admission to the workers"""
+    return pdf_engine.estimate_memory([(pdf_info['size'], pdf_info['pages']) for pdf_info in pdf_infos])
+
+def start_merge_job():
+    """Queue the session's merge on the background workers"""
+    # Attach page removals; they are applied during the merge itself
+    processed_mother = dict(
+        st.session_state.mother_pdf,
+        remove_pages=parse_page_numbers(st.session_state.get("mother_remove_pages", ""))
+    )
+    processed_insertions = [
+        dict(insertion, remove_pages=parse_page_numbers(st.session_state.get(f"insert_{i}_remove_pages", "")))
+        for i, insertion in enumerate(st.session_state.insertions)
+    ]
+
+    output_path = blob_store.upload_store.output_path(session_id())
+    previous = st.session_state.get('merged_output') or {}
+    job = jobs.job_manager.submit(
+        f"Merge {processed_mother['name']} with {len(processed_insertions)} insertion(s)",
+        run_merge_job, processed_mother, processed_insertions, output_path,
+        blob_store.upload_store.prepared_dir(session_id()), st.session_state.get('output_profile'),
+        previous.get('base'), st.session_state.get('linearize', False),
+        memory=job_memory(processed_mother, *processed_insertions)
+    )
+    st.session_state.merge_job_id = job.id
 
-        .btn-secondary {
-            background: #F8F9FA;
-            color: var(--dark-text);
-            border: 2px solid var(--border-color);
-        }
+def finished_job(state_key):
+    """The session job under `state_key` once it has finished, or None.
 
-        .btn-secondary:hover {
-            background: var(--light-blue);
-            border-color: var(--primary-blue);
-        }
+    A finished job is forgotten as it is returned, so its result is
+    collected once. Pages call this before drawing their start buttons, so
+    the run that shows a result already has them enabled.
+    """
+    job_id = st.session_state.get(state_key)
+    job = jobs.job_manager.get(job_id) if job_id else None
+    if job is None:
+        st.session_state.pop(state_key, None)
+        return None
+    if not job.is_finished:
+        return None
+    st.session_state.pop(state_key)
+    jobs.job_manager.forget(job.id)
+    return job
+
+@polling_fragment
+def show_job_progress(state_key, cancel_label):
+    """Progress bar and cancel button of the running session job under `state_key`"""
+    job_id = st.session_state.get(state_key)
+    job = jobs.job_manager.get(job_id) if job_id else None
+    if job is None or job.is_finished:
+        # The whole page reruns to collect the result
+        st.rerun()
 
-        /* Page Removal Section */
-        .page-removal-section {
-            background: linear-gradient(135deg, var(--light-red), white);
-            border: 1px solid #FFB3BA;
-            border-radius: 12px;
-            padding: 20px;
-            margin: 20px 0;
-        }
+    if job.status != jobs.QUEUED:
+        label = f"{job.stage}: {job.done} / {job.total}"
+    elif job.position:
+        label = f"Queued at position {job.position}, waiting for memory or a free worker"
+    else:
+        label = "Starting"
+    st.progress(job.fraction, text=f"🔄 {label}")
+    if job.cancel_requested:
+        st.caption("Cancelling…")
+    elif st.button(f"⏹️ {cancel_label}", key=f"cancel_{state_key}"):
+        jobs.job_manager.cancel(job.id)
 
-        .removal-title {
-            color: var(--primary-red);
-            font-weight: 700;
-            font-size: 16px;
-            margin-bottom: 10px;
-        }
+def follow_job(state_key, cancel_label):
+    """Show progress of the session job under `state_key`, or return it once finished.
 
-        /* Success/Error Messages */
-        .message {
-            padding: 16px 20px;
-            border-radius: 12px;
-            margin: 20px 0;
-            font-weight: 600;
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
+    Returns None while the job runs or if there is none.
+    """
+    job = finished_job(state_key)
+    if job is None and st.session_state.get(state_key):
+        show_job_progress(state_key, cancel_label)
+    return job
+
+def cancel_job(state_key):
+    """Stop the session's background job under `state_key`, if one is running"""
+    job_id = st.session_state.pop(state_key, None)
+    if job_id:
+        jobs.job_manager.cancel(job_id)
+        jobs.job_manager.forget(job_id)
+
+def show_merge_job():
+    """Show progress of the session's background merge and collect its result"""
+    job = follow_job('merge_job_id', "Cancel Merge")
+    if job is None:
+        return
+    # Trimmed copies the merge left behind count against the session's quota
+    blob_store.upload_store.prune_prepared(session_id())
+
+    if job.status == jobs.DONE:
+        result, record = job.result
+        remember_profile(record)
+        discard_output('merged_output')
+        st.session_state.merged_output = {
+            'path': result.path,
+            'file_name': f"consolidated_report_{int(time.time())}.pdf",
+            'size': result.size,
+            'optimization': result.optimization,
+            'base': result.base,
+            'reused_pages': result.reused_pages,
+            'pages': result.page_count,
+            'linearized': result.linearized,
+            'large_file': result.large_file,
+        }
+    elif job.status == jobs.FAILED:
+        st.error(f"Error merging PDFs: {job.error}")
+    else:
+        st.info("⏹️ Merge cancelled")
 
-        .message-success {
-            background: linear-gradient(135deg, var(--light-green), white);
-            border-left: 4px solid var(--primary-green);
-            color: #155724;
-        }
+def plan_split(pdf_info, mode, value):
+    """Chunks for a split, or None after reporting an invalid setting"""
+    stem = os.path.splitext(pdf_info['name'])[0] or "part"
+    try:
+        if mode == SPLIT_BY_COUNT:
+            return pdf_engine.split_by_page_count(pdf_info['pages'], value, stem)
+        if mode == SPLIT_BY_RANGES:
+            return pdf_engine.split_by_ranges(pdf_info['pages'], value, stem)
+        return pdf_engine.split_by_bookmarks(to_source(pdf_info), value, stem)
+    except (pdf_engine.PdfEngineError, blob_store.BlobNotFound) as e:
+        st.error(f"❌ {e}")
+        return None
 
-        .message-warning {
-            background: linear-gradient(135deg, var(--light-orange), white);
-            border-left: 4px solid var(--primary-orange);
-            color: #856404;
-        }
+def run_split_job(job, pdf_info, chunks, output_path):
+    """Split job body"""
+    return run_profiled_job(
+        job, "split", output_path,
+        lambda progress: pdf_engine.split_pdf(to_source(pdf_info), chunks, output_path, progress=progress),
+        lambda result: {} if result is None else {'pages': pdf_info['pages'], 'size': result.size},
+        chunks=len(chunks)
+    )
 
-        .message-error {
-            background: linear-gradient(135deg, var(--light-red), white);
-            border-left: 4px solid var(--primary-red);
-            color: #721c24;
-        }
+def start_split_job(chunks):
+    """Queue the session's split on the background workers"""
+    pdf_info = st.session_state.split_pdf
+    output_path = blob_store.upload_store.output_path(session_id(), suffix='.zip')
+    job = jobs.job_manager.submit(
+        f"Split {pdf_info['name']} into {len(chunks)} file(s)",
+        run_split_job, pdf_info, chunks, output_path, memory=job_memory(pdf_info)
+    )
+    st.session_state.split_job_id = job.id
+
+def show_split_job():
+    """Show progress of the session's background split and collect its archive"""
+    job = follow_job('split_job_id', "Cancel Split")
+    if job is None:
+        return
+
+    if job.status == jobs.DONE:
+        result, record = job.result
+        remember_profile(record)
+        discard_output('split_output')
+        stem = os.path.splitext(st.session_state.split_pdf['name'])[0]
+        st.session_state.split_output = {
+            'path': result.path,
+            'file_name': f"{stem}_split.zip",
+            'size': result.size,
+            'files': len(result.chunks),
+        }
+    elif job.status == jobs.FAILED:
+        st.error(f"Error splitting PDF: {job.error}")
+    else:
+        st.info("⏹️ Split cancelled")
+
+def run_removal_job(job, pdf_info, pages_to_remove, output_path, linearize=False):
+    """Page-removal job body"""
+    return run_profiled_job(
+        job, "remove_pages", output_path,
+        lambda progress: pdf_engine.delete_pages(to_source(pdf_info), pages_to_remove, output_path,
+                                                 progress=progress, linearize=linearize),
+        lambda result: {} if result is None else {'pages': result.page_count, 'size': result.size,
+                                                  'bytes_freed': result.bytes_freed}
+    )
 
-        .message-info {
-            background: linear-gradient(135deg, var(--light-blue), white);
-            border-left: 4px solid var(--primary-blue);
-            color: #0c5460;
-        }
+def start_removal_job(pages_to_remove):
+    """Queue the session's page removal on the background workers"""
+    pdf_info = st.session_state.remove_pdf
+    output_path = blob_store.upload_store.output_path(session_id())
+    job = jobs.job_manager.submit(
+        f"Remove pages from {pdf_info['name']}",
+        run_removal_job, pdf_info, pages_to_remove, output_path, st.session_state.get('remove_linearize', False),
+        memory=job_memory(pdf_info)
+    )
+    st.session_state.remove_job_id = job.id
+
+def show_removal_job():
+    """Show progress of the session's page removal and collect the trimmed file"""
+    job = follow_job('remove_job_id', "Cancel")
+    if job is None:
+        return
+
+    if job.status == jobs.DONE:
+        result, record = job.result
+        remember_profile(record)
+        discard_output('remove_output')
+        stem = os.path.splitext(st.session_state.remove_pdf['name'])[0]
+        st.session_state.remove_output = {
+            'path': result.path,
+            'file_name': f"{stem}_trimmed.pdf",
+            'size': result.size,
+            'result': result,
+        }
+    elif job.status == jobs.FAILED:
+        st.error(f"Error removing pages: {job.error}")
+    else:
+        st.info("⏹️ Page removal cancelled")
 
-        /* Progress Indicator */
-        .progress-section {
-            background: white;
-            border-radius: 12px;
-            padding: 25px;
-            margin: 25px 0;
-            text-align: center;
-            border: 1px solid var(--border-color);
-        }
+def show_download(merged_output):
+    """Offer the merged file for download, with notes on how it was produced"""
+    if merged_output.get('reused_pages'):
+        st.caption(f"♻️ Updated the previous merge: {merged_output['reused_pages']} of "
+                   f"{merged_output['pages']} pages reused")
 
-        .progress-title {
-            font-size: 18px;
-            font-weight: 700;
-            color: var(--dark-text);
-            margin-bottom: 15px;
-        }
+    if merged_output.get('large_file'):
+        st.caption("💽 Large-file mode: built on disk without loading whole documents into memory")
 
-        /* Responsive Design */
-        @media (max-width: 768px) {
-            .header-content {
-                padding: 0 20px;
-            }
-
-            .workflow-container {
-                padding: 25px;
-                margin: 20px 10px;
-            }
-
-            .tools-grid {
-                grid-template-columns: 1fr;
-                gap: 15px;
-            }
-
-            .step-card {
-                padding: 20px;
-            }
-
-            .file-info-card {
-                flex-direction: column;
-                align-items: flex-start;
-                gap: 10px;
-            }
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    if merged_output.get('linearized'):
+        st.caption("⚡ Linearized: viewers can show page 1 while the rest downloads")
 
-# ============================================================================
-# UTILITY FUNCTIONS
-# ============================================================================
+    report = merged_output.get('optimization')
+    if report and report.applied:
+        st.caption(f"⚙️ {report.profile.title()} optimization saved {report.bytes_saved // 1024} KB "
+                   f"({report.bytes_saved / report.size_before:.0%}) in {report.seconds:.1f}s")
+    elif report:
+        st.caption(f"⚙️ {report.profile.title()} optimization could not shrink this file; kept it as merged")
 
-def safe_pdf_to_images(file_bytes, file_name, max_pages=10):
-    """Safely convert PDF to images"""
-    images = []
-    doc = None
-    try:
-        doc = fitz.open("pdf", file_bytes)
-        total_pages = len(doc)
-
-        for page_num in range(min(total_pages, max_pages)):
-            try:
-                page = doc[page_num]
-                mat = fitz.Matrix(1.2, 1.2)
-                pix = page.get_pixmap(matrix=mat)
-                img_data = pix.tobytes("png")
-                img = Image.open(BytesIO(img_data))
-                images.append(img)
-                pix = None
-            except Exception:
-                placeholder = Image.new('RGB', (150, 200), color='lightgray')
-                images.append(placeholder)
-
-        return images, total_pages
-    except Exception as e:
-        st.error(f"Error processing {file_name}: {str(e)}")
-        return [], 0
-    finally:
-        if doc:
-            doc.close()
-
-def get_page_count(file_bytes):
-    """Get PDF page count"""
-    try:
-        reader = pypdf.PdfReader(BytesIO(file_bytes))
-        return len(reader.pages)
-    except Exception:
-        return 0
+    offer_download(merged_output, f"📥 Download Merged PDF ({merged_output['size'] // 1024} KB)",
+                   "download_merged", "application/pdf")
 
-def remove_pages_from_pdf(file_bytes, pages_to_remove):
-    """Remove specified pages from PDF"""
-    try:
-        reader = pypdf.PdfReader(BytesIO(file_bytes))
-        writer = pypdf.PdfWriter()
-
-        for i in range(len(reader.pages)):
-            if (i + 1) not in pages_to_remove:
-                writer.add_page(reader.pages[i])
-
-        output = BytesIO()
-        writer.write(output)
-        output.seek(0)
-        return output.getvalue()
-    except Exception as e:
-        st.error(f"Error removing pages: {str(e)}")
-        return None
+def offer_download(output, label, key, mime):
+    """Offer a file on disk for download without inlining it into the page"""
+    def read_output():
+        with open(output['path'], 'rb') as f:
+            return f.read()
 
-def merge_pdf_workflow(mother_pdf, insertions):
-    """Merge PDFs according to the workflow"""
+    options = dict(file_name=output['file_name'], mime=mime, key=key, use_container_width=True)
     try:
-        mother_reader = pypdf.PdfReader(BytesIO(mother_pdf['bytes']))
-        writer = pypdf.PdfWriter()
-
-        # Sort insertions by page number
-        sorted_insertions = sorted(insertions, key=lambda x: x['after_page'])
-
-        current_page = 0
-
-        for insertion in sorted_insertions:
-            # Add mother PDF pages up to insertion point
-            while current_page < insertion['after_page']:
-                if current_page < len(mother_reader.pages):
-                    writer.add_page(mother_reader.pages[current_page])
-                current_page += 1
-
-            # Add pages from inserted PDF
-            insert_reader = pypdf.PdfReader(BytesIO(insertion['pdf_bytes']))
-            for page in insert_reader.pages:
-                writer.add_page(page)
-
-        # Add remaining mother PDF pages
-        while current_page < len(mother_reader.pages):
-            writer.add_page(mother_reader.pages[current_page])
-            current_page += 1
-
-        output = BytesIO()
-        writer.write(output)
-        output.seek(0)
-        return output.getvalue()
-
-    except Exception as e:
-        st.error(f"Error merging PDFs: {str(e)}")
-        return None
-
-def create_download_link(file_bytes, filename):
-    """Create download link"""
-    b64 = base64.b64encode(file_bytes).decode()
-    size_kb = len(file_bytes) // 1024
-    href = f"""
-    <div style="text-align: center; margin: 30px 0;">
-        <a href="data:application/pdf;base64,{b64}" download="{filename}" class="btn btn-success">
-            📥 Download Merged PDF ({size_kb} KB)
-        </a>
-    </div>
-    """
-    return href
+        # The file is only read when the user clicks
+        st.download_button(label, data=read_output, **options)
+    except StreamlitAPIException:
+        # Streamlit releases without deferred downloads need the content now
+        with open(output['path'], 'rb') as f:
+            st.download_button(label, data=f, **options)
+
+def discard_output(state_key):
+    """Delete a result file of the current session, if any"""
+    output = st.session_state.pop(state_key, None)
+    if output and os.path.exists(output['path']):
+        os.remove(output['path'])
+
+def reset_workflow():
+    """Forget all uploads and results and return to the home page"""
+    for key in ('merge_job_id', 'split_job_id', 'remove_job_id'):
+        cancel_job(key)
+    for key in ('merged_output', 'split_output', 'split_pdf', 'remove_output', 'remove_pdf', 'active_tool'):
+        st.session_state.pop(key, None)
+    blob_store.upload_store.drop_session(session_id())
+    st.session_state.mother_pdf = None
+    st.session_state.insertions = []
+    st.session_state.current_step = 1
+
+def remember_profile(record):
+    """Keep a logged profile for this session's debug panel"""
+    profiles = st.session_state.setdefault('profiles', [])
+    profiles.append(record)
+    del profiles[:-PROFILE_HISTORY]
+
+def show_debug_panel():
+    """Stage timings of recent operations and cache counters"""
+    with st.expander("🛠️ Performance details"):
+        profiles = st.session_state.get('profiles', [])
+        if not profiles:
+            st.caption("Upload or merge a PDF to see where the time goes.")
+        for record in reversed(profiles):
+            st.markdown(f"**{record['operation']}** · {record['status']} · {record['total_seconds']:.3f}s")
+            st.table([
+                {
+                    'stage': stage['stage'],
+                    'wall s': f"{stage['wall_seconds']:.3f}",
+                    'CPU s': f"{stage['cpu_seconds']:.3f}",
+                    'peak KB': stage['peak_kb'] if stage['peak_kb'] is not None else "-",
+                }
+                for stage in record['stages']
+            ])
+        st.markdown("**Caches**")
+        st.json({
+            'documents': doc_cache.document_cache.stats(),
+            'thumbnails': previews.thumbnail_cache.stats(),
+        })
+        st.markdown("**Background jobs** (all sessions)")
+        st.json(jobs.job_manager.utilization())
 
 def parse_page_numbers(page_string):
-    """Parse comma-separated page numbers"""
-    if not page_string.strip():
-        return []
-
-    pages = []
+    """Parse comma-separated page numbers and ranges into a PageSet"""
     try:
-        for part in page_string.split(','):
-            part = part.strip()
-            if '-' in part:
-                # Handle ranges like "1-5"
-                start, end = map(int, part.split('-'))
-                pages.extend(range(start, end + 1))
-            else:
-                pages.append(int(part))
-        return sorted(list(set(pages)))
-    except ValueError:
-        st.error("Invalid page number format. Use comma-separated numbers like: 1, 3, 5-8")
-        return []
+        return pdf_engine.parse_page_numbers(page_string)
+    except pdf_engine.PageSelectionError as e:
+        st.error(f"❌ {e}")
+        return pdf_engine.PageSet()
 
 # ============================================================================
 # MAIN APPLICATION
@@ -648,6 +544,13 @@ def main():
     if 'current_step' not in st.session_state:
         st.session_state.current_step = 1
 
+    # Keep this session's uploads alive and clear out abandoned ones
+    blob_store.upload_store.touch(session_id())
+    blob_store.upload_store.maybe_sweep()
+    if not uploads_available():
+        reset_workflow()
+        st.warning("⏱️ Your uploads expired after a period of inactivity. Please upload them again.")
+
     # Header
     st.markdown("""
     <div class="main-header">
@@ -664,10 +567,18 @@ def main():
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
 
     # Show workflow or home based on state
-    if st.session_state.current_step == 1 and not st.session_state.mother_pdf:
-        show_home_page()
-    else:
+    tool = st.session_state.get('active_tool')
+    if tool == 'split':
+        show_splitter()
+    elif tool == 'remove':
+        show_page_remover()
+    elif tool == 'merge' or st.session_state.current_step != 1 or st.session_state.mother_pdf:
         show_workflow()
+    else:
+        show_home_page()
+
+    if DEBUG_PANEL:
+        show_debug_panel()
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -693,6 +604,7 @@ def show_home_page():
 
     with col1:
         if st.button("Start PDF Merge", key="merge_tool", use_container_width=True):
+            st.session_state.active_tool = 'merge'
             st.session_state.current_step = 1
             st.rerun()
 
@@ -708,6 +620,10 @@ def show_home_page():
         """, unsafe_allow_html=True)
 
     with col2:
+        if st.button("Start Page Removal", key="remove_tool", use_container_width=True):
+            st.session_state.active_tool = 'remove'
+            st.rerun()
+
         st.markdown("""
         <div class="tool-card page-remove">
             <div class="tool-icon">🗑️</div>
@@ -720,6 +636,10 @@ def show_home_page():
         """, unsafe_allow_html=True)
 
     with col3:
+        if st.button("Start PDF Splitter", key="split_tool", use_container_width=True):
+            st.session_state.active_tool = 'split'
+            st.rerun()
+
         st.markdown("""
         <div class="tool-card pdf-split">
             <div class="tool-icon">📑</div>
@@ -750,9 +670,7 @@ def show_workflow():
 
     # Back button
     if st.button("← Back to Home", key="back_home"):
-        st.session_state.mother_pdf = None
-        st.session_state.insertions = []
-        st.session_state.current_step = 1
+        reset_workflow()
         st.rerun()
 
     # Step 1: Mother PDF Upload
@@ -796,22 +714,16 @@ def show_step_1():
 
         if mother_file:
             # Process mother PDF
-            file_bytes = mother_file.read()
-            mother_file.seek(0)
-
-            st.session_state.mother_pdf = {
-                'name': mother_file.name,
-                'bytes': file_bytes,
-                'pages': get_page_count(file_bytes),
-                'size': len(file_bytes)
-            }
-            st.rerun()
+            mother_pdf = store_upload(mother_file)
+            if mother_pdf:
+                st.session_state.mother_pdf = mother_pdf
+                st.rerun()
     else:
         # Show mother PDF info
         show_pdf_info(st.session_state.mother_pdf, "Mother PDF", is_mother=True)
 
-        # Page removal for mother PDF
-        show_page_removal_section(st.session_state.mother_pdf, "mother")
+        # Preview and page removal for mother PDF
+        show_document_tools(st.session_state.mother_pdf, "mother")
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -864,20 +776,12 @@ def show_step_2():
         )
 
     if new_pdf and st.button("➕ Add This Insertion", key="add_insertion"):
-        file_bytes = new_pdf.read()
-        new_pdf.seek(0)
-
-        insertion = {
-            'name': new_pdf.name,
-            'bytes': file_bytes,
-            'pages': get_page_count(file_bytes),
-            'size': len(file_bytes),
-            'after_page': after_page
-        }
-
-        st.session_state.insertions.append(insertion)
-        st.success(f"✅ Added {new_pdf.name} to be inserted after page {after_page}")
-        st.rerun()
+        insertion = store_upload(new_pdf)
+        if insertion:
+            insertion['after_page'] = after_page
+            st.session_state.insertions.append(insertion)
+            st.success(f"✅ Added {new_pdf.name} to be inserted after page {after_page}")
+            st.rerun()
 
     st.markdown('</div></div>', unsafe_allow_html=True)
 
@@ -915,55 +819,57 @@ def show_step_3():
     </div>
     """, unsafe_allow_html=True)
 
-    # Process merge button
-    if st.button("🔗 Process Final Merge", key="process_merge", type="primary", use_container_width=True):
-        with st.spinner("🔄 Processing your merged PDF..."):
-            # Apply page removals first
-            processed_mother = st.session_state.mother_pdf.copy()
-            processed_insertions = []
-
-            # Process mother PDF page removals
-            if f"mother_remove_pages" in st.session_state and st.session_state[f"mother_remove_pages"]:
-                pages_to_remove = parse_page_numbers(st.session_state[f"mother_remove_pages"])
-                if pages_to_remove:
-                    processed_bytes = remove_pages_from_pdf(processed_mother['bytes'], pages_to_remove)
-                    if processed_bytes:
-                        processed_mother['bytes'] = processed_bytes
-                        processed_mother['pages'] = get_page_count(processed_bytes)
-
-            # Process insertion page removals
-            for i, insertion in enumerate(st.session_state.insertions):
-                processed_insertion = insertion.copy()
-                if f"insert_{i}_remove_pages" in st.session_state and st.session_state[f"insert_{i}_remove_pages"]:
-                    pages_to_remove = parse_page_numbers(st.session_state[f"insert_{i}_remove_pages"])
-                    if pages_to_remove:
-                        processed_bytes = remove_pages_from_pdf(insertion['bytes'], pages_to_remove)
-                        if processed_bytes:
-                            processed_insertion['bytes'] = processed_bytes
-                            processed_insertion['pages'] = get_page_count(processed_bytes)
-
-                processed_insertions.append(processed_insertion)
-
-            # Perform the merge
-            merged_pdf = merge_pdf_workflow(processed_mother, processed_insertions)
-
-            if merged_pdf:
-                st.markdown("""
-                <div class="message message-success">
-                    🎉 Your consolidated report has been created successfully!
-                </div>
-                """, unsafe_allow_html=True)
-
-                timestamp = int(time.time())
-                download_link = create_download_link(merged_pdf, f"consolidated_report_{timestamp}.pdf")
-                st.markdown(download_link, unsafe_allow_html=True)
-
-                # Reset workflow option
-                if st.button("🔄 Start New Merge", key="restart_workflow"):
-                    st.session_state.mother_pdf = None
-                    st.session_state.insertions = []
-                    st.session_state.current_step = 1
-                    st.rerun()
+    # Output optimization: trade merge time for a smaller file
+    profiles = list(pdf_engine.OPTIMIZATION_PROFILES)
+    st.radio(
+        "Output optimization",
+        profiles,
+        index=profiles.index(pdf_engine.select_profile().name),
+        key="output_profile",
+        horizontal=True,
+        format_func=str.title,
+        help="  \n".join(f"**{profile.name.title()}**: {profile.description}"
+                       for profile in pdf_engine.OPTIMIZATION_PROFILES.values()),
+    )
+
+    linearize_available = pdf_engine.linearization_available()
+    st.checkbox(
+        "⚡ Fast web view (linearized output)",
+        key="linearize",
+        disabled=not linearize_available,
+        help="Lets viewers show the first page before the whole file has downloaded."
+             + ("" if linearize_available else " Requires pikepdf or qpdf on the server."),
+    )
+
+    # Process merge button; the merge itself runs in the background. A
+    # finished merge is collected first, so the button is drawn enabled.
+    controls = st.container()
+    show_merge_job()
+    with controls:
+        merge_running = bool(st.session_state.get('merge_job_id'))
+        waiting = jobs.job_manager.utilization()['waiting']
+        if waiting and not merge_running:
+            st.caption(f"⏳ The server is busy: {waiting} job(s) are queued, so a new merge will wait its turn")
+        if st.button("🔗 Process Final Merge", key="process_merge", type="primary",
+                     use_container_width=True, disabled=merge_running):
+            start_merge_job()
+            st.rerun()
+
+    # The result stays available across reruns until replaced or reset
+    merged_output = st.session_state.get('merged_output')
+    if merged_output:
+        st.markdown("""
+        <div class="message message-success">
+            🎉 Your consolidated report has been created successfully!
+        </div>
+        """, unsafe_allow_html=True)
+
+        show_download(merged_output)
+
+        # Reset workflow option
+        if st.button("🔄 Start New Merge", key="restart_workflow"):
+            reset_workflow()
+            st.rerun()
 
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -977,7 +883,7 @@ def show_pdf_info(pdf_info, title, is_mother=False):
             <div class="file-icon">{icon}</div>
             <div class="file-text">
                 <div class="file-name">{title}: {pdf_info['name']}</div>
-                <div class="file-stats">{pdf_info['pages']} pages • {len(pdf_info['bytes']) // 1024} KB</div>
+                <div class="file-stats">{pdf_info['pages']} pages • {pdf_info['size'] // 1024} KB • PDF {pdf_info.get('version', 'unknown')}{' • 🔒 Encrypted' if pdf_info.get('encrypted') else ''}</div>
             </div>
         </div>
         <div>
@@ -986,15 +892,26 @@ def show_pdf_info(pdf_info, title, is_mother=False):
     </div>
     """, unsafe_allow_html=True)
 
+@fragment
+def show_document_tools(pdf_info, prefix):
+    """Preview and page removal for one PDF; using them reruns only this part"""
+    show_preview_section(pdf_info, prefix)
+    show_page_removal_section(pdf_info, prefix)
+
+@fragment
 def show_insertion_card(insertion, index):
-    """Display insertion card with details"""
+    """Display insertion card with details.
+
+    The card is a fragment: paging its preview or editing its removals
+    reruns this card alone, not the other cards or the merge summary.
+    """
     st.markdown(f"""
     <div class="insertion-point active">
         <div class="insertion-header">
             <div class="insertion-title">📎 Insertion #{index + 1}</div>
             <button onclick="removeInsertion({index})" style="background: var(--primary-red); color: white; border: none; border-radius: 4px; padding: 4px 8px; font-size: 12px;">❌</button>
         </div>
-        <div style="display: grid; grid-template-columns: 2fr 1fr 1fr; gap: 15px; align-items: center;">
+        <div style="display: grid; grid-template-columns: 2fr 1fr; gap: 15px; align-items: center;">
             <div>
                 <strong>{insertion['name']}</strong><br>
                 <small style="color: var(--medium-text);">{insertion['pages']} pages • {insertion['size'] // 1024} KB</small>
@@ -1003,28 +920,64 @@ def show_insertion_card(insertion, index):
                 <strong>After Page:</strong><br>
                 <span style="color: var(--primary-orange);">{insertion['after_page']}</span>
             </div>
-            <div>
-                <button class="btn btn-secondary" style="font-size: 12px; padding: 6px 12px;">📄 Preview</button>
-            </div>
         </div>
     </div>
     """, unsafe_allow_html=True)
 
+    show_preview_section(insertion, f"insert_{index}")
+
     # Page removal for this insertion
     show_page_removal_section(insertion, f"insert_{index}")
 
     # Remove insertion button
     if st.button(f"🗑️ Remove Insertion #{index + 1}", key=f"remove_insertion_{index}"):
+        release_upload(insertion)
         st.session_state.insertions.pop(index)
         st.rerun()
 
+def toggle_state(key):
+    st.session_state[key] = not st.session_state.get(key, False)
+
+def show_preview_section(pdf_info, prefix):
+    """Preview toggle plus a paged thumbnail grid rendered only when open"""
+    open_key = f"{prefix}_preview_open"
+    label = "🙈 Hide Preview" if st.session_state.get(open_key) else "📄 Preview"
+    # Toggled in a callback, so the run it triggers already shows the new state
+    st.button(label, key=f"{prefix}_preview_toggle", on_click=toggle_state, args=(open_key,))
+
+    if not st.session_state.get(open_key):
+        return
+
+    total_pages = pdf_info['pages']
+    if not total_pages:
+        st.info("No pages to preview")
+        return
+
+    start = st.number_input(
+        "Show pages starting at:",
+        min_value=1,
+        max_value=total_pages,
+        value=1,
+        step=PREVIEW_PAGE_SIZE,
+        key=f"{prefix}_preview_start"
+    )
+    stop = min(start - 1 + PREVIEW_PAGE_SIZE, total_pages)
+    st.caption(f"Pages {start}–{stop} of {total_pages}")
+
+    # Only the visible pages are rendered, each as soon as it is ready
+    columns = st.columns(PREVIEW_COLUMNS)
+    for i, (page_index, image) in enumerate(safe_pdf_to_images(pdf_info, range(start - 1, stop))):
+        with columns[i % PREVIEW_COLUMNS]:
+            st.image(image, caption=f"Page {page_index + 1}")
+
 def show_page_removal_section(pdf_info, prefix):
     """Show page removal section for a PDF"""
     st.markdown(f"""
     <div class="page-removal-section">
         <div class="removal-title">🗑️ Remove Pages (Optional)</div>
         <p style="font-size: 12px; color: var(--medium-text); margin: 5px 0;">
-            Enter page numbers to remove (e.g., "1, 3, 5-8" removes pages 1, 3, and 5 through 8)
+            Enter page numbers to remove (e.g., "1, 3, 5-8, 20-, last" removes pages 1, 3, 5 through 8,
+            everything from 20 on, and the last page)
         </p>
     </div>
     """, unsafe_allow_html=True)
@@ -1032,20 +985,156 @@ def show_page_removal_section(pdf_info, prefix):
     remove_pages = st.text_input(
         f"Pages to remove from {pdf_info['name']}:",
         key=f"{prefix}_remove_pages",
-        placeholder="e.g., 1, 3, 5-8",
-        help="Enter page numbers separated by commas. Use ranges like 5-8 for multiple consecutive pages."
+        placeholder="e.g., 1, 3, 5-8, 20-, last",
+        help="Enter page numbers separated by commas. Use ranges like 5-8 for consecutive pages, "
+             "20- for everything from page 20 on, and last for the final page."
     )
 
     if remove_pages:
-        pages = parse_page_numbers(remove_pages)
-        if pages:
-            valid_pages = [p for p in pages if 1 <= p <= pdf_info['pages']]
-            if valid_pages:
-                st.markdown(f"""
-                <div class="message message-warning">
-                    ⚠️ Will remove {len(valid_pages)} page(s): {', '.join(map(str, valid_pages))}
-                </div>
-                """, unsafe_allow_html=True)
+        valid_pages = parse_page_numbers(remove_pages).resolve(pdf_info['pages'])
+        if valid_pages:
+            st.markdown(f"""
+            <div class="message message-warning">
+                ⚠️ Will remove {len(valid_pages)} page(s): {valid_pages}
+            </div>
+            """, unsafe_allow_html=True)
+
+def show_splitter():
+    """PDF Splitter: cut one PDF into several and download them as a ZIP"""
+    st.markdown("""
+    <div class="workflow-container">
+        <div style="text-align: center; margin-bottom: 30px;">
+            <h1 style="font-size: 28px; font-weight: 800; color: var(--dark-text);">
+                📑 PDF Splitter
+            </h1>
+            <p style="color: var(--medium-text);">
+                Split a large PDF by page count, page ranges or bookmarks
+            </p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if st.button("← Back to Home", key="back_home_split"):
+        reset_workflow()
+        st.rerun()
+
+    pdf_info = st.session_state.get('split_pdf')
+    if not pdf_info:
+        split_file = st.file_uploader("Choose a PDF to split", type="pdf", key="split_uploader")
+        if split_file:
+            pdf_info = store_upload(split_file)
+            if pdf_info:
+                st.session_state.split_pdf = pdf_info
+                st.rerun()
+        return
+
+    show_pdf_info(pdf_info, "PDF to split", is_mother=True)
+
+    mode = st.radio("Split", [SPLIT_BY_COUNT, SPLIT_BY_RANGES, SPLIT_BY_BOOKMARKS],
+                    key="split_mode", horizontal=True)
+    if mode == SPLIT_BY_COUNT:
+        value = st.number_input("Pages per file", min_value=1, max_value=max(1, pdf_info['pages']),
+                                value=min(10, max(1, pdf_info['pages'])), key="split_pages_per_file")
+    elif mode == SPLIT_BY_RANGES:
+        value = st.text_input("One file per range", key="split_ranges", placeholder="e.g., 1-3, 4-10, 11-",
+                              help="Each comma-separated part becomes its own file. "
+                                   "Use 20- for everything from page 20 on and last for the final page.")
+    else:
+        value = st.number_input("Bookmark level", min_value=1, max_value=9, value=1, key="split_level",
+                                help="Start a new file at every bookmark of this outline level.")
+
+    chunks = plan_split(pdf_info, mode, value) if value else None
+    if chunks:
+        st.caption(f"Will create {len(chunks)} file(s)")
+
+    controls = st.container()
+    show_split_job()
+    with controls:
+        split_running = bool(st.session_state.get('split_job_id'))
+        if st.button("✂️ Split PDF", key="process_split", type="primary", use_container_width=True,
+                     disabled=split_running or not chunks):
+            start_split_job(chunks)
+            st.rerun()
+
+    split_output = st.session_state.get('split_output')
+    if split_output:
+        st.markdown(f"""
+        <div class="message message-success">
+            🎉 Split into {split_output['files']} file(s)!
+        </div>
+        """, unsafe_allow_html=True)
+        offer_download(split_output, f"📥 Download ZIP ({split_output['size'] // 1024} KB)",
+                       "download_split", "application/zip")
+
+@fragment
+def show_removal_controls(pdf_info):
+    """Preview, page selection and start button of the Page Removal tool.
+
+    Typing a selection reruns only this fragment; starting the job reruns
+    the whole page so its progress shows below.
+    """
+    show_preview_section(pdf_info, "remover")
+    show_page_removal_section(pdf_info, "remover")
+
+    pages_to_remove = parse_page_numbers(st.session_state.get("remover_remove_pages", ""))
+    removing = pages_to_remove.resolve(pdf_info['pages'])
+    st.checkbox("⚡ Fast web view (linearized output)", key="remove_linearize",
+                disabled=not pdf_engine.linearization_available())
+
+    remove_running = bool(st.session_state.get('remove_job_id'))
+    if st.button("🗑️ Remove Pages", key="process_remove", type="primary", use_container_width=True,
+                 disabled=remove_running or not removing):
+        start_removal_job(pages_to_remove)
+        st.rerun()
+
+def show_page_remover():
+    """Page Removal: delete pages from one PDF and download the trimmed file"""
+    st.markdown("""
+    <div class="workflow-container">
+        <div style="text-align: center; margin-bottom: 30px;">
+            <h1 style="font-size: 28px; font-weight: 800; color: var(--dark-text);">
+                🗑️ Page Removal
+            </h1>
+            <p style="color: var(--medium-text);">
+                Delete unwanted pages from a PDF, however large
+            </p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if st.button("← Back to Home", key="back_home_remove"):
+        reset_workflow()
+        st.rerun()
+
+    pdf_info = st.session_state.get('remove_pdf')
+    if not pdf_info:
+        remove_file = st.file_uploader("Choose a PDF", type="pdf", key="remove_uploader")
+        if remove_file:
+            pdf_info = store_upload(remove_file)
+            if pdf_info:
+                st.session_state.remove_pdf = pdf_info
+                st.rerun()
+        return
+
+    show_pdf_info(pdf_info, "PDF", is_mother=True)
+    controls = st.container()
+    show_removal_job()
+    with controls:
+        show_removal_controls(pdf_info)
+
+    remove_output = st.session_state.get('remove_output')
+    if remove_output:
+        result = remove_output['result']
+        freed = f"freed {result.bytes_freed // 1024} KB ({result.bytes_freed / result.size_before:.0%})" \
+            if result.bytes_freed > 0 else "the file did not get smaller"
+        st.markdown(f"""
+        <div class="message message-success">
+            🎉 Removed {result.pages_before - result.page_count} page(s), {result.page_count} left;
+            {freed}.
+        </div>
+        """, unsafe_allow_html=True)
+        offer_download(remove_output, f"📥 Download PDF ({remove_output['size'] // 1024} KB)",
+                       "download_removed", "application/pdf")
 
 # ============================================================================
 # RUN APPLICATION
@@ -0,0 +1,355 @@
+"""Run a directory of merge manifests on a pool of worker processes.
+
+Every ``*.json`` file in the directory is a manifest as read by
+``pdf_engine.load_manifest``. Jobs run on a bounded process pool; each
+worker keeps the sources it has loaded, so a cover page or appendix shared
+by many manifests is hashed, probed and parsed once per worker rather than
+once per job. A job that runs past its timeout is stopped at its next
+progress report and its partial output removed; one stuck inside a single
+library call past that, where no progress is reported, has its worker
+killed and replaced. The run ends with a summary of throughput, failures
+and per-job timings, written as JSON.
+"""
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pdf_engine
+
+MANIFEST_PATTERN = "*.json"
+SUMMARY_NAME = "batch_summary.json"
+
+# Seconds one manifest may take before it is abandoned ("0" for no limit)
+DEFAULT_TIMEOUT = float(os.environ.get("PDF_BATCH_TIMEOUT_SECONDS", "600"))
+
+# Sources each worker keeps between jobs; every one holds an open memory map
+SOURCE_CACHE_SIZE = 64
+
+# Seconds a job may overrun its timeout, waiting for a progress report,
+# before its worker process is killed
+KILL_GRACE_SECONDS = 10
+
+DONE = "done"
+FAILED = "failed"
+TIMED_OUT = "timed out"
+
+
+class JobTimedOut(Exception):
+    """Raised inside a job that ran past its timeout"""
+
+
+class WorkerFailed(Exception):
+    """A call on a WorkerPool raised, or its worker process died"""
+
+
+class WorkerKilled(WorkerFailed):
+    """A call on a WorkerPool passed its deadline and its worker was killed"""
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+# Sources loaded by this worker process, by (path, size, mtime), oldest first
+_sources = OrderedDict()
+_source_hits = 0
+
+
+def cached_source(path):
+    """Source for a file, shared by every job of this worker until the file changes"""
+    global _source_hits
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise pdf_engine.ManifestError(f"Cannot read {path}: {e.strerror}") from e
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    source = _sources.get(key)
+    if source is not None:
+        _sources.move_to_end(key)
+        _source_hits += 1
+        return source
+    source = pdf_engine.load_source(path)
+    _sources[key] = source
+    if len(_sources) > SOURCE_CACHE_SIZE:
+        _sources.popitem(last=False)
+    return source
+
+
+def output_for(manifest, job, output_dir):
+    """Where a manifest's result goes: `output_dir`/<name>.pdf, else the manifest's own 'output'"""
+    if output_dir:
+        return os.path.join(output_dir, os.path.splitext(os.path.basename(manifest))[0] + ".pdf")
+    if not job.output:
+        raise pdf_engine.ManifestError("No output path: set 'output' in the manifest or pass an output directory")
+    return job.output
+
+
+def run_manifest(manifest, output_dir=None, timeout=DEFAULT_TIMEOUT, merge_options=None, share_sources=True):
+    """Merge one manifest; runs in a worker process and never raises.
+
+    The result is written to a temporary name and renamed into place, so a
+    failed or abandoned job leaves no partial file behind. With
+    `share_sources` off the worker's source cache is bypassed, for inputs
+    that are deleted after the job. Returns the job's summary row.
+    """
+    started = time.perf_counter()
+    hits_before = _source_hits
+    row = {'manifest': manifest, 'output': None, 'worker': os.getpid()}
+
+    def progress(stage, done, total):
+        if timeout and time.perf_counter() - started > timeout:
+            raise JobTimedOut(f"Stopped after {timeout:g}s while {stage.lower()}")
+
+    tmp_path = None
+    try:
+        job = pdf_engine.load_manifest(manifest, load=cached_source if share_sources else pdf_engine.load_source)
+        output = output_for(manifest, job, output_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        tmp_path = f"{output}.part"
+        result = pdf_engine.merge_pdfs(job, tmp_path, progress=progress, **(merge_options or {}))
+        os.replace(tmp_path, output)
+        row.update(status=DONE, output=output, pages=result.page_count, size=result.size,
+                   backend=result.backend)
+    except JobTimedOut as e:
+        row.update(status=TIMED_OUT, error=str(e))
+    except (pdf_engine.PdfEngineError, OSError) as e:
+        row.update(status=FAILED, error=str(e))
+    except Exception as e:
+        # A bug or a library error nobody anticipated; keep its type for the report
+        row.update(status=FAILED, error=f"{type(e).__name__}: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    row.update(seconds=round(time.perf_counter() - started, 4), sources_reused=_source_hits - hits_before)
+    return row
+
+
+def worker_loop(connection):
+    """Body of a WorkerPool process: run calls until the pipe closes"""
+    while True:
+        try:
+            fn, args = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, f"{type(e).__name__}: {e}")
+        connection.send(reply)
+
+
+# ============================================================================
+# COORDINATOR
+# ============================================================================
+
+class WorkerPool:
+    """Long-lived worker processes, each running one call at a time.
+
+    Unlike a ProcessPoolExecutor, a call can be given a deadline: when it
+    passes, that call's worker is killed and a fresh one takes its place,
+    and the other workers keep their state. Safe to call from several
+    threads; each call waits for an idle worker.
+    """
+
+    def __init__(self, workers):
+        # Spawned like the engine's preparation pool, so it can start from any thread
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._idle = queue.Queue()
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._start())
+
+    def _start(self):
+        connection, child_connection = self._context.Pipe()
+        process = self._context.Process(target=worker_loop, args=(child_connection,), name="pdf-batch-worker")
+        process.start()
+        child_connection.close()
+        with self._lock:
+            self._processes.add(process)
+        return process, connection
+
+    def _stop(self, worker):
+        process, connection = worker
+        connection.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+        with self._lock:
+            self._processes.discard(process)
+
+    def run(self, deadline, fn, *args):
+        """Call `fn(*args)` on a worker and return its result.
+
+        `fn` must be importable by the worker. Raises WorkerKilled once
+        `deadline` seconds pass (None waits forever) and WorkerFailed when
+        `fn` raises or the worker dies; either way the worker is replaced.
+        """
+        worker = self._idle.get()
+        if worker is None:
+            # Pass the shutdown marker on to the next waiting caller
+            self._idle.put(None)
+            raise WorkerFailed("The worker pool has been shut down")
+        if not worker[0].is_alive():
+            # Died while idle (killed from outside); nothing of ours was lost
+            self._stop(worker)
+            worker = self._start()
+        process, connection = worker
+        try:
+            connection.send((fn, args))
+        except (EOFError, OSError):
+            pass
+        except BaseException:
+            # Nothing was sent (the call could not be pickled); the worker is still idle
+            self._idle.put(worker)
+            raise
+        try:
+            if not connection.poll(deadline):
+                raise WorkerKilled(f"Killed after {deadline:g}s without finishing")
+            ok, value = connection.recv()
+        except (EOFError, OSError):
+            process.join(1)
+            error = WorkerFailed(f"Worker process exited unexpectedly (exit code {process.exitcode})")
+        except WorkerKilled as e:
+            error = e
+        else:
+            self._idle.put(worker)
+            if not ok:
+                raise WorkerFailed(value)
+            return value
+
+        self._stop(worker)
+        if not self._closed:
+            replacement = self._start()
+            if self._closed:
+                self._stop(replacement)
+            else:
+                self._idle.put(replacement)
+        raise error
+
+    def shutdown(self):
+        """Stop every worker, including ones still running a call"""
+        self._closed = True
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                self._stop(worker)
+        for process in processes:
+            process.join()
+        self._idle.put(None)
+
+
+def partial_output(manifest, output_dir):
+    """The temporary file run_manifest writes for a manifest, when it can be worked out"""
+    try:
+        if output_dir:
+            return output_for(manifest, None, output_dir) + ".part"
+        with open(manifest, encoding='utf-8') as f:
+            output = json.load(f)['output']
+        return os.path.join(os.path.dirname(os.path.abspath(manifest)), output) + ".part"
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def run_on_pool(pool, manifest, output_dir, timeout, merge_options):
+    """Run one manifest on `pool`, killing its worker if it overruns `timeout` by KILL_GRACE_SECONDS"""
+    started = time.perf_counter()
+    deadline = timeout + KILL_GRACE_SECONDS if timeout else None
+    try:
+        return pool.run(deadline, run_manifest, manifest, output_dir, timeout, merge_options)
+    except WorkerFailed as e:
+        # The worker never got to clean up after itself
+        partial = partial_output(manifest, output_dir)
+        if partial and os.path.exists(partial):
+            os.remove(partial)
+        return {'manifest': manifest, 'output': None, 'worker': None,
+                'status': TIMED_OUT if isinstance(e, WorkerKilled) else FAILED, 'error': str(e),
+                'seconds': round(time.perf_counter() - started, 4), 'sources_reused': 0}
+
+
+def find_manifests(directory):
+    """Manifest files of a batch directory, in name order"""
+    return sorted(path for path in glob.glob(os.path.join(directory, MANIFEST_PATTERN))
+                  if os.path.basename(path) != SUMMARY_NAME)
+
+
+def summarize(rows, wall_seconds, workers, timeout):
+    """Throughput, failures and timing distribution of a finished batch"""
+    done = [row for row in rows if row['status'] == DONE]
+    seconds = sorted(row['seconds'] for row in rows)
+    pages = sum(row['pages'] for row in done)
+    return {
+        'jobs': len(rows),
+        'succeeded': len(done),
+        'failed': sum(1 for row in rows if row['status'] == FAILED),
+        'timed_out': sum(1 for row in rows if row['status'] == TIMED_OUT),
+        'workers': workers,
+        'timeout_seconds': timeout,
+        'wall_seconds': round(wall_seconds, 3),
+        'jobs_per_minute': round(len(rows) / wall_seconds * 60, 2) if wall_seconds else None,
+        'pages_per_second': round(pages / wall_seconds, 2) if wall_seconds else None,
+        'pages_written': pages,
+        'bytes_written': sum(row['size'] for row in done),
+        'sources_reused': sum(row['sources_reused'] for row in rows),
+        'job_seconds': {
+            'mean': round(statistics.fmean(seconds), 4),
+            'median': round(statistics.median(seconds), 4),
+            'p95': seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+            'max': seconds[-1],
+        } if seconds else None,
+        'results': sorted(rows, key=lambda row: row['manifest']),
+    }
+
+
+def run_batch(directory, output_dir=None, workers=None, timeout=DEFAULT_TIMEOUT,
+              summary_path=None, progress=pdf_engine.no_progress, **merge_options):
+    """Merge every manifest in `directory` on up to `workers` processes.
+
+    `merge_options` are passed on to ``pdf_engine.merge_pdfs``. The summary
+    is returned and written to `summary_path`, by default batch_summary.json
+    in the output directory (or the batch directory).
+    """
+    manifests = find_manifests(directory)
+    if not manifests:
+        raise pdf_engine.ManifestError(f"No {MANIFEST_PATTERN} manifests in {directory}")
+    workers = max(1, min(workers or os.cpu_count() or 1, len(manifests)))
+
+    started = time.perf_counter()
+    rows = []
+    progress("Merging manifests", 0, len(manifests))
+    pool = WorkerPool(workers)
+    # One thread per worker hands out manifests and waits on the pool
+    threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-batch")
+    try:
+        futures = [threads.submit(run_on_pool, pool, manifest, output_dir, timeout, merge_options)
+                   for manifest in manifests]
+        for future in as_completed(futures):
+            rows.append(future.result())
+            progress("Merging manifests", len(rows), len(manifests))
+    finally:
+        threads.shutdown(wait=False, cancel_futures=True)
+        pool.shutdown()
+        threads.shutdown()
+
+    summary = summarize(rows, time.perf_counter() - started, workers, timeout)
+    summary_path = summary_path or os.path.join(output_dir or directory, SUMMARY_NAME)
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return summary
@@ -0,0 +1,89 @@
+"""Deterministic synthetic PDFs for the benchmark suite.
+
+Three kinds of document, each generated from a fixed seed so two revisions
+benchmark byte-identical inputs:
+
+* ``text``   - a few paragraphs of Helvetica text per page
+* ``images`` - one noise image per page, drawn from a pool of 64
+* ``fonts``  - short lines in three of the fourteen embedded base fonts per page
+"""
+import os
+import random
+
+import fitz  # PyMuPDF
+
+KINDS = ("text", "images", "fonts")
+SIZES = (10, 1000, 10000)
+
+SEED = 20240101
+IMAGE_POOL = 64
+IMAGE_SIZE = (300, 200)
+FONT_NAMES = ("helv", "heit", "hebo", "hebi", "cour", "coit", "cobo",
+              "cobi", "tiro", "tiit", "tibo", "tibi", "symb", "zadb")
+WORDS = ("report", "quarterly", "revenue", "appendix", "schedule", "total",
+         "balance", "statement", "summary", "adjusted", "segment", "forecast")
+
+
+def _text_page(page, rng, number):
+    lines = [f"Page {number}"]
+    for _ in range(30):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+    page.insert_text((56, 56), "\n".join(lines), fontname="helv", fontsize=9)
+
+
+def _image_pool(rng):
+    width, height = IMAGE_SIZE
+    size = width * height * 3
+    return [
+        fitz.Pixmap(fitz.csRGB, width, height, rng.getrandbits(size * 8).to_bytes(size, 'little'), False)
+        for _ in range(IMAGE_POOL)
+    ]
+
+
+def generate(kind, pages, path):
+    """Write a `kind` document of `pages` pages to `path`"""
+    if kind not in KINDS:
+        raise ValueError(f"unknown corpus kind {kind!r}")
+    rng = random.Random(f"{SEED}-{kind}-{pages}")
+    doc = fitz.open()
+    image_xrefs = {}
+    pool = _image_pool(rng) if kind == "images" else None
+    font_buffers = {name: fitz.Font(name).buffer for name in FONT_NAMES} if kind == "fonts" else None
+
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        if kind == "text":
+            _text_page(page, rng, number)
+        elif kind == "images":
+            slot = rng.randrange(IMAGE_POOL)
+            rect = fitz.Rect(56, 100, 556, 433)
+            if slot in image_xrefs:
+                page.insert_image(rect, xref=image_xrefs[slot])
+            else:
+                image_xrefs[slot] = page.insert_image(rect, pixmap=pool[slot])
+            page.insert_text((56, 56), f"Scan {number}", fontname="helv", fontsize=12)
+        else:
+            for line in range(3):
+                name = FONT_NAMES[(number * 3 + line) % len(FONT_NAMES)]
+                page.insert_font(fontname=f"F{line}", fontbuffer=font_buffers[name])
+                page.insert_text((56, 56 + 14 * line), f"Page {number} set in {name}",
+                                 fontname=f"F{line}", fontsize=8)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.part"
+    doc.save(tmp_path, garbage=1, deflate=True, no_new_id=True)
+    doc.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def corpus_path(corpus_dir, kind, pages):
+    return os.path.join(corpus_dir, f"{kind}-{pages}.pdf")
+
+
+def ensure(corpus_dir, kind, pages):
+    """Path of a corpus document, generating it on first use"""
+    path = corpus_path(corpus_dir, kind, pages)
+    if not os.path.exists(path):
+        generate(kind, pages, path)
+    return path
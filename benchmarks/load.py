@@ -0,0 +1,167 @@
+"""Load-test the HTTP merge service from many concurrent clients.
+
+Each client thread sends merge requests (a corpus document with a short
+insertion) back to back until the total is reached. Throughput, latency
+percentiles and the number of requests turned away with 429 are reported::
+
+    python server.py --port 8502 -j 4 --max-queue 8 --quiet &
+    python -m benchmarks.load --url http://127.0.0.1:8502 --concurrency 16 --requests 200
+
+With ``--start-server`` a server is started on a free port for the run,
+with the given ``--workers`` and ``--max-queue``.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from benchmarks import corpus
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), ".corpus")
+SERVER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+
+
+def multipart_body(fields, files):
+    """Encode text fields and (name, bytes) files as multipart/form-data"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, data in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.pdf"\r\n'
+                     f'Content-Type: application/pdf\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def merge_request(corpus_dir, kind, pages):
+    mother = corpus.ensure(corpus_dir, kind, pages)
+    insert = corpus.ensure(corpus_dir, "text", 10)
+    with open(mother, 'rb') as f, open(insert, 'rb') as g:
+        files = {'mother': f.read(), 'insert': g.read()}
+    manifest = {'mother': {'path': 'mother', 'remove_pages': "1"},
+                'insertions': [{'path': 'insert', 'after_page': max(1, pages // 2)}]}
+    return multipart_body({'manifest': json.dumps(manifest)}, files)
+
+
+def client(url, body, content_type, counter, lock, rows):
+    """Send requests until `counter` runs out; one keep-alive connection per thread"""
+    target = urlsplit(url)
+    connection = None
+    while True:
+        with lock:
+            if counter[0] <= 0:
+                break
+            counter[0] -= 1
+        if connection is None:
+            connection = http.client.HTTPConnection(target.hostname, target.port, timeout=600)
+        started = time.perf_counter()
+        try:
+            connection.request("POST", "/merge", body, {'Content-Type': content_type})
+            response = connection.getresponse()
+            size = len(response.read())
+            status = response.status
+            if response.getheader("Connection", "").lower() == "close":
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException) as e:
+            status, size = f"{type(e).__name__}", 0
+            connection.close()
+            connection = None
+        with lock:
+            rows.append({'status': status, 'seconds': time.perf_counter() - started, 'bytes': size})
+    if connection is not None:
+        connection.close()
+
+
+def start_server(workers, max_queue):
+    process = subprocess.Popen([sys.executable, SERVER, "--port", "0", "-j", str(workers),
+                                "--max-queue", str(max_queue), "--quiet"],
+                               stdout=subprocess.PIPE, text=True)
+    # Wait for "Serving on http://host:port with ..."; PyMuPDF may print first
+    for line in process.stdout:
+        if line.startswith("Serving on"):
+            return process, line.split()[2]
+    raise RuntimeError(f"The server exited with status {process.wait()}")
+
+
+def report(rows, wall_seconds, concurrency):
+    ok = sorted(row['seconds'] for row in rows if row['status'] == 200)
+    statuses = {}
+    for row in rows:
+        statuses[str(row['status'])] = statuses.get(str(row['status']), 0) + 1
+    return {
+        'requests': len(rows),
+        'concurrency': concurrency,
+        'wall_seconds': round(wall_seconds, 3),
+        'requests_per_second': round(len(ok) / wall_seconds, 2) if wall_seconds else None,
+        'rejected_429': statuses.get("429", 0),
+        'statuses': statuses,
+        'latency_seconds': {
+            'median': round(statistics.median(ok), 4),
+            'p95': round(ok[min(len(ok) - 1, int(len(ok) * 0.95))], 4),
+            'p99': round(ok[min(len(ok) - 1, int(len(ok) * 0.99))], 4),
+            'max': round(ok[-1], 4),
+        } if ok else None,
+        'bytes_received': sum(row['bytes'] for row in rows if row['status'] == 200),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="service to test, e.g. http://127.0.0.1:8502")
+    parser.add_argument("--start-server", action="store_true", help="run a server for the test instead of --url")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="workers of a started server")
+    parser.add_argument("--max-queue", type=int, default=16, help="queue limit of a started server")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="client threads")
+    parser.add_argument("-n", "--requests", type=int, default=100, help="requests in total")
+    parser.add_argument("--kind", default="text", choices=corpus.KINDS, help="corpus kind of the mother document")
+    parser.add_argument("--pages", type=int, default=10, help="pages of the mother document")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("-o", "--output", help="results file to write")
+    args = parser.parse_args(argv)
+    if not args.url and not args.start_server:
+        parser.error("give --url or --start-server")
+
+    body, content_type = merge_request(args.corpus_dir, args.kind, args.pages)
+    process = None
+    url = args.url
+    if args.start_server:
+        process, url = start_server(args.workers, args.max_queue)
+    try:
+        counter, lock, rows = [args.requests], threading.Lock(), []
+        threads = [threading.Thread(target=client, args=(url, body, content_type, counter, lock, rows))
+                   for _ in range(args.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = report(rows, time.perf_counter() - started, args.concurrency)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latency = summary['latency_seconds'] or {}
+    print(f"{summary['requests']} requests, {args.concurrency} clients, {summary['wall_seconds']:.2f}s: "
+          f"{summary['requests_per_second']} req/s, median {latency.get('median')}s, "
+          f"p95 {latency.get('p95')}s, {summary['rejected_429']} rejected (429)")
+    print(f"Statuses: {summary['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(dict(summary, url=url, kind=args.kind, pages=args.pages,
+                           input_bytes=len(body)), f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0 if summary['statuses'].get("200") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
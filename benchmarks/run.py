@@ -0,0 +1,220 @@
+"""Benchmark the PDF engine on the synthetic corpus.
+
+Each case runs in a fresh child process so the peak RSS belongs to that
+case alone, and the engine's caches are emptied before every repeat so
+each run parses its documents from scratch. Results go to a JSON file that can be
+compared against another revision's::
+
+    python -m benchmarks.run --sizes 10,1000 -o results/new.json
+    python -m benchmarks.run --compare results/old.json results/new.json
+
+The web app's helpers (get_pdf_info, run_merge_job, run_removal_job,
+safe_pdf_to_images, parse_page_numbers) are thin Streamlit wrappers, so
+the engine functions behind them are measured.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import corpus
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), ".corpus")
+FUNCTIONS = ("get_page_count", "remove_pages", "merge_pdfs", "render_thumbnails", "parse_page_numbers")
+REGRESSION_THRESHOLD = 0.10
+# Timings this close together are noise, whatever their ratio
+NOISE_FLOOR_SECONDS = 0.001
+
+
+# ============================================================================
+# WORKLOADS
+# ============================================================================
+
+def removal_string(pages):
+    """Every third page as short ranges, e.g. "1-2, 4-5, ..." """
+    return ", ".join(f"{i}-{i + 1}" for i in range(1, pages, 3))
+
+
+def workload(function, path, pages, corpus_dir, backend):
+    """Build the zero-argument callable for one case and its output-size probe"""
+    import pdf_engine
+    import previews
+
+    if function == "get_page_count":
+        return lambda: pdf_engine.get_page_count(pdf_engine.source_from_path(path)), lambda result: None
+
+    if function == "remove_pages":
+        removal = pdf_engine.parse_page_numbers(f"1-{max(1, pages // 2)}")
+        return (lambda: pdf_engine.remove_pages(pdf_engine.source_from_path(path), removal, backend=backend),
+                len)
+
+    if function == "merge_pdfs":
+        insert_path = corpus.ensure(corpus_dir, "text", 10)
+
+        def merge():
+            job = pdf_engine.MergeJob(
+                mother=pdf_engine.source_from_path(path),
+                insertions=[
+                    pdf_engine.Insertion(pdf_engine.source_from_path(insert_path), 1),
+                    pdf_engine.Insertion(pdf_engine.source_from_path(insert_path), pages // 2),
+                ],
+            )
+            return pdf_engine.merge_pdfs(job, backend=backend)
+        return merge, lambda result: result.size
+
+    if function == "render_thumbnails":
+        def render():
+            source = pdf_engine.source_from_path(path)
+            return [image for _, image in previews.render_thumbnails(source, range(min(pages, 10)))]
+        return render, lambda images: sum(len(image.tobytes()) for image in images)
+
+    if function == "parse_page_numbers":
+        text = removal_string(pages)
+        return lambda: pdf_engine.parse_page_numbers(text), lambda result: None
+
+    raise ValueError(f"unknown function {function!r}")
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def clear_caches():
+    """Forget parsed documents and rendered pages so the next run starts cold"""
+    import doc_cache
+    import previews
+
+    doc_cache.document_cache.clear()
+    previews.thumbnail_cache.clear()
+
+
+def measure(function, path, pages, corpus_dir, backend, repeat, results):
+    """Child-process body: time one case and send back its metrics"""
+    try:
+        fn, output_size = workload(function, path, pages, corpus_dir, backend)
+        timings = []
+        result = None
+        for _ in range(repeat):
+            clear_caches()
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        results.put({
+            'wall_seconds': round(min(timings), 6),
+            'peak_rss_kb': peak_rss_kb(),
+            'output_bytes': output_size(result),
+        })
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def run_case(context, function, kind, pages, corpus_dir, backend, repeat):
+    path = corpus.ensure(corpus_dir, kind, pages)
+    results = context.Queue()
+    child = context.Process(target=measure, args=(function, path, pages, corpus_dir, backend, repeat, results))
+    child.start()
+    metrics = results.get()
+    child.join()
+    return dict(case=f"{function}/{kind}/{pages}", function=function, kind=kind, pages=pages,
+                input_bytes=os.path.getsize(path), **metrics)
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(old_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Print per-case changes between two result files; returns the regression count"""
+    with open(old_path) as f:
+        old = {row['case']: row for row in json.load(f)['results']}
+    with open(new_path) as f:
+        new = {row['case']: row for row in json.load(f)['results']}
+
+    regressions = 0
+    print(f"{'case':<40} {'old s':>10} {'new s':>10} {'change':>8} {'old RSS MB':>11} {'new RSS MB':>11}")
+    for case in sorted(old.keys() & new.keys()):
+        a, b = old[case], new[case]
+        if 'error' in a or 'error' in b:
+            print(f"{case:<40} {'error':>10}")
+            continue
+        change = (b['wall_seconds'] - a['wall_seconds']) / a['wall_seconds'] if a['wall_seconds'] else 0.0
+        flag = ""
+        if abs(b['wall_seconds'] - a['wall_seconds']) < NOISE_FLOOR_SECONDS:
+            pass
+        elif change > threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        rss = [f"{row['peak_rss_kb'] / 1024:.0f}" if row.get('peak_rss_kb') else "-" for row in (a, b)]
+        print(f"{case:<40} {a['wall_seconds']:>10.4f} {b['wall_seconds']:>10.4f} {change:>+8.1%} "
+              f"{rss[0]:>11} {rss[1]:>11}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", default=",".join(FUNCTIONS), help="comma-separated functions to time")
+    parser.add_argument("--kinds", default=",".join(corpus.KINDS), help="comma-separated corpus kinds")
+    parser.add_argument("--sizes", default=",".join(map(str, corpus.SIZES)), help="comma-separated page counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is kept")
+    parser.add_argument("--backend", default=None, help="merge backend for removal and merge cases")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="results file to write")
+    parser.add_argument("--label", help="name for this run (defaults to the git revision)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare) else 0
+
+    # Fork gives cheap, cold children; fall back to spawn where it is unavailable
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    results = []
+    for kind in args.kinds.split(","):
+        for pages in map(int, args.sizes.split(",")):
+            for function in args.functions.split(","):
+                row = run_case(context, function, kind, pages, args.corpus_dir, args.backend, args.repeat)
+                results.append(row)
+                detail = row.get('error') or f"{row['wall_seconds']:.4f}s, peak RSS {row['peak_rss_kb']} KB"
+                print(f"{row['case']:<40} {detail}", flush=True)
+
+    report = {
+        'label': args.label or git_revision(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend or "default",
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
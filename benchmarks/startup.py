@@ -0,0 +1,138 @@
+"""Measure the web app's cold start and per-rerun script time.
+
+Each scenario runs in a fresh child process through Streamlit's AppTest, so
+the first run pays for every import the way a new server process would.
+Later runs are the reruns Streamlit performs on each widget interaction::
+
+    python -m benchmarks.startup --reruns 20 -o results/startup.json
+
+The "remove" scenario types into the page-removal input before every
+rerun, which is what a keystroke there costs. Markdown bytes are the text
+sent through st.markdown on the final run, CSS included.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import subprocess
+import time
+
+# Not benchmarks.run or corpus: both import PyMuPDF, which would spoil the
+# cold-start figures of the child processes
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(__file__), ".corpus")
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SCENARIOS = ("home", "merge", "remove")
+# Libraries the home page should not need
+HEAVY_MODULES = ("fitz", "pypdf", "PIL", "pikepdf")
+
+
+def open_scenario(at, scenario, corpus_dir):
+    """Bring a fresh AppTest to the screen being measured"""
+    if scenario == "merge":
+        at.button(key="merge_tool").click().run()
+    elif scenario == "remove":
+        import blob_store
+        import pdf_engine
+        from benchmarks import corpus
+
+        at.button(key="remove_tool").click().run()
+        path = corpus.ensure(corpus_dir, "text", 10)
+        with open(path, 'rb') as f:
+            handle = blob_store.upload_store.put(at.session_state['session_id'], "sample.pdf",
+                                                 io.BytesIO(f.read()))
+        info = pdf_engine.probe(pdf_engine.source_from_path(handle.path))
+        at.session_state['remove_pdf'] = {'name': handle.name, 'handle': handle, 'pages': info.page_count,
+                                          'size': handle.size, 'version': info.version,
+                                          'encrypted': info.encrypted}
+        at.run()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP)).stdout.strip()
+    except OSError:
+        return None
+
+
+def interact(at, scenario, n):
+    if scenario == "remove":
+        at.text_input(key="remover_remove_pages").input(f"1-{n % 5 + 1}")
+    at.run()
+
+
+def measure(scenario, reruns, corpus_dir, results):
+    """Child-process body: time the first run and `reruns` reruns of one scenario"""
+    try:
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(APP, default_timeout=60)
+        at.session_state['session_id'] = f"startup-bench-{os.getpid()}"
+        started = time.perf_counter()
+        at.run()
+        cold = time.perf_counter() - started
+        heavy_after_start = [name for name in HEAVY_MODULES if name in sys.modules]
+
+        open_scenario(at, scenario, corpus_dir)
+        timings = []
+        for n in range(reruns):
+            started = time.perf_counter()
+            interact(at, scenario, n)
+            timings.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+        import blob_store
+        blob_store.upload_store.drop_session(at.session_state['session_id'])
+        timings.sort()
+        results.put({
+            'cold_start_seconds': round(cold, 4),
+            'rerun_median_seconds': round(statistics.median(timings), 4),
+            'rerun_p95_seconds': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+            'markdown_bytes': sum(len(element.value.encode()) for element in at.markdown),
+            'heavy_modules_at_start': heavy_after_start,
+        })
+    except Exception as e:
+        results.put({'error': f"{type(e).__name__}: {e}"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenarios")
+    parser.add_argument("--reruns", type=int, default=20, help="reruns timed per scenario")
+    parser.add_argument("--corpus-dir", default=DEFAULT_CORPUS_DIR)
+    parser.add_argument("-o", "--output", help="results file to write")
+    parser.add_argument("--label", help="name for this run (defaults to the git revision)")
+    args = parser.parse_args(argv)
+
+    # Spawn, so every child starts without the parent's imports
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    print(f"{'scenario':<10} {'cold s':>8} {'rerun s':>9} {'p95 s':>8} {'markdown KB':>12}  heavy modules at start")
+    for scenario in args.scenarios.split(","):
+        results = context.Queue()
+        child = context.Process(target=measure, args=(scenario, args.reruns, args.corpus_dir, results))
+        child.start()
+        row = dict(scenario=scenario, **results.get())
+        child.join()
+        rows.append(row)
+        if 'error' in row:
+            print(f"{scenario:<10} {row['error']}")
+            continue
+        print(f"{scenario:<10} {row['cold_start_seconds']:>8.3f} {row['rerun_median_seconds']:>9.4f} "
+              f"{row['rerun_p95_seconds']:>8.4f} {row['markdown_bytes'] / 1024:>12.1f}  "
+              f"{', '.join(row['heavy_modules_at_start']) or '-'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'label': args.label or git_revision(), 'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       'reruns': args.reruns, 'results': rows}, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 1 if any('error' in row for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
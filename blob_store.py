@@ -0,0 +1,203 @@
+"""Disk-backed store for uploaded PDFs.
+
+Uploads are streamed into a per-session directory under a temp root and
+named by their SHA-256, so session state only has to hold small handles.
+Each session has a byte quota, sessions idle for longer than the TTL are
+swept away together with their merged outputs, and the engine reads blobs
+back through read-only memory maps.
+"""
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+CHUNK_SIZE = 1024 * 1024
+ACTIVITY_MARKER = ".last_seen"
+OUTPUTS_DIR = "outputs"
+PREPARED_DIR = "prepared"
+
+DEFAULT_ROOT = os.environ.get("PDF_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "pdf_tools_hub"))
+DEFAULT_SESSION_QUOTA = int(os.environ.get("PDF_SESSION_QUOTA_MB", "1024")) * 1024 * 1024
+DEFAULT_TTL = int(os.environ.get("PDF_SESSION_TTL_MINUTES", "120")) * 60
+SWEEP_INTERVAL = 5 * 60
+
+
+class QuotaExceeded(Exception):
+    """An upload would take a session over its byte quota"""
+
+
+class BlobNotFound(Exception):
+    """A handle points at a blob that has been swept or deleted"""
+
+
+@dataclass(frozen=True)
+class BlobHandle:
+    """Reference to an uploaded file kept in session state"""
+    session_id: str
+    digest: str
+    name: str
+    size: int
+    path: str
+
+
+def pdf_files(directory):
+    """Directory entries of the .pdf files in `directory`, if it exists"""
+    if not os.path.isdir(directory):
+        return []
+    return [entry for entry in os.scandir(directory) if entry.is_file() and entry.name.endswith('.pdf')]
+
+
+class BlobStore:
+    """Per-session upload storage with quotas and idle-session cleanup"""
+
+    def __init__(self, root=DEFAULT_ROOT, session_quota=DEFAULT_SESSION_QUOTA, ttl=DEFAULT_TTL):
+        self.root = root
+        self.session_quota = session_quota
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def session_dir(self, session_id):
+        return os.path.join(self.root, session_id)
+
+    def touch(self, session_id):
+        """Record activity so the session survives the next sweep"""
+        directory = self.session_dir(session_id)
+        os.makedirs(directory, exist_ok=True)
+        marker = os.path.join(directory, ACTIVITY_MARKER)
+        with open(marker, 'a'):
+            os.utime(marker)
+
+    def upload_usage(self, session_id):
+        """Bytes of uploads held for a session"""
+        return sum(entry.stat().st_size for entry in pdf_files(self.session_dir(session_id)))
+
+    def usage(self, session_id):
+        """Bytes held for a session: uploads plus trimmed copies of them"""
+        return self.upload_usage(session_id) + sum(
+            entry.stat().st_size for entry in pdf_files(self.prepared_dir(session_id)))
+
+    def put(self, session_id, name, fileobj):
+        """Stream a file object into the store and return its handle.
+
+        Uploading the same content twice in a session stores it once.
+        Raises QuotaExceeded, leaving nothing behind, if the session would go
+        over its quota.
+        """
+        self.touch(session_id)
+        directory = self.session_dir(session_id)
+        # Trimmed copies can be rebuilt, so they make room for uploads (see prune_prepared)
+        budget = self.session_quota - self.upload_usage(session_id)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+                    size += len(chunk)
+                    if size > budget:
+                        raise QuotaExceeded(
+                            f"Upload of {name} exceeds this session's "
+                            f"{self.session_quota // (1024 * 1024)} MB storage quota"
+                        )
+                    digest.update(chunk)
+                    out.write(chunk)
+            path = os.path.join(directory, f"{digest.hexdigest()}.pdf")
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.prune_prepared(session_id)
+        return BlobHandle(session_id, digest.hexdigest(), name, size, path)
+
+    def exists(self, handle):
+        return os.path.exists(handle.path)
+
+    def open_mmap(self, handle):
+        """Read-only view of a blob's bytes backed by the OS page cache"""
+        try:
+            with open(handle.path, 'rb') as f:
+                if handle.size == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise BlobNotFound(f"{handle.name} is no longer available; please upload it again") from None
+
+    def release(self, handle):
+        """Delete a blob once nothing in its session refers to it"""
+        if os.path.exists(handle.path):
+            os.remove(handle.path)
+
+    def output_path(self, session_id, suffix='.pdf'):
+        """Fresh file path for a result produced for a session"""
+        directory = os.path.join(self.session_dir(session_id), OUTPUTS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+        os.close(fd)
+        return path
+
+    def prepared_dir(self, session_id):
+        """Directory for trimmed copies of a session's uploads"""
+        return os.path.join(self.session_dir(session_id), PREPARED_DIR)
+
+    def prune_prepared(self, session_id):
+        """Delete trimmed copies, least recently used first, until the session fits its quota.
+
+        Merges rebuild a missing copy when they need it again. Returns the
+        bytes freed.
+        """
+        excess = self.usage(session_id) - self.session_quota
+        freed = 0
+        for entry in sorted(pdf_files(self.prepared_dir(session_id)), key=lambda entry: entry.stat().st_mtime):
+            if freed >= excess:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            freed += size
+        return freed
+
+    def drop_session(self, session_id):
+        shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+
+    def sweep(self, now=None):
+        """Remove sessions idle for longer than the TTL; returns how many"""
+        now = time.time() if now is None else now
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            marker = os.path.join(entry.path, ACTIVITY_MARKER)
+            try:
+                last_seen = os.path.getmtime(marker)
+            except OSError:
+                last_seen = entry.stat().st_mtime
+            if now - last_seen > self.ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+
+    def maybe_sweep(self):
+        """Sweep at most once per SWEEP_INTERVAL across all sessions"""
+        with self._lock:
+            now = time.time()
+            if now - self._last_sweep < SWEEP_INTERVAL:
+                return 0
+            self._last_sweep = now
+        return self.sweep(now)
+
+
+upload_store = BlobStore()
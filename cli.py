@@ -0,0 +1,172 @@
+"""Command-line entry point for running PDF Tools Hub jobs without a browser.
+
+Usage::
+
+    python cli.py merge manifest.json [-o output.pdf] [-j WORKERS] [--backend NAME] [--no-dedupe]
+                  [--optimize PROFILE] [--linearize] [--large-file | --no-large-file] [--profile]
+    python cli.py batch MANIFEST_DIR [-o OUTPUT_DIR] [-j WORKERS] [--timeout SECONDS] [--summary PATH]
+                  [--backend NAME] [--optimize PROFILE]
+    python cli.py compare manifest.json [--json]
+    python cli.py remove input.pdf PAGES -o output.pdf [--linearize]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+import batch
+import instrumentation
+import pdf_engine
+
+
+def run_merge(args):
+    """Merge the documents described by a JSON manifest"""
+    job = pdf_engine.load_manifest(args.manifest)
+    output = args.output or job.output
+    if not output:
+        raise pdf_engine.ManifestError("No output path: set 'output' in the manifest or pass -o")
+
+    started = time.perf_counter()
+    profile = instrumentation.Profile("merge", manifest=args.manifest)
+    progress = profile.track() if args.profile else pdf_engine.no_progress
+    with profile:
+        if args.workers:
+            with tempfile.TemporaryDirectory(prefix="pdf_prepare_") as prepare_dir:
+                result = pdf_engine.merge_pdfs(job, output, progress=progress, prepare_dir=prepare_dir,
+                                               workers=args.workers, backend=args.backend, dedupe=args.dedupe,
+                                               profile=args.optimize, linearize=args.linearize,
+                                               large_file=args.large_file)
+        else:
+            result = pdf_engine.merge_pdfs(job, output, progress=progress, backend=args.backend,
+                                           dedupe=args.dedupe, profile=args.optimize, linearize=args.linearize,
+                                           large_file=args.large_file)
+
+    notes = [result.backend] + [note for flag, note in ((result.large_file, "large-file mode"),
+                                                        (result.linearized, "linearized")) if flag]
+    print(f"Wrote {output}: {result.page_count} pages, {result.size // 1024} KB "
+          f"in {time.perf_counter() - started:.2f}s ({', '.join(notes)})")
+    report = result.optimization
+    if report:
+        print(f"Optimization ({report.profile}): {report.size_before // 1024} KB -> {report.size_after // 1024} KB, "
+              f"saved {report.bytes_saved // 1024} KB in {report.seconds:.2f}s"
+              f"{'' if report.applied else ' (no gain, kept the unoptimized file)'}")
+    if args.profile:
+        profile.log(backend=result.backend, pages=result.page_count, size=result.size)
+
+
+def run_batch(args):
+    """Merge every manifest in a directory on a pool of processes"""
+    def progress(stage, done, total):
+        print(f"\r{stage}: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    summary = batch.run_batch(args.directory, output_dir=args.output_dir, workers=args.workers,
+                              timeout=args.timeout, summary_path=args.summary, progress=progress,
+                              backend=args.backend, profile=args.optimize)
+    print(file=sys.stderr)
+    for row in summary['results']:
+        if row['status'] != batch.DONE:
+            print(f"{row['status']}: {row['manifest']}: {row['error']}")
+    timing = summary['job_seconds']
+    print(f"{summary['succeeded']} of {summary['jobs']} merged ({summary['failed']} failed, "
+          f"{summary['timed_out']} timed out) in {summary['wall_seconds']:.1f}s on {summary['workers']} workers: "
+          f"{summary['jobs_per_minute']} jobs/min, {summary['pages_per_second']} pages/s")
+    print(f"Per job: median {timing['median']:.2f}s, p95 {timing['p95']:.2f}s, max {timing['max']:.2f}s; "
+          f"{summary['sources_reused']} source loads saved by worker caches")
+    return 0 if summary['succeeded'] == summary['jobs'] else 1
+
+
+def run_compare(args):
+    """Merge a manifest with every backend and print a comparison"""
+    job = pdf_engine.load_manifest(args.manifest)
+    report = pdf_engine.compare_backends(job)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'backend':<10} {'seconds':>9} {'size KB':>9} {'pages':>6}  check")
+    for row in report:
+        print(f"{row['backend']:<10} {row['seconds']:>9.3f} {row['size'] // 1024:>9} {row['page_count']:>6}  "
+              f"{'ok' if row['pages_match'] else 'PAGE COUNT MISMATCH'}")
+
+
+def run_remove(args):
+    """Delete pages from one PDF"""
+    source = pdf_engine.source_from_path(args.input)
+    result = pdf_engine.delete_pages(source, pdf_engine.parse_page_numbers(args.pages), args.output,
+                                     linearize=args.linearize)
+    print(f"Wrote {args.output}: {result.page_count} of {result.pages_before} pages kept, "
+          f"{result.size // 1024} KB ({result.bytes_freed // 1024} KB freed)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="PDF Tools Hub batch commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    merge = commands.add_parser("merge", help="merge PDFs from a JSON manifest")
+    merge.add_argument("manifest", help="path to the merge manifest")
+    merge.add_argument("-o", "--output", help="output PDF (overrides the manifest's 'output')")
+    merge.add_argument("-j", "--workers", type=int,
+                       help="prepare documents on up to this many processes before merging "
+                            "(at most PDF_PREPARE_WORKERS or the CPU count)")
+    merge.add_argument("--backend", choices=["auto", *pdf_engine.BACKENDS],
+                       help="merge library (default: PDF_MERGE_BACKEND or auto)")
+    merge.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                       help="copy each source's fonts and images even when identical to another's")
+    merge.add_argument("--optimize", choices=list(pdf_engine.OPTIMIZATION_PROFILES),
+                       help="output optimization profile (default: PDF_OUTPUT_PROFILE or fast)")
+    merge.add_argument("--linearize", action="store_true",
+                       help="write a linearized (fast web view) file; needs pikepdf or qpdf")
+    merge.add_argument("--large-file", dest="large_file", action="store_true", default=None,
+                       help="build the output on disk without loading whole documents "
+                            "(default: automatic above PDF_LARGE_FILE_MB, 200 MB)")
+    merge.add_argument("--no-large-file", dest="large_file", action="store_false",
+                       help="never use large-file mode")
+    merge.add_argument("--profile", action="store_true",
+                       help="log per-stage timings as JSON (to PDF_METRICS_LOG or stderr)")
+    merge.set_defaults(func=run_merge)
+
+    batch_parser = commands.add_parser("batch", help="merge every manifest in a directory in parallel")
+    batch_parser.add_argument("directory", help="directory of *.json merge manifests")
+    batch_parser.add_argument("-o", "--output-dir",
+                              help="write each result here as <manifest name>.pdf (default: each manifest's 'output')")
+    batch_parser.add_argument("-j", "--workers", type=int, help="merge this many manifests at once (default: CPU count)")
+    batch_parser.add_argument("--timeout", type=float, default=batch.DEFAULT_TIMEOUT,
+                              help="seconds per manifest, 0 for no limit (default: PDF_BATCH_TIMEOUT_SECONDS or 600)")
+    batch_parser.add_argument("--summary", help=f"summary JSON to write (default: {batch.SUMMARY_NAME} "
+                                                "in the output or manifest directory)")
+    batch_parser.add_argument("--backend", choices=["auto", *pdf_engine.BACKENDS],
+                              help="merge library (default: PDF_MERGE_BACKEND or auto)")
+    batch_parser.add_argument("--optimize", choices=list(pdf_engine.OPTIMIZATION_PROFILES),
+                              help="output optimization profile (default: PDF_OUTPUT_PROFILE or fast)")
+    batch_parser.set_defaults(func=run_batch)
+
+    compare = commands.add_parser("compare", help="merge a manifest with every backend and compare")
+    compare.add_argument("manifest", help="path to the merge manifest")
+    compare.add_argument("--json", action="store_true", help="print the report as JSON")
+    compare.set_defaults(func=run_compare)
+
+    remove = commands.add_parser("remove", help="delete pages from a PDF")
+    remove.add_argument("input", help="PDF to remove pages from")
+    remove.add_argument("pages", help='pages to remove, e.g. "1, 3, 5-8, 20-, last"')
+    remove.add_argument("-o", "--output", required=True, help="output PDF")
+    remove.add_argument("--linearize", action="store_true", help="write a linearized (fast web view) file")
+    remove.set_defaults(func=run_remove)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        status = args.func(args)
+    except pdf_engine.PdfEngineError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return status or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
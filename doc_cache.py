@@ -0,0 +1,119 @@
+"""Process-wide LRU cache of parsed PDF documents.
+
+Entries are keyed by the kind of parser plus the SHA-256 of the document
+bytes, so every Streamlit session that uploads the same file shares one
+parsed copy. Parsed documents are not thread-safe, so callers borrow them
+through ``lease``, which holds a per-entry lock for the duration of use.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+DEFAULT_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("value", "cost", "lock")
+
+    def __init__(self, value, cost):
+        self.value = value
+        self.cost = cost
+        self.lock = threading.RLock()
+
+
+class DocumentCache:
+    """LRU cache bounded by the estimated memory cost of its entries"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def _get_or_load_entry(self, key, loader, cost):
+        entry = self._get_entry(key)
+        if entry is not None:
+            return entry
+
+        # One loader per key: concurrent sessions asking for the same
+        # document wait for the first parse instead of repeating it.
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                return entry
+            try:
+                value = loader()
+            except BaseException:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+            entry = _Entry(value, cost(value) if callable(cost) else cost)
+            with self._lock:
+                self.misses += 1
+                self._load_locks.pop(key, None)
+                if entry.cost <= self.max_bytes:
+                    self._entries[key] = entry
+                    self.current_bytes += entry.cost
+                    self._evict()
+            return entry
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.cost
+            self.evictions += 1
+
+    @contextmanager
+    def lease(self, key, loader, cost):
+        """Borrow the cached value for `key`, loading it on a miss.
+
+        `cost` is the entry's size in bytes, or a function computing it from
+        the loaded value. Entries larger than the whole budget are loaded but
+        never stored. An entry evicted while leased stays valid for the current holder.
+        """
+        entry = self._get_or_load_entry(key, loader, cost)
+        with entry.lock:
+            yield entry.value
+
+    def resize(self, max_bytes):
+        """Change the budget, evicting immediately if it shrank"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Snapshot of the cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+document_cache = DocumentCache()
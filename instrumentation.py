@@ -0,0 +1,159 @@
+"""Per-stage timing and memory figures for PDF operations.
+
+A ``Profile`` splits one operation (an upload, a merge) into consecutive
+stages and records each stage's wall time, the CPU time of the thread doing
+the work and, when memory tracing is on, the tracemalloc peak. It can follow
+an engine progress callback, so a merge is broken down by the stages the
+engine already reports. Finished profiles are written as one JSON line to
+the ``pdf_tools.metrics`` logger so slow operations can be diagnosed from
+server logs.
+
+tracemalloc only sees memory allocated through Python; buffers MuPDF
+allocates in C are not counted. Tracing is process-wide, so the peaks of
+operations running at the same time include each other's allocations, and
+preparation done in worker processes is timed but not traced.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Tracing roughly doubles the cost of Python allocations, so it is opt-in
+TRACE_MEMORY = os.environ.get("PDF_PROFILE_MEMORY", "0") == "1"
+
+logger = logging.getLogger("pdf_tools.metrics")
+
+
+def _configure_logger():
+    """One JSON object per line, to PDF_METRICS_LOG or stderr"""
+    if logger.handlers:
+        return
+    path = os.environ.get("PDF_METRICS_LOG")
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+_configure_logger()
+
+# Profiles tracing memory at the moment; tracing stops when the last one ends
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+
+
+class Profile:
+    """Stage-by-stage measurements of one operation.
+
+    Use as a context manager; stages are opened with ``stage()``,
+    ``start_stage()`` or by the callback from ``track()``, and each one
+    ends when the next begins or the profile finishes.
+    """
+
+    def __init__(self, operation, trace_memory=TRACE_MEMORY, **context):
+        self.operation = operation
+        self.context = context
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.status = None
+        self.total_seconds = None
+        self._current = None
+        self._started = None
+
+    def __enter__(self):
+        if self.trace_memory:
+            _start_tracing()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish("done" if exc_type is None else f"failed: {exc_type.__name__}")
+        return False
+
+    def start_stage(self, name):
+        """End the running stage, if any, and start timing `name`"""
+        self._end_stage()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._current = (name, time.perf_counter(), time.thread_time())
+
+    def _end_stage(self):
+        if self._current is None:
+            return
+        name, wall_started, cpu_started = self._current
+        self._current = None
+        self.stages.append({
+            'stage': name,
+            'wall_seconds': round(time.perf_counter() - wall_started, 6),
+            'cpu_seconds': round(time.thread_time() - cpu_started, 6),
+            'peak_kb': tracemalloc.get_traced_memory()[1] // 1024 if self.trace_memory else None,
+        })
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body of a with-block as one stage"""
+        self.start_stage(name)
+        try:
+            yield
+        finally:
+            self._end_stage()
+
+    def track(self, progress=None):
+        """Progress callback that opens a stage whenever the reported stage changes.
+
+        Calls are forwarded to `progress`, so exceptions it raises (such as a
+        cancellation) still abort the operation.
+        """
+        def callback(stage, done, total):
+            if self._current is None or self._current[0] != stage:
+                self.start_stage(stage)
+            if progress is not None:
+                progress(stage, done, total)
+        return callback
+
+    def finish(self, status="done"):
+        """Close the last stage and stop tracing; safe to call twice"""
+        if self.status is not None:
+            return
+        self._end_stage()
+        self.status = status
+        self.total_seconds = round(time.perf_counter() - self._started, 6)
+        if self.trace_memory:
+            _stop_tracing()
+
+    def as_dict(self, **extra):
+        return {
+            'event': 'profile',
+            'operation': self.operation,
+            **self.context,
+            **extra,
+            'status': self.status,
+            'total_seconds': self.total_seconds,
+            'stages': list(self.stages),
+        }
+
+    def log(self, **extra):
+        """Write the profile as one JSON log line; `extra` adds top-level fields"""
+        record = self.as_dict(**extra)
+        logger.info(json.dumps(record, default=str))
+        return record
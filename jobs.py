@@ -0,0 +1,200 @@
+"""Background execution of long-running PDF jobs.
+
+Jobs run on a process-wide thread pool so a multi-minute merge neither
+blocks the Streamlit script thread nor dies with the rerun that started it.
+The job function receives its ``Job`` and reports progress through
+``job.report``; that call is also where cancellation takes effect. Sessions
+keep only the job id and pick the result up on a later rerun.
+
+Jobs are admitted in submission order, each with an estimate of the memory
+it will use. A job starts once a worker is free and its estimate fits in
+what the running jobs leave of the process-wide memory budget; until then
+it waits with a queue position sessions can show. A job larger than the
+whole budget runs alone.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Finished jobs nobody picked up are dropped after this many seconds
+FINISHED_JOB_TTL = 60 * 60
+
+# Memory the jobs running at once may use between them ("0" for no limit)
+MEMORY_BUDGET = int(os.environ.get("PDF_JOB_MEMORY_MB", "1024")) * 1024 * 1024
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+
+class Job:
+    """State of one background job, safe to read from any thread"""
+
+    def __init__(self, description, memory=0):
+        self.id = uuid.uuid4().hex
+        self.description = description
+        self.memory = memory
+        self.position = 0
+        self.status = QUEUED
+        self.stage = "queued"
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Ask the job to stop at its next progress report"""
+        self._cancel.set()
+
+    def report(self, stage, done, total):
+        """Progress callback for job functions; raises JobCancelled on request"""
+        self.stage = stage
+        self.done = done
+        self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool within a memory budget and keeps their state by id"""
+
+    def __init__(self, max_workers, memory_budget=MEMORY_BUDGET):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pdf-job")
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget
+        self._jobs = {}
+        self._waiting = deque()
+        self._running = set()
+        self._memory_in_use = 0
+        self._lock = threading.Lock()
+
+    def submit(self, description, fn, *args, memory=0, **kwargs):
+        """Queue `fn(job, *args, **kwargs)`, expected to need `memory` bytes, and return its Job"""
+        job = Job(description, memory)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            self._waiting.append((job, fn, args, kwargs))
+            self._admit()
+        return job
+
+    def _fits(self, job):
+        if not self._running:
+            return True
+        if len(self._running) >= self.max_workers:
+            return False
+        return not self.memory_budget or self._memory_in_use + job.memory <= self.memory_budget
+
+    def _admit(self):
+        """Start waiting jobs in order while they fit; called with the lock held"""
+        while self._waiting:
+            job, fn, args, kwargs = self._waiting[0]
+            if job.cancel_requested:
+                self._waiting.popleft()
+                job.status = CANCELLED
+                job.finished = time.time()
+                continue
+            if not self._fits(job):
+                break
+            self._waiting.popleft()
+            job.position = 0
+            self._running.add(job)
+            self._memory_in_use += job.memory
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        for position, (job, _, _, _) in enumerate(self._waiting, 1):
+            job.position = position
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+        else:
+            job.status = RUNNING
+            try:
+                job.result = fn(job, *args, **kwargs)
+                job.status = DONE
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+        job.finished = time.time()
+        with self._lock:
+            self._running.discard(job)
+            self._memory_in_use -= job.memory
+            self._admit()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        """Drop a job once its result has been collected"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def cancel(self, job_id):
+        """Cancel a job; one still waiting for admission leaves the queue at once"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.cancel()
+            for entry in self._waiting:
+                if entry[0] is job:
+                    self._waiting.remove(entry)
+                    job.position = 0
+                    job.status = CANCELLED
+                    job.finished = time.time()
+                    break
+            self._admit()
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_TTL
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.is_finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.is_finished)
+
+    def utilization(self):
+        """Running and waiting jobs and the share of the memory budget in use"""
+        with self._lock:
+            return {
+                'running': len(self._running),
+                'waiting': len(self._waiting),
+                'workers': self.max_workers,
+                'memory_in_use_mb': round(self._memory_in_use / (1024 * 1024), 1),
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1) if self.memory_budget else None,
+                'memory_used': round(self._memory_in_use / self.memory_budget, 3) if self.memory_budget else None,
+            }
+
+
+job_manager = JobManager(max_workers=int(os.environ.get("PDF_JOB_WORKERS", "2")))
@@ -0,0 +1,1577 @@
+"""Headless PDF engine behind the Streamlit app.
+
+Nothing in this module touches Streamlit. Failures are raised as
+``PdfEngineError`` subclasses so the caller (the web UI or the command line)
+decides how to report them.
+"""
+from __future__ import annotations
+
+import bisect
+import difflib
+import hashlib
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from io import BytesIO
+from itertools import islice
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import fitz  # PyMuPDF
+import pypdf
+
+try:
+    import pikepdf  # optional, for linearized output
+except ImportError:
+    pikepdf = None
+
+from doc_cache import document_cache
+from pdf_probe import PdfInfo, probe_pdf
+
+# Progress callbacks receive (stage, done, total) and may raise to abort
+ProgressCallback = Callable[[str, int, int], None]
+
+# Rough memory cost of a parsed document relative to its file size, used to
+# account cache entries against the cache's byte budget.
+READER_COST_FACTOR = 2
+FITZ_COST_FACTOR = 1
+# MuPDF documents opened by path read streams from the file when needed and
+# keep little more than their object tables in memory
+FITZ_PATH_COST_FACTOR = 0.1
+
+# Page selections beyond these limits are rejected before any work is done
+MAX_PAGE_NUMBER = 1_000_000
+MAX_SELECTION_LENGTH = 100_000
+
+
+# ============================================================================
+# ERRORS
+# ============================================================================
+
+class PdfEngineError(Exception):
+    """Base class for every error raised by the engine"""
+
+
+class PageSelectionError(PdfEngineError, ValueError):
+    """A page selection string could not be parsed"""
+
+
+class PdfReadError(PdfEngineError):
+    """A source document could not be opened or parsed"""
+
+
+class ManifestError(PdfEngineError):
+    """A merge manifest is missing fields or points at missing files"""
+
+
+# ============================================================================
+# DATA TYPES
+# ============================================================================
+
+class PageSet:
+    """A set of 1-based page numbers kept as sorted, disjoint ranges.
+
+    Memory and parsing cost grow with the number of ranges, not pages, and
+    membership is a binary search. A parsed selection may be open-ended
+    ("10-") or name the last page ("last"); `resolve` pins it to a
+    document's page count, after which it can be counted, iterated and,
+    for "last", tested for membership.
+    """
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = (), open_from: Optional[int] = None,
+                 includes_last: bool = False):
+        self.open_from = open_from
+        self.includes_last = includes_last
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        for start, end in sorted(ranges):
+            if open_from is not None:
+                if start >= open_from:
+                    break
+                end = min(end, open_from - 1)
+            if self._ends and start <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], end)
+            else:
+                self._starts.append(start)
+                self._ends.append(end)
+
+    @classmethod
+    def from_pages(cls, pages: Iterable[int]) -> PageSet:
+        return cls((page, page) for page in pages)
+
+    @classmethod
+    def coerce(cls, pages: Union[PageSet, Iterable[int], None]) -> PageSet:
+        """A PageSet for a selection given as a PageSet, a page list or None"""
+        if isinstance(pages, PageSet):
+            return pages
+        return cls.from_pages(pages or ())
+
+    @property
+    def is_resolved(self) -> bool:
+        return self.open_from is None and not self.includes_last
+
+    def resolve(self, page_count: int) -> PageSet:
+        """The pages of this selection that exist in a `page_count`-page document"""
+        ranges = [(max(start, 1), min(end, page_count)) for start, end in self.ranges()
+                  if start <= page_count and end >= 1]
+        if self.open_from is not None and self.open_from <= page_count:
+            ranges.append((self.open_from, page_count))
+        if self.includes_last and page_count >= 1:
+            ranges.append((page_count, page_count))
+        return PageSet(ranges)
+
+    def ranges(self) -> List[Tuple[int, int]]:
+        """The closed (first, last) ranges, excluding any open-ended tail"""
+        return list(zip(self._starts, self._ends))
+
+    def __contains__(self, page: int) -> bool:
+        if self.open_from is not None and page >= self.open_from:
+            return True
+        i = bisect.bisect_right(self._starts, page) - 1
+        if i >= 0 and page <= self._ends[i]:
+            return True
+        # Any page not listed could still be the last one
+        if self.includes_last:
+            raise ValueError("Selections naming the last page must be resolved before testing membership")
+        return False
+
+    def __bool__(self) -> bool:
+        return bool(self._starts) or not self.is_resolved
+
+    def __len__(self) -> int:
+        if not self.is_resolved:
+            raise ValueError("Open-ended page selections must be resolved before counting")
+        return sum(end - start + 1 for start, end in self.ranges())
+
+    def __iter__(self) -> Iterator[int]:
+        if not self.is_resolved:
+            raise ValueError("Open-ended page selections must be resolved before iterating")
+        for start, end in self.ranges():
+            yield from range(start, end + 1)
+
+    def _key(self):
+        return tuple(self._starts), tuple(self._ends), self.open_from, self.includes_last
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PageSet) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __str__(self) -> str:
+        parts = [str(start) if start == end else f"{start}-{end}" for start, end in self.ranges()]
+        if self.open_from is not None:
+            parts.append(f"{self.open_from}-")
+        if self.includes_last:
+            parts.append("last")
+        return ", ".join(parts)
+
+    def __repr__(self) -> str:
+        return f"PageSet({str(self)!r})"
+
+
+# Pages to remove, as a PageSet or a plain list of 1-based page numbers
+PageSelection = Union[PageSet, Sequence[int]]
+
+
+@dataclass
+class PdfSource:
+    """A PDF document handed to the engine.
+
+    `data` is anything bytes-like; uploads held on disk arrive as read-only
+    memory maps, with `path` naming the file for libraries that open by name.
+    """
+    name: str
+    data: bytes
+    page_count: Optional[int] = None
+    digest: Optional[str] = None
+    path: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def content_hash(self) -> str:
+        """SHA-256 of the document bytes, computed once per source"""
+        if self.digest is None:
+            self.digest = content_digest(self.data)
+        return self.digest
+
+
+@dataclass
+class Insertion:
+    """A document inserted after `after_page` of the (trimmed) mother PDF"""
+    source: PdfSource
+    after_page: int
+    remove_pages: PageSelection = field(default_factory=PageSet)
+
+
+@dataclass
+class Segment:
+    """A run of pages taken from one source, in output order"""
+    source: PdfSource
+    page_indices: List[int]
+
+
+@dataclass
+class MergeJob:
+    """Everything needed to produce one consolidated PDF"""
+    mother: PdfSource
+    insertions: List[Insertion] = field(default_factory=list)
+    mother_remove_pages: PageSelection = field(default_factory=PageSet)
+    output: Optional[str] = None
+
+
+@dataclass
+class MergeResult:
+    """The merged document plus what went into it.
+
+    `data` holds the bytes when the merge was written to memory, `path` the
+    file when it was written to disk.
+    """
+    page_count: int
+    segments: List[Segment]
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    backend: Optional[str] = None
+    optimization: Optional[OptimizationReport] = None
+    # Set for unoptimized files on disk, which the next merge can update
+    base: Optional[MergeBase] = None
+    # Pages taken over from the previous merge instead of copied again
+    reused_pages: int = 0
+    # Checked to start with a valid linearization dictionary
+    linearized: bool = False
+    # Built in large-file mode, without holding whole documents in memory
+    large_file: bool = False
+
+
+@dataclass
+class RemovalResult:
+    """A document written without some of its pages"""
+    pages_before: int
+    page_count: int
+    size_before: int
+    size: int
+    path: str
+    linearized: bool = False
+
+    @property
+    def bytes_freed(self) -> int:
+        return self.size_before - self.size
+
+
+@dataclass
+class OptimizationReport:
+    """What an output optimization pass cost and saved"""
+    profile: str
+    seconds: float
+    size_before: int
+    size_after: int
+    # False when the optimized file came out larger and the original was kept
+    applied: bool = True
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.size_before - self.size_after
+
+
+# ============================================================================
+# PAGE SELECTION
+# ============================================================================
+
+def _page_number(text: str) -> int:
+    number = int(text)
+    if not 1 <= number <= MAX_PAGE_NUMBER:
+        raise PageSelectionError(f"Page {number} is out of range; pages are numbered from 1 to {MAX_PAGE_NUMBER:,}")
+    return number
+
+
+def parse_page_numbers(page_string: str) -> PageSet:
+    """Parse a selection like "1, 3, 5-8, 20-, last" into a PageSet.
+
+    "N-" runs to the end of the document and "last" is its final page.
+    Runs in time proportional to the number of ranges however many pages
+    they span.
+    """
+    if not page_string or not page_string.strip():
+        return PageSet()
+    if len(page_string) > MAX_SELECTION_LENGTH:
+        raise PageSelectionError(f"Page selection is too long (over {MAX_SELECTION_LENGTH:,} characters)")
+
+    ranges = []
+    open_from = None
+    includes_last = False
+    for part in page_string.split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        try:
+            if part == 'last':
+                includes_last = True
+            elif '-' in part:
+                start_text, end_text = (text.strip() for text in part.split('-', 1))
+                start = _page_number(start_text)
+                if end_text in ('', 'last'):
+                    open_from = start if open_from is None else min(open_from, start)
+                else:
+                    end = _page_number(end_text)
+                    if end < start:
+                        raise PageSelectionError(f"Page range {part!r} runs backwards")
+                    ranges.append((start, end))
+            else:
+                page = _page_number(part)
+                ranges.append((page, page))
+        except PageSelectionError:
+            raise
+        except ValueError:
+            raise PageSelectionError(
+                f"Invalid page selection {part!r}. Use comma-separated numbers like: 1, 3, 5-8, 10-, last"
+            ) from None
+    return PageSet(ranges, open_from, includes_last)
+
+
+def kept_page_indices(page_count: int, pages_to_remove: Optional[PageSelection]) -> List[int]:
+    """Zero-based indices of the pages that survive a removal"""
+    kept = []
+    next_index = 0
+    for start, end in PageSet.coerce(pages_to_remove).resolve(page_count).ranges():
+        kept.extend(range(next_index, start - 1))
+        next_index = end
+    kept.extend(range(next_index, page_count))
+    return kept
+
+
+# ============================================================================
+# DOCUMENT ACCESS
+# ============================================================================
+
+def content_digest(data: bytes) -> str:
+    """Cache key for a document's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def open_reader(data: bytes) -> pypdf.PdfReader:
+    """Parse PDF bytes with pypdf"""
+    # Memory maps are file-like already; wrapping them would copy the file
+    stream = BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    try:
+        return pypdf.PdfReader(stream)
+    except Exception as e:
+        raise PdfReadError(f"Could not read PDF: {e}") from e
+
+
+def open_fitz(data: bytes, path: Optional[str] = None) -> fitz.Document:
+    """Open a PDF with PyMuPDF, by file name when one is known"""
+    try:
+        if path is not None:
+            return fitz.open(path, filetype="pdf")
+        return fitz.open("pdf", data)
+    except Exception as e:
+        raise PdfReadError(f"Could not open PDF: {e}") from e
+
+
+def cached_reader(source: PdfSource):
+    """Borrow the shared pypdf reader for a source (use as a context manager)"""
+    return document_cache.lease(
+        ('pypdf', source.content_hash()),
+        lambda: open_reader(source.data),
+        source.size * READER_COST_FACTOR,
+    )
+
+
+def cached_fitz(source: PdfSource):
+    """Borrow the shared PyMuPDF document for a source (use as a context manager)"""
+    return document_cache.lease(
+        ('fitz', source.content_hash()),
+        lambda: open_fitz(source.data, source.path),
+        int(source.size * (FITZ_PATH_COST_FACTOR if source.path else FITZ_COST_FACTOR)),
+    )
+
+
+def map_file(path: str):
+    """Read-only memory map of a file (empty files map to b'')"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def source_from_path(path: str, name: Optional[str] = None, **kwargs) -> PdfSource:
+    """Source backed by a file on disk instead of bytes on the heap"""
+    return PdfSource(name=name or os.path.basename(path), data=map_file(path), path=path, **kwargs)
+
+
+def probe(source: PdfSource) -> PdfInfo:
+    """Page count, size, encryption flag and version without a full parse"""
+    try:
+        return probe_pdf(source.data, source.path)
+    except ValueError as e:
+        raise PdfReadError(str(e)) from e
+
+
+def get_page_count(source: PdfSource) -> int:
+    """Number of pages in a PDF"""
+    return probe(source).page_count
+
+
+def source_page_count(source: PdfSource) -> int:
+    """Page count of a source, probing the document only the first time"""
+    if source.page_count is None:
+        source.page_count = get_page_count(source)
+    return source.page_count
+
+
+# ============================================================================
+# MERGE PLANNING
+# ============================================================================
+
+def build_merge_plan(mother: PdfSource, insertions: Sequence[Insertion],
+                     mother_remove_pages: Optional[PageSelection] = None) -> List[Segment]:
+    """Resolve a merge into ordered segments.
+
+    Page removals are folded into the segments, so `after_page` counts pages
+    of the mother PDF as it looks once its removals are applied.
+    """
+    mother_pages = kept_page_indices(source_page_count(mother), mother_remove_pages)
+    plan = []
+    current_page = 0
+
+    for insertion in sorted(insertions, key=lambda x: x.after_page):
+        stop = min(insertion.after_page, len(mother_pages))
+        if stop > current_page:
+            plan.append(Segment(mother, mother_pages[current_page:stop]))
+            current_page = stop
+
+        insert_pages = kept_page_indices(source_page_count(insertion.source), insertion.remove_pages)
+        if insert_pages:
+            plan.append(Segment(insertion.source, insert_pages))
+
+    if current_page < len(mother_pages):
+        plan.append(Segment(mother, mother_pages[current_page:]))
+
+    plan_page_count(plan)
+    return plan
+
+
+def plan_page_count(plan: Sequence[Segment]) -> int:
+    """Pages a plan writes; raises PageSelectionError when there are none"""
+    pages = sum(len(segment.page_indices) for segment in plan)
+    if not pages:
+        raise PageSelectionError("Nothing to write: the page removals leave no pages")
+    return pages
+
+
+def no_progress(stage: str, done: int, total: int) -> None:
+    """Default progress callback"""
+
+
+def contiguous_runs(indices: Sequence[int]) -> List[Tuple[int, int]]:
+    """Split page indices into (first, last) runs of consecutive pages"""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][1] == i - 1:
+            runs[-1] = (runs[-1][0], i)
+        else:
+            runs.append((i, i))
+    return runs
+
+
+# ============================================================================
+# MERGE BACKENDS
+# ============================================================================
+
+class MergeBackend:
+    """Library used to copy pages into a new document"""
+    name = ""
+
+    def write_plan(self, plan: Sequence[Segment], output: BinaryIO, progress: ProgressCallback,
+                   dedupe: bool = True) -> None:
+        """Write the plan's pages to `output`.
+
+        With `dedupe`, objects whose content is identical across sources,
+        typically fonts, logos and ICC profiles, are written only once.
+        """
+        raise NotImplementedError
+
+    def remove_pages(self, source: PdfSource, pages_to_remove: PageSelection, output: Union[str, BinaryIO],
+                     progress: ProgressCallback = no_progress) -> Tuple[int, int]:
+        """Write the source without the given 1-based pages to a path or stream.
+
+        Returns the page counts before and after. Raises PageSelectionError
+        rather than write a document with no pages.
+        """
+        pages_before = source_page_count(source)
+        kept = kept_page_indices(pages_before, pages_to_remove)
+        if not kept:
+            raise PageSelectionError("Cannot remove every page of a document")
+        self.write_plan([Segment(source, kept)], output, progress, dedupe=False)
+        return pages_before, len(kept)
+
+
+class PypdfBackend(MergeBackend):
+    """Pure-Python backend; the most forgiving with unusual files"""
+    name = "pypdf"
+
+    def write_plan(self, plan, output, progress, dedupe=True):
+        total_pages = plan_page_count(plan)
+        writer = pypdf.PdfWriter()
+
+        # Borrow every reader up front, in digest order so that concurrent
+        # merges sharing documents always take the entry locks in the same order.
+        sources = {segment.source.content_hash(): segment.source for segment in plan}
+        with ExitStack() as stack:
+            readers = {}
+            for digest in sorted(sources):
+                progress("Reading documents", len(readers), len(sources))
+                readers[digest] = stack.enter_context(cached_reader(sources[digest]))
+
+            written = 0
+            for segment in plan:
+                reader = readers[segment.source.digest]
+                for i in segment.page_indices:
+                    progress("Copying pages", written, total_pages)
+                    if i < len(reader.pages):
+                        writer.add_page(reader.pages[i])
+                    written += 1
+
+            # Added in pypdf 4.3; older releases write duplicates as before
+            if dedupe and hasattr(writer, "compress_identical_objects"):
+                progress("Deduplicating resources", 0, 1)
+                writer.compress_identical_objects()
+
+            progress("Writing file", 0, 1)
+            writer.write(output)
+            progress("Writing file", 1, 1)
+
+
+class PymupdfBackend(MergeBackend):
+    """MuPDF backend; copies whole page runs in C, much faster on large scans"""
+    name = "pymupdf"
+
+    def write_plan(self, plan, output, progress, dedupe=True):
+        # Checked first: MuPDF itself only refuses once it comes to saving
+        total_pages = plan_page_count(plan)
+        merged = fitz.open()
+
+        # The last segment taken from a source releases MuPDF's graft map;
+        # earlier ones keep it so shared resources are copied only once.
+        last_use = {segment.source.content_hash(): n for n, segment in enumerate(plan)}
+        sources = {segment.source.digest: segment.source for segment in plan}
+        with ExitStack() as stack:
+            docs = {}
+            for digest in sorted(sources):
+                progress("Reading documents", len(docs), len(sources))
+                docs[digest] = stack.enter_context(cached_fitz(sources[digest]))
+
+            written = 0
+            for n, segment in enumerate(plan):
+                doc = docs[segment.source.digest]
+                valid = [i for i in segment.page_indices if i < doc.page_count]
+                for first, last in contiguous_runs(valid):
+                    progress("Copying pages", written, total_pages)
+                    merged.insert_pdf(doc, from_page=first, to_page=last,
+                                      final=n == last_use[segment.source.digest])
+                    written += last - first + 1
+                written += len(segment.page_indices) - len(valid)
+
+        # The pages are copies now, so the shared sources are released before
+        # the slow part; other sessions need not wait for the save
+        with merged:
+            # Garbage level 4 also merges identical streams, by content hash
+            progress("Writing file", 0, 1)
+            merged.save(output, garbage=4 if dedupe else 1)
+            progress("Writing file", 1, 1)
+
+    def remove_pages(self, source, pages_to_remove, output, progress=no_progress):
+        # select() edits the document in place, so work on a private copy.
+        # Sources with a path are opened from disk, so MuPDF reads objects
+        # as it needs them and documents larger than memory work.
+        with open_fitz(source.data, source.path) as doc:
+            if doc.needs_pass:
+                raise PdfReadError(f"{source.name} is password protected")
+            pages_before = doc.page_count
+            kept = kept_page_indices(pages_before, pages_to_remove)
+            if not kept:
+                raise PageSelectionError("Cannot remove every page of a document")
+            if len(kept) < pages_before:
+                doc.select(kept)
+            # Objects only the removed pages used are dropped when saving
+            progress("Writing file", 0, 1)
+            doc.save(output, garbage=1)
+            progress("Writing file", 1, 1)
+        return pages_before, len(kept)
+
+
+BACKENDS = {backend.name: backend for backend in (PypdfBackend(), PymupdfBackend())}
+
+# "auto", "pypdf" or "pymupdf"
+DEFAULT_BACKEND = os.environ.get("PDF_MERGE_BACKEND", "auto")
+
+# With "auto", merges whose inputs add up to this many bytes use PyMuPDF
+AUTO_BACKEND_THRESHOLD = int(os.environ.get("PDF_MERGE_BACKEND_THRESHOLD_MB", "50")) * 1024 * 1024
+
+# Write resources shared by several sources once ("0" turns this off)
+DEDUPE_RESOURCES = os.environ.get("PDF_DEDUPE_RESOURCES", "1") != "0"
+
+
+def select_backend(name: Optional[str] = None, input_size: int = 0) -> MergeBackend:
+    """Backend by name, or chosen by total input size for "auto" """
+    name = name or DEFAULT_BACKEND
+    if name == "auto":
+        name = "pymupdf" if input_size >= AUTO_BACKEND_THRESHOLD else "pypdf"
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise PdfEngineError(f"Unknown merge backend {name!r}; choose from auto, {', '.join(BACKENDS)}") from None
+
+
+def plan_input_size(plan: Sequence[Segment]) -> int:
+    """Bytes of all distinct sources used by a plan"""
+    return sum({segment.source.content_hash(): segment.source.size for segment in plan}.values())
+
+
+# ============================================================================
+# OUTPUT OPTIMIZATION
+# ============================================================================
+
+@dataclass(frozen=True)
+class OptimizationProfile:
+    """How much work to spend shrinking a merged file after it is written"""
+    name: str
+    description: str
+    garbage: int = 0
+    object_streams: bool = False
+    compress: bool = False
+    # Images above this resolution are resampled down to it
+    image_dpi: Optional[int] = None
+    image_quality: int = 80
+
+    @property
+    def does_work(self) -> bool:
+        return bool(self.garbage or self.object_streams or self.compress or self.image_dpi)
+
+
+SMALL_IMAGE_DPI = int(os.environ.get("PDF_SMALL_IMAGE_DPI", "150"))
+
+OPTIMIZATION_PROFILES = {profile.name: profile for profile in (
+    OptimizationProfile("fast", "Write the merged file as is"),
+    OptimizationProfile("balanced", "Pack objects into compressed object streams and compress "
+                                    "uncompressed streams", garbage=3, object_streams=True, compress=True),
+    OptimizationProfile("small", f"Balanced, plus images downsampled to {SMALL_IMAGE_DPI} DPI",
+                        garbage=3, object_streams=True, compress=True, image_dpi=SMALL_IMAGE_DPI),
+)}
+
+# "fast", "balanced" or "small"
+DEFAULT_PROFILE = os.environ.get("PDF_OUTPUT_PROFILE", "fast")
+
+
+def select_profile(name: Optional[str] = None) -> OptimizationProfile:
+    try:
+        return OPTIMIZATION_PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise PdfEngineError(
+            f"Unknown optimization profile {name!r}; choose from {', '.join(OPTIMIZATION_PROFILES)}"
+        ) from None
+
+
+def optimize_pdf(data: Optional[bytes], path: Optional[str], output: BinaryIO,
+                 profile: OptimizationProfile) -> None:
+    """Rewrite a PDF, given as bytes or a path, into `output` with a profile's settings"""
+    with open_fitz(data, path) as doc:
+        # rewrite_images arrived in PyMuPDF 1.25; older releases keep images as they are
+        if profile.image_dpi and hasattr(doc, "rewrite_images"):
+            doc.rewrite_images(dpi_threshold=profile.image_dpi + 1, dpi_target=profile.image_dpi,
+                               quality=profile.image_quality)
+        options = dict(garbage=profile.garbage, deflate=profile.compress,
+                       deflate_images=profile.compress, deflate_fonts=profile.compress)
+        try:
+            doc.save(output, use_objstms=profile.object_streams, **options)
+        except TypeError:
+            # Object streams need PyMuPDF 1.24
+            doc.save(output, **options)
+
+
+def optimize_file(path: str, profile: OptimizationProfile) -> OptimizationReport:
+    """Optimize a PDF file in place, keeping the original if that would not shrink it"""
+    started = time.perf_counter()
+    size_before = os.path.getsize(path)
+    tmp_path = f"{path}.optimized"
+    try:
+        with open(tmp_path, 'wb') as f:
+            optimize_pdf(None, path, f, profile)
+        size_after = os.path.getsize(tmp_path)
+        applied = size_after < size_before
+        if applied:
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return OptimizationReport(profile.name, round(time.perf_counter() - started, 4), size_before,
+                              size_after if applied else size_before, applied)
+
+
+def optimize_bytes(data: bytes, profile: OptimizationProfile) -> Tuple[bytes, OptimizationReport]:
+    """Optimized copy of an in-memory PDF, or the original if that is smaller"""
+    started = time.perf_counter()
+    buffer = BytesIO()
+    optimize_pdf(data, None, buffer, profile)
+    applied = buffer.tell() < len(data)
+    result = buffer.getvalue() if applied else data
+    return result, OptimizationReport(profile.name, round(time.perf_counter() - started, 4), len(data),
+                                      len(result), applied)
+
+
+# ============================================================================
+# LINEARIZATION
+# ============================================================================
+
+# MuPDF dropped linearized saving, so "fast web view" output comes from qpdf,
+# through pikepdf when it is installed or the qpdf command otherwise.
+QPDF = shutil.which("qpdf")
+LINEARIZE_ERRORS = (pikepdf.PdfError,) if pikepdf is not None else ()
+
+# The linearization dictionary must be the first object, within the first KB
+FIRST_OBJECT = re.compile(rb"\d+\s+\d+\s+obj\s*<<(.*?)>>", re.DOTALL)
+LINEARIZED_LENGTH = re.compile(rb"/L\s+(\d+)")
+
+
+def linearization_available() -> bool:
+    return pikepdf is not None or QPDF is not None
+
+
+def is_linearized(data: bytes) -> bool:
+    """Whether a PDF opens with a linearization dictionary that matches its length.
+
+    A file changed after linearizing, for example by an incremental save,
+    no longer matches its recorded length and does not count.
+    """
+    return _linearization_matches(bytes(data[:1024]), len(data))
+
+
+def is_linearized_file(path: str) -> bool:
+    with open(path, 'rb') as f:
+        head = f.read(1024)
+    return _linearization_matches(head, os.path.getsize(path))
+
+
+def _linearization_matches(head: bytes, size: int) -> bool:
+    match = FIRST_OBJECT.search(head)
+    if match is None or b"/Linearized" not in match.group(1):
+        return False
+    length = LINEARIZED_LENGTH.search(match.group(1))
+    return length is not None and int(length.group(1)) == size
+
+
+def linearize_file(path: str) -> None:
+    """Rewrite a PDF file in place so viewers can show page 1 before the rest arrives"""
+    tmp_path = f"{path}.linear"
+    try:
+        if pikepdf is not None:
+            with pikepdf.open(path) as pdf:
+                pdf.save(tmp_path, linearize=True)
+        elif QPDF is not None:
+            completed = subprocess.run([QPDF, "--linearize", path, tmp_path], capture_output=True, text=True)
+            # Exit status 3 means the file was written with warnings
+            if completed.returncode not in (0, 3):
+                raise PdfEngineError(f"qpdf could not linearize the file: {completed.stderr.strip()}")
+        else:
+            raise PdfEngineError("Linearized output needs pikepdf (pip install pikepdf) or the qpdf command")
+
+        if not is_linearized_file(tmp_path):
+            raise PdfEngineError("Linearizing did not produce a linearized file")
+        os.replace(tmp_path, path)
+    except LINEARIZE_ERRORS as e:
+        raise PdfReadError(f"Could not linearize the file: {e}") from None
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def linearize_bytes(data: bytes) -> bytes:
+    """Linearized copy of an in-memory PDF"""
+    with tempfile.TemporaryDirectory(prefix="pdf_linearize_") as directory:
+        path = os.path.join(directory, "document.pdf")
+        with open(path, 'wb') as f:
+            f.write(data)
+        linearize_file(path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+# ============================================================================
+# INCREMENTAL MERGING
+# ============================================================================
+
+# A changed merge is rebuilt from scratch when more than this share of its
+# pages would have to be copied again anyway, or once updates have grown the
+# file to this many times its size when last written in full
+INCREMENTAL_MAX_COPY_SHARE = 0.5
+INCREMENTAL_MAX_GROWTH = 2.0
+
+# (source digest, zero-based page index) behind one output page
+PageRef = Tuple[str, int]
+
+
+@dataclass
+class MergeBase:
+    """An earlier merged file that a later merge can update instead of rebuilding.
+
+    `pages` records where every output page came from and `full_size` is
+    the file's size when it was last written in full.
+    """
+    path: str
+    pages: List[PageRef]
+    full_size: int
+
+
+def plan_pages(plan: Sequence[Segment]) -> List[PageRef]:
+    return [(segment.source.content_hash(), i) for segment in plan for i in segment.page_indices]
+
+
+def page_edits(old: Sequence[PageRef], new: Sequence[PageRef]) -> List[Tuple[int, int, int, int]]:
+    """Steps turning page list `old` into `new`.
+
+    Each step is (position, pages to delete, start, end): delete that many
+    pages at `position`, then insert new[start:end] there. Positions refer
+    to the document as edited by the steps before, applied in order.
+    """
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    return [(j1, i2 - i1, j1, j2) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def page_ref_runs(pages: Sequence[PageRef]) -> List[Tuple[str, int, int]]:
+    """Group page references into (digest, first, last) runs of consecutive pages"""
+    runs = []
+    for digest, i in pages:
+        if runs and runs[-1][0] == digest and runs[-1][2] == i - 1:
+            runs[-1] = (digest, runs[-1][1], i)
+        else:
+            runs.append((digest, i, i))
+    return runs
+
+
+def update_merge(base: MergeBase, plan: Sequence[Segment], output: str,
+                 progress: ProgressCallback = no_progress,
+                 max_copy_share: float = INCREMENTAL_MAX_COPY_SHARE,
+                 stage: str = "Updating previous merge", garbage: int = 3) -> Optional[Tuple[MergeBase, int]]:
+    """Write a plan to `output` by editing an earlier merge.
+
+    Only pages that moved or are new are copied from their sources. When
+    pages are only added, the changes are appended to a copy of the file as
+    an incremental update. When any page goes away the edited document is
+    saved in full with unused objects dropped, because an incremental
+    update keeps the earlier revision, deleted pages included, inside the
+    file. `garbage` is the collection level of that full save. Returns the
+    new base and the number of pages reused, or None (leaving `output` in
+    an undefined state) when a full merge would be cheaper or the earlier
+    file cannot be updated.
+    """
+    new_pages = plan_pages(plan)
+    edits = page_edits(base.pages, new_pages)
+    to_copy = sum(end - start for _, _, start, end in edits)
+    deleted = sum(count for _, count, _, _ in edits)
+    if (to_copy > len(new_pages) * max_copy_share
+            or os.path.getsize(base.path) > base.full_size * INCREMENTAL_MAX_GROWTH):
+        return None
+
+    incremental = deleted == 0
+    if incremental:
+        shutil.copyfile(base.path, output)
+    sources = {segment.source.content_hash(): segment.source for segment in plan}
+    needed = sorted({digest for _, _, start, end in edits for digest, _ in new_pages[start:end]})
+    with open_fitz(None, output if incremental else base.path) as doc:
+        if doc.page_count != len(base.pages) or (incremental and not doc.can_save_incrementally()):
+            return None
+        # The shared sources are only needed while pages are copied, not while saving
+        with ExitStack() as stack:
+            # Same digest order as the backends, so concurrent merges cannot deadlock
+            docs = {digest: stack.enter_context(cached_fitz(sources[digest])) for digest in needed}
+
+            copied = 0
+            for position, delete_count, start, end in edits:
+                if delete_count:
+                    doc.delete_pages(position, position + delete_count - 1)
+                for digest, first, last in page_ref_runs(new_pages[start:end]):
+                    progress(stage, copied, to_copy)
+                    doc.insert_pdf(docs[digest], from_page=first, to_page=last, start_at=position)
+                    position += last - first + 1
+                    copied += last - first + 1
+
+        progress("Writing file", 0, 1)
+        if incremental:
+            doc.saveIncr()
+        else:
+            # A sibling name, as `output` may be the file being read
+            partial = f"{output}.part"
+            try:
+                doc.save(partial, garbage=garbage)
+            except BaseException:
+                if os.path.exists(partial):
+                    os.remove(partial)
+                raise
+        progress("Writing file", 1, 1)
+    if incremental:
+        return MergeBase(output, new_pages, base.full_size), len(new_pages) - to_copy
+    os.replace(partial, output)
+    return MergeBase(output, new_pages, os.path.getsize(output)), len(new_pages) - to_copy
+
+
+# ============================================================================
+# LARGE FILES
+# ============================================================================
+
+# Merges whose distinct inputs add up to this many bytes run in large-file
+# mode, which never holds a whole document in memory
+LARGE_FILE_THRESHOLD = int(os.environ.get("PDF_LARGE_FILE_MB", "200")) * 1024 * 1024
+
+
+def is_large_merge(plan: Sequence[Segment], large_file: Optional[bool] = None) -> bool:
+    """Whether a plan is merged in large-file mode; `large_file` forces the answer"""
+    if large_file is not None:
+        return large_file
+    return plan_input_size(plan) >= LARGE_FILE_THRESHOLD
+
+
+# Working memory of a merge or removal, measured on the benchmark corpus:
+# parsed objects and written output cost a multiple of the input bytes, and
+# every page adds its tree entries and resources
+MEMORY_PER_INPUT_BYTE = 4
+MEMORY_PER_PAGE = 24 * 1024
+
+
+def estimate_memory(documents: Sequence[Tuple[int, int]]) -> int:
+    """Bytes a job over (file size, page count) documents may need at its peak.
+
+    Inputs large enough for large-file mode are read from disk as needed,
+    so only their pages and a small share of their bytes count.
+    """
+    size = sum(size for size, _ in documents)
+    pages = sum(pages or 0 for _, pages in documents)
+    per_byte = FITZ_PATH_COST_FACTOR if size >= LARGE_FILE_THRESHOLD else MEMORY_PER_INPUT_BYTE
+    return int(size * per_byte) + pages * MEMORY_PER_PAGE
+
+
+def merge_on_disk(plan: Sequence[Segment], output: str,
+                  progress: ProgressCallback = no_progress) -> Optional[MergeBase]:
+    """Write a plan by editing its largest source file.
+
+    The file is opened by path, so MuPDF reads only the objects it touches
+    and the operating system's page cache holds the rest. When every page
+    of it is kept, pages from the other sources are appended to a copy as
+    an incremental update, so memory use follows the pages copied in
+    rather than the size of the output. When some of its pages are removed
+    the result is written as a new file holding only the objects still in
+    use, without the slower duplicate search of a normal full save.
+    Returns the base for the next merge, or None when no source on disk
+    can be edited this way.
+    """
+    on_disk = [segment.source for segment in plan if segment.source.path]
+    if not on_disk:
+        return None
+    largest = max(on_disk, key=lambda source: source.size)
+    pages = [(largest.content_hash(), i) for i in range(source_page_count(largest))]
+    updated = update_merge(MergeBase(largest.path, pages, largest.size), plan, output, progress,
+                           max_copy_share=1.0, stage="Copying pages", garbage=1)
+    if updated is None:
+        return None
+    base, _ = updated
+    return MergeBase(output, base.pages, os.path.getsize(output))
+
+
+# ============================================================================
+# PAGE REMOVAL AND MERGING
+# ============================================================================
+
+def remove_pages(source: PdfSource, pages_to_remove: PageSelection,
+                 output: Optional[BinaryIO] = None, backend: Optional[str] = None,
+                 linearize: bool = False) -> Optional[bytes]:
+    """Copy of a PDF without the given 1-based pages; `delete_pages` for streams.
+
+    Returns the bytes, or writes to `output` and returns None when a
+    writable binary stream is given. `linearize` produces a linearized
+    ("fast web view") file.
+    """
+    target = output if output is not None and not linearize else BytesIO()
+    select_backend(backend, source.size).remove_pages(source, pages_to_remove, target)
+    if not linearize:
+        return None if output is not None else target.getvalue()
+
+    data = linearize_bytes(target.getvalue())
+    if output is None:
+        return data
+    output.write(data)
+    return None
+
+
+def delete_pages(source: PdfSource, pages_to_remove: PageSelection, output: str,
+                 progress: ProgressCallback = no_progress, linearize: bool = False,
+                 backend: Optional[str] = "pymupdf") -> RemovalResult:
+    """Write a PDF without the given 1-based pages to the file `output`.
+
+    PyMuPDF is used unless another `backend` is named, so the pages go in
+    one select() call on the document as it sits on disk.
+    """
+    progress("Removing pages", 0, 1)
+    pages_before, page_count = select_backend(backend, source.size).remove_pages(
+        source, pages_to_remove, output, progress)
+    if linearize:
+        progress("Linearizing", 0, 1)
+        linearize_file(output)
+    return RemovalResult(pages_before, page_count, source.size, os.path.getsize(output), output, linearize)
+
+
+def write_merge_plan(plan: Sequence[Segment], output: BinaryIO,
+                     progress: ProgressCallback = no_progress, backend: Optional[str] = None,
+                     dedupe: bool = DEDUPE_RESOURCES) -> str:
+    """Emit a merge plan into `output` in one pass; returns the backend used"""
+    chosen = select_backend(backend, plan_input_size(plan))
+    chosen.write_plan(plan, output, progress, dedupe)
+    return chosen.name
+
+
+def merge_pdfs(job: MergeJob, output: Union[str, BinaryIO, None] = None,
+               progress: ProgressCallback = no_progress,
+               prepare_dir: Optional[str] = None, workers: Optional[int] = None,
+               backend: Optional[str] = None, dedupe: bool = DEDUPE_RESOURCES,
+               profile: Optional[str] = None, base: Optional[MergeBase] = None,
+               linearize: bool = False, large_file: Optional[bool] = None) -> MergeResult:
+    """Run a merge job and return the consolidated document.
+
+    With no `output` the result is kept in memory; given a path or a
+    writable binary stream it is streamed there instead. `progress` is
+    called as pages are copied; an exception it raises aborts the merge.
+
+    Given a `prepare_dir`, every source is first validated and trimmed by
+    `prepare_job` on up to `workers` processes. `backend` names the merge
+    backend; by default PDF_MERGE_BACKEND decides. `dedupe` writes
+    resources shared between sources only once. `profile` names the
+    optimization pass run on the written file (see OPTIMIZATION_PROFILES);
+    by default PDF_OUTPUT_PROFILE decides.
+
+    Unoptimized merges written to a path return a `base`. Passing it to the
+    next merge lets that merge update a copy of the earlier file, copying
+    only pages that are new or moved, when that is cheaper than starting
+    over.
+
+    `linearize` produces a linearized ("fast web view") file, checked
+    before it is returned; such files cannot be updated incrementally.
+
+    Merges with inputs of LARGE_FILE_THRESHOLD bytes or more run in
+    large-file mode (`large_file` turns it on or off regardless of size):
+    the output is built on disk from a copy of the largest source with
+    `merge_on_disk`, falling back to the PyMuPDF backend without
+    deduplication, and results for streams or memory pass through a
+    temporary file instead of a memory buffer.
+    """
+    optimization = select_profile(profile)
+    if prepare_dir is not None:
+        job = prepare_job(job, prepare_dir, workers, progress)
+    progress("Planning merge", 0, 1)
+    plan = build_merge_plan(job.mother, job.insertions, job.mother_remove_pages)
+    large = is_large_merge(plan, large_file)
+
+    if isinstance(output, str):
+        return merge_to_file(plan, output, progress, backend, dedupe, optimization, base, linearize, large)
+
+    if large:
+        with tempfile.TemporaryDirectory(prefix="pdf_merge_") as directory:
+            path = os.path.join(directory, "merged.pdf")
+            result = merge_to_file(plan, path, progress, backend, dedupe, optimization, None, linearize, True)
+            with open(path, 'rb') as f:
+                if output is None:
+                    result.data = f.read()
+                else:
+                    shutil.copyfileobj(f, output)
+        result.path = result.base = None
+        return result
+
+    page_count = sum(len(segment.page_indices) for segment in plan)
+    if output is not None and not optimization.does_work and not linearize:
+        start = output.tell()
+        used = write_merge_plan(plan, output, progress, backend, dedupe)
+        return MergeResult(page_count=page_count, segments=plan, size=output.tell() - start, backend=used)
+
+    report = None
+    buffer = BytesIO()
+    used = write_merge_plan(plan, buffer, progress, backend, dedupe)
+    data = buffer.getvalue()
+    if optimization.does_work:
+        progress("Optimizing output", 0, 1)
+        data, report = optimize_bytes(data, optimization)
+    if linearize:
+        progress("Linearizing", 0, 1)
+        data = linearize_bytes(data)
+    if output is None:
+        return MergeResult(page_count=page_count, segments=plan, size=len(data), data=data,
+                           backend=used, optimization=report, linearized=linearize)
+    output.write(data)
+    return MergeResult(page_count=page_count, segments=plan, size=len(data), backend=used,
+                       optimization=report, linearized=linearize)
+
+
+def merge_to_file(plan: Sequence[Segment], output: str, progress: ProgressCallback,
+                  backend: Optional[str], dedupe: bool, optimization: OptimizationProfile,
+                  base: Optional[MergeBase], linearize: bool, large: bool) -> MergeResult:
+    """Write a resolved plan to the file `output`; see merge_pdfs for the options"""
+    page_count = sum(len(segment.page_indices) for segment in plan)
+    if base is not None and not optimization.does_work and not linearize:
+        try:
+            updated = update_merge(base, plan, output, progress)
+        except (OSError, PdfEngineError, RuntimeError):
+            # The earlier file is gone or unusable; merge from scratch
+            updated = None
+        if updated is not None:
+            new_base, reused = updated
+            return MergeResult(page_count=page_count, segments=plan, size=os.path.getsize(output),
+                               path=output, backend="pymupdf", base=new_base, reused_pages=reused,
+                               large_file=large)
+
+    new_base = None
+    if large:
+        try:
+            new_base = merge_on_disk(plan, output, progress)
+        except (OSError, PdfEngineError, RuntimeError):
+            # An encrypted or damaged largest source; copy every page instead
+            new_base = None
+    if new_base is not None:
+        used = "pymupdf"
+    else:
+        with open(output, 'wb') as f:
+            # Deduplicating hashes every stream, which would load them all into memory
+            used = write_merge_plan(plan, f, progress, "pymupdf" if large else backend, dedupe and not large)
+        new_base = MergeBase(output, plan_pages(plan), os.path.getsize(output))
+
+    report = None
+    if optimization.does_work:
+        progress("Optimizing output", 0, 1)
+        report = optimize_file(output, optimization)
+    if linearize:
+        progress("Linearizing", 0, 1)
+        linearize_file(output)
+    updatable = not linearize and not (report and report.applied)
+    return MergeResult(page_count=page_count, segments=plan, size=os.path.getsize(output), path=output,
+                       backend=used, optimization=report, linearized=linearize,
+                       base=new_base if updatable else None, large_file=large)
+
+
+def compare_backends(job: MergeJob, backends: Optional[Sequence[str]] = None) -> List[dict]:
+    """Merge the same job with each backend and report time and output size.
+
+    The plan is resolved once so every backend sees identical inputs; each
+    output is checked for the expected page count. Outputs are discarded.
+    """
+    plan = build_merge_plan(job.mother, job.insertions, job.mother_remove_pages)
+    expected_pages = sum(len(segment.page_indices) for segment in plan)
+    report = []
+    for name in backends or list(BACKENDS):
+        buffer = BytesIO()
+        started = time.perf_counter()
+        select_backend(name).write_plan(plan, buffer, no_progress, DEDUPE_RESOURCES)
+        elapsed = time.perf_counter() - started
+        output = PdfSource(name, buffer.getvalue())
+        report.append({
+            'backend': name,
+            'seconds': round(elapsed, 4),
+            'size': output.size,
+            'page_count': get_page_count(output),
+            'pages_match': get_page_count(output) == expected_pages,
+        })
+    return report
+
+
+# ============================================================================
+# PARALLEL PREPARATION
+# ============================================================================
+
+# Below this many documents a process pool costs more than it saves
+PARALLEL_MIN_SOURCES = 4
+
+# Processes in the pool shared by every merge and split (0 = one per CPU)
+PREPARE_POOL_WORKERS = int(os.environ.get("PDF_PREPARE_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@dataclass
+class PreparedDocument:
+    """A validated source reduced to the pages that survive its removals"""
+    path: Optional[str]
+    page_count: int
+    digest: str
+
+
+def prepared_id(digest: str, pages_to_remove: PageSet) -> str:
+    """Identity of a document with a given (resolved) removal applied"""
+    selection = hashlib.sha256(str(pages_to_remove).encode()).hexdigest()
+    return f"{digest}-{selection[:16]}"
+
+
+def prepare_document(name: str, path: Optional[str], data: Optional[bytes], digest: str,
+                     pages_to_remove: PageSelection, prepare_dir: str) -> PreparedDocument:
+    """Validate one source and write its trimmed copy; runs in a worker process.
+
+    Sources without removals are only validated and keep their own file.
+    A trimmed copy left by an earlier merge is reused as is. A source with
+    every page removed has no file and contributes no pages.
+    """
+    try:
+        doc = fitz.open(path, filetype="pdf") if path else fitz.open("pdf", data)
+    except Exception as e:
+        raise PdfReadError(f"Could not open {name}: {e}") from None
+
+    with doc:
+        if doc.needs_pass:
+            raise PdfReadError(f"{name} is password protected")
+        removed = PageSet.coerce(pages_to_remove).resolve(doc.page_count)
+        if not removed:
+            return PreparedDocument(path, doc.page_count, digest)
+
+        kept = kept_page_indices(doc.page_count, removed)
+        trimmed_id = prepared_id(digest, removed)
+        if not kept:
+            return PreparedDocument(None, 0, trimmed_id)
+        out_path = os.path.join(prepare_dir, f"{trimmed_id}.pdf")
+        try:
+            # Marks the copy as recently used, for pruning by the upload store
+            os.utime(out_path)
+        except FileNotFoundError:
+            doc.select(kept)
+            tmp_path = f"{out_path}.{os.getpid()}.part"
+            doc.save(tmp_path, garbage=1)
+            os.replace(tmp_path, out_path)
+        return PreparedDocument(out_path, len(kept), trimmed_id)
+
+
+def prepare_pool() -> ProcessPoolExecutor:
+    """Pool shared by every thread of the process, started on first use.
+
+    It always has PREPARE_POOL_WORKERS processes; callers limit how many
+    tasks they keep in it rather than resizing it under each other. Workers
+    are spawned rather than forked because the web app calls this from
+    threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PREPARE_POOL_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def pool_map(fn: Callable, tasks: Sequence[tuple], workers: int) -> Iterator:
+    """Yield `fn(*args)` for each task in order, with at most `workers` on the shared pool at once.
+
+    Tasks not yet started are cancelled if the caller stops early or a task
+    raises. A worker crash breaks the pool for everyone, so the next caller
+    gets a fresh one; the broken pool is not shut down, as other threads
+    may still be waiting on it.
+    """
+    global _pool
+    pool = prepare_pool()
+    pending = deque()
+    tasks = iter(tasks)
+    try:
+        for args in islice(tasks, workers):
+            pending.append(pool.submit(fn, *args))
+        while pending:
+            result = pending.popleft().result()
+            for args in islice(tasks, 1):
+                pending.append(pool.submit(fn, *args))
+            yield result
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def prepare_job(job: MergeJob, prepare_dir: str, workers: Optional[int] = None,
+                progress: ProgressCallback = no_progress) -> MergeJob:
+    """Validate and trim all sources of a job, in parallel when worthwhile.
+
+    Returns an equivalent job whose sources already have their removals
+    applied. Identical (document, removal) pairs are prepared once.
+    """
+    os.makedirs(prepare_dir, exist_ok=True)
+    entries = [(job.mother, job.mother_remove_pages)] + [(ins.source, ins.remove_pages) for ins in job.insertions]
+    tasks = {}
+    for source, pages_to_remove in entries:
+        key = (source.content_hash(), PageSet.coerce(pages_to_remove))
+        if key not in tasks:
+            data = None if source.path else bytes(source.data)
+            tasks[key] = (source.name, source.path, data, key[0], key[1], prepare_dir)
+
+    workers = min(workers or PREPARE_POOL_WORKERS, PREPARE_POOL_WORKERS, len(tasks))
+    prepared = {}
+    progress("Preparing documents", 0, len(tasks))
+    if workers > 1 and len(tasks) >= PARALLEL_MIN_SOURCES:
+        for key, document in zip(tasks, pool_map(prepare_document, list(tasks.values()), workers)):
+            prepared[key] = document
+            progress("Preparing documents", len(prepared), len(tasks))
+    else:
+        for key, args in tasks.items():
+            prepared[key] = prepare_document(*args)
+            progress("Preparing documents", len(prepared), len(tasks))
+
+    def replacement(source, pages_to_remove):
+        document = prepared[(source.content_hash(), PageSet.coerce(pages_to_remove))]
+        if document.digest == source.digest:
+            return source
+        if document.path is None:
+            return PdfSource(source.name, b"", page_count=0, digest=document.digest)
+        return source_from_path(document.path, source.name, page_count=document.page_count, digest=document.digest)
+
+    return MergeJob(
+        mother=replacement(job.mother, job.mother_remove_pages),
+        insertions=[
+            Insertion(replacement(ins.source, ins.remove_pages), ins.after_page)
+            for ins in job.insertions
+        ],
+        output=job.output,
+    )
+
+
+# ============================================================================
+# SPLITTING
+# ============================================================================
+
+# Chunks handed to one worker task; each task opens the source once
+SPLIT_BATCH_SIZE = 25
+
+# Splits of fewer pages are written in-process; starting workers costs more
+SPLIT_PARALLEL_MIN_PAGES = 500
+
+
+@dataclass
+class SplitChunk:
+    """One output file of a split: a name inside the ZIP and its source pages"""
+    name: str
+    page_indices: List[int]
+
+
+@dataclass
+class SplitResult:
+    """A finished split written as a ZIP archive"""
+    chunks: List[SplitChunk]
+    size: int
+    path: Optional[str] = None
+
+
+def file_label(text: str) -> str:
+    """`text` reduced to word characters, dashes and underscores, safe in a file name"""
+    return re.sub(r"[^\w\- ]+", "", text).strip().replace(" ", "_")[:60]
+
+
+def chunk_name(stem: str, number: int, page_indices: Sequence[int], title: Optional[str] = None) -> str:
+    # The stem comes from an upload's name, so it must not carry a directory
+    stem = file_label(os.path.basename(stem)) or "part"
+    label = file_label(title) if title else ""
+    first, last = page_indices[0] + 1, page_indices[-1] + 1
+    pages = f"p{first}" if first == last else f"p{first}-{last}"
+    return f"{stem}_{number:03d}_{label or pages}.pdf"
+
+
+def split_by_page_count(page_count: int, pages_per_chunk: int, stem: str = "part") -> List[SplitChunk]:
+    """Consecutive chunks of `pages_per_chunk` pages; the last may be shorter"""
+    if pages_per_chunk < 1:
+        raise PageSelectionError("Pages per file must be at least 1")
+    chunks = []
+    for number, first in enumerate(range(0, page_count, pages_per_chunk), start=1):
+        indices = list(range(first, min(first + pages_per_chunk, page_count)))
+        chunks.append(SplitChunk(chunk_name(stem, number, indices), indices))
+    return chunks
+
+
+def split_by_ranges(page_count: int, ranges_text: str, stem: str = "part") -> List[SplitChunk]:
+    """One chunk per comma-separated part of a selection like "1-3, 4-10, 11-" """
+    chunks = []
+    for part in ranges_text.split(','):
+        if not part.strip():
+            continue
+        pages = parse_page_numbers(part).resolve(page_count)
+        indices = [page - 1 for page in pages]
+        if not indices:
+            raise PageSelectionError(f"Pages {part.strip()!r} are not in this {page_count}-page document")
+        chunks.append(SplitChunk(chunk_name(stem, len(chunks) + 1, indices), indices))
+    return chunks
+
+
+def split_by_bookmarks(source: PdfSource, level: int = 1, stem: str = "part") -> List[SplitChunk]:
+    """One chunk per bookmark at `level`, running to the next one.
+
+    Pages before the first bookmark become a chunk of their own. Raises
+    PageSelectionError if the document has no bookmarks at that level.
+    """
+    with cached_fitz(source) as doc:
+        page_count = doc.page_count
+        starts = []
+        for entry_level, title, page in doc.get_toc(simple=True):
+            if entry_level == level and 1 <= page <= page_count and (not starts or page - 1 > starts[-1][0]):
+                starts.append((page - 1, title))
+    if not starts:
+        raise PageSelectionError(f"This document has no level-{level} bookmarks to split at")
+
+    if starts[0][0] > 0:
+        starts.insert(0, (0, "front matter"))
+    chunks = []
+    for number, (first, title) in enumerate(starts, start=1):
+        last = starts[number][0] if number < len(starts) else page_count
+        indices = list(range(first, last))
+        chunks.append(SplitChunk(chunk_name(stem, number, indices, title), indices))
+    return chunks
+
+
+def write_chunks(name: str, path: Optional[str], data: Optional[bytes],
+                 chunks: Sequence[SplitChunk], out_dir: str) -> List[str]:
+    """Write a batch of chunks of one source to files; runs in a worker process"""
+    try:
+        doc = fitz.open(path, filetype="pdf") if path else fitz.open("pdf", data)
+    except Exception as e:
+        raise PdfReadError(f"Could not open {name}: {e}") from None
+
+    paths = []
+    with doc:
+        if doc.needs_pass:
+            raise PdfReadError(f"{name} is password protected")
+        for chunk in chunks:
+            with fitz.open() as part:
+                for first, last in contiguous_runs(chunk.page_indices):
+                    part.insert_pdf(doc, from_page=first, to_page=last)
+                out_path = os.path.join(out_dir, os.path.basename(chunk.name))
+                part.save(out_path, garbage=1, deflate=True)
+            paths.append(out_path)
+    return paths
+
+
+def split_pdf(source: PdfSource, chunks: Sequence[SplitChunk], output: Union[str, BinaryIO],
+              workers: Optional[int] = None, progress: ProgressCallback = no_progress) -> SplitResult:
+    """Write each chunk of a source as its own PDF into a ZIP archive.
+
+    Chunks are written to a scratch directory next to the archive, in
+    batches spread over up to `workers` processes, and each file is moved
+    into the archive and deleted as soon as its turn comes. Neither the
+    chunks nor the archive are ever held in memory as a whole. PDFs are
+    already compressed, so entries are stored rather than deflated.
+    """
+    if not chunks:
+        raise PageSelectionError("Nothing to split: no chunks were given")
+    batches = [chunks[i:i + SPLIT_BATCH_SIZE] for i in range(0, len(chunks), SPLIT_BATCH_SIZE)]
+    workers = min(workers or PREPARE_POOL_WORKERS, PREPARE_POOL_WORKERS, len(batches))
+    if sum(len(chunk.page_indices) for chunk in chunks) < SPLIT_PARALLEL_MIN_PAGES:
+        workers = 1
+    scratch_root = os.path.dirname(os.path.abspath(output)) if isinstance(output, str) else None
+    data = None if source.path else bytes(source.data)
+
+    with tempfile.TemporaryDirectory(prefix="pdf_split_", dir=scratch_root) as scratch, \
+            zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        def batch_results():
+            if workers > 1:
+                yield from pool_map(write_chunks, [(source.name, source.path, data, batch, scratch)
+                                                   for batch in batches], workers)
+            else:
+                for batch in batches:
+                    yield write_chunks(source.name, source.path, data, batch, scratch)
+
+        done = 0
+        progress("Splitting", 0, len(chunks))
+        for paths in batch_results():
+            for chunk_path in paths:
+                archive.write(chunk_path, os.path.basename(chunk_path))
+                os.remove(chunk_path)
+                done += 1
+                progress("Splitting", done, len(chunks))
+
+    if isinstance(output, str):
+        return SplitResult(list(chunks), os.path.getsize(output), output)
+    return SplitResult(list(chunks), output.tell())
+
+
+# ============================================================================
+# MANIFESTS
+# ============================================================================
+
+def load_source(path: str) -> PdfSource:
+    """Read a PDF from disk"""
+    try:
+        return source_from_path(path)
+    except OSError as e:
+        raise ManifestError(f"Cannot read {path}: {e.strerror}") from e
+
+
+def load_manifest(path: str, load: Callable[[str], PdfSource] = load_source) -> MergeJob:
+    """Load a merge job from a JSON manifest.
+
+    File paths are resolved relative to the manifest and opened with
+    `load`, which callers may replace to share sources between manifests.
+    Example::
+
+        {
+            "mother": {"path": "report.pdf", "remove_pages": "1, 3"},
+            "insertions": [
+                {"path": "appendix.pdf", "after_page": 4, "remove_pages": "2-3"}
+            ],
+            "output": "consolidated.pdf"
+        }
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except OSError as e:
+        raise ManifestError(f"Cannot read manifest {path}: {e.strerror}") from e
+    except json.JSONDecodeError as e:
+        raise ManifestError(f"Manifest {path} is not valid JSON: {e}") from e
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(entry, what):
+        if not isinstance(entry, dict) or not isinstance(entry.get('path'), str):
+            raise ManifestError(f"{what} needs a 'path' entry")
+        return load(os.path.join(base_dir, entry['path']))
+
+    def removal(entry, what):
+        pages = entry.get('remove_pages', '')
+        if not isinstance(pages, str):
+            raise ManifestError(f"{what}: 'remove_pages' must be a string such as \"1, 3-5\"")
+        return parse_page_numbers(pages)
+
+    if not isinstance(manifest, dict) or 'mother' not in manifest:
+        raise ManifestError("Manifest needs a 'mother' entry")
+    mother_entry = manifest['mother']
+    if not isinstance(manifest.get('insertions', []), list):
+        raise ManifestError("Manifest 'insertions' must be a list")
+    output = manifest.get('output')
+    if output is not None and not isinstance(output, str):
+        raise ManifestError("Manifest 'output' must be a file path")
+
+    insertions = []
+    for i, entry in enumerate(manifest.get('insertions', [])):
+        source = resolve(entry, f"Insertion #{i + 1}")
+        try:
+            after_page = int(entry['after_page'])
+        except (KeyError, TypeError, ValueError):
+            raise ManifestError(f"Insertion #{i + 1} needs an integer 'after_page'") from None
+        insertions.append(Insertion(source, after_page, removal(entry, f"Insertion #{i + 1}")))
+
+    return MergeJob(
+        mother=resolve(mother_entry, "Mother PDF"),
+        insertions=insertions,
+        mother_remove_pages=removal(mother_entry, "Mother PDF"),
+        output=os.path.join(base_dir, output) if output else None,
+    )
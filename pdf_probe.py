@@ -0,0 +1,355 @@
+"""Cheap metadata probe for PDF uploads.
+
+``probe_pdf`` answers "how many pages, which version, is it encrypted" by
+reading the header, the trailer and the page-tree root only. It follows the
+cross-reference chain (classic tables, xref streams and object streams) to
+locate the catalog and the root /Pages node and reads /Count from there,
+without building a full document model. Anything it does not understand
+falls back to PyMuPDF, which repairs broken cross-reference tables.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from dataclasses import dataclass
+
+import fitz  # PyMuPDF
+
+HEADER_WINDOW = 1024
+TRAILER_WINDOW = 2048
+MAX_XREF_SECTIONS = 64
+
+_HEADER_RE = re.compile(rb'%PDF-(\d\.\d)')
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_OBJ_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_REF_RE = rb'\s*(\d+)\s+(\d+)\s+R'
+_INT_RE = rb'\s*(\d+)'
+
+
+class ProbeError(Exception):
+    """The fast path cannot read this file; the caller falls back"""
+
+
+@dataclass
+class PdfInfo:
+    """What the upload screens need to know about a PDF"""
+    page_count: int
+    size: int
+    encrypted: bool
+    version: str
+    method: str
+
+
+# ============================================================================
+# LOW-LEVEL PARSING
+# ============================================================================
+
+def _dict_span(data, start):
+    """Offsets of the outermost << ... >> beginning at or after `start`"""
+    begin = data.find(b'<<', start)
+    if begin < 0:
+        raise ProbeError("dictionary not found")
+    depth = 0
+    i = begin
+    end = len(data)
+    while i < end - 1:
+        pair = data[i:i + 2]
+        if pair == b'<<':
+            depth += 1
+            i += 2
+        elif pair == b'>>':
+            depth -= 1
+            i += 2
+            if depth == 0:
+                return begin, i
+        else:
+            i += 1
+    raise ProbeError("unterminated dictionary")
+
+
+def _key(name, value_re):
+    return re.compile(rb'/' + name + rb'(?![A-Za-z0-9])' + value_re)
+
+
+def _find_ref(dictionary, name):
+    m = _key(name, _REF_RE).search(dictionary)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def _find_int(dictionary, name):
+    m = _key(name, _INT_RE).search(dictionary)
+    return int(m.group(1)) if m else None
+
+
+def _find_ints(dictionary, name):
+    m = _key(name, rb'\s*\[([\d\s]*)\]').search(dictionary)
+    return [int(x) for x in m.group(1).split()] if m else None
+
+
+def _has_key(dictionary, name):
+    return _key(name, rb'').search(dictionary) is not None
+
+
+def _find_name(dictionary, name):
+    m = _key(name, rb'\s*/([^\s/<>\[\]()]+)').search(dictionary)
+    return m.group(1).decode('latin-1') if m else None
+
+
+def _read_stream(data, dictionary, dict_end):
+    """Decoded payload of a stream object whose dictionary ends at `dict_end`"""
+    m = re.compile(rb'\s*stream\r?\n').match(data, dict_end)
+    if not m:
+        raise ProbeError("stream keyword not found")
+    start = m.end()
+    length = _find_int(dictionary, b'Length')
+    if length is None or _find_ref(dictionary, b'Length'):
+        length = data.find(b'endstream', start) - start
+        if length < 0:
+            raise ProbeError("endstream not found")
+    raw = bytes(data[start:start + length])
+
+    m = re.search(rb'/Filter\s*(\[[^\]]*\]|/\w+)', dictionary)
+    filters = re.findall(rb'/(\w+)', m.group(1)) if m else []
+    if filters not in ([], [b'FlateDecode']):
+        raise ProbeError("unsupported stream filter")
+    if filters:
+        try:
+            raw = zlib.decompressobj().decompress(raw)
+        except zlib.error as e:
+            raise ProbeError(f"bad Flate data: {e}") from e
+
+    predictor = _find_int(dictionary, b'Predictor') or 1
+    if predictor >= 10:
+        raw = _undo_png_predictor(raw, _find_int(dictionary, b'Columns') or 1)
+    elif predictor != 1:
+        raise ProbeError("unsupported predictor")
+    return raw
+
+
+def _undo_png_predictor(raw, columns):
+    """Reverse the PNG row filters used by xref streams (one byte per sample)"""
+    row_len = columns + 1
+    prev = bytearray(columns)
+    out = bytearray()
+    for r in range(0, len(raw) - row_len + 1, row_len):
+        kind = raw[r]
+        row = bytearray(raw[r + 1:r + row_len])
+        for i in range(columns):
+            left = row[i - 1] if i else 0
+            up = prev[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                upleft = prev[i - 1] if i else 0
+                p = left + up - upleft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upleft)
+                pred = left if pa <= pb and pa <= pc else (up if pb <= pc else upleft)
+                row[i] = (row[i] + pred) & 0xFF
+            elif kind != 0:
+                raise ProbeError("unknown PNG predictor row type")
+        out += row
+        prev = row
+    return bytes(out)
+
+
+# ============================================================================
+# CROSS-REFERENCE RESOLUTION
+# ============================================================================
+
+class _XRef:
+    """Object locations gathered from the trailer chain, newest first"""
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = {}       # objnum -> byte offset
+        self.compressed = {}    # objnum -> (object stream number, index)
+        self.trailer = None     # newest trailer dictionary
+        self.encrypted = False
+
+    def load(self, offset):
+        seen = set()
+        while offset is not None and offset not in seen:
+            if len(seen) >= MAX_XREF_SECTIONS:
+                raise ProbeError("xref chain too long")
+            seen.add(offset)
+            if self.data[offset:offset + 4] == b'xref':
+                trailer = self._load_table(offset)
+            else:
+                trailer = self._load_stream(offset)
+            if self.trailer is None:
+                self.trailer = trailer
+            if _has_key(trailer, b'Encrypt'):
+                self.encrypted = True
+            if _has_key(trailer, b'XRefStm'):
+                raise ProbeError("hybrid-reference files are left to PyMuPDF")
+            offset = _find_int(trailer, b'Prev')
+
+    def _record(self, table, objnum, value):
+        # Sections are read newest first, so the first entry seen wins
+        if objnum not in self.offsets and objnum not in self.compressed:
+            table[objnum] = value
+
+    def _load_table(self, offset):
+        pos = offset + 4
+        data = self.data
+        header = re.compile(rb'\s*(\d+)\s+(\d+)\s*?[\r\n]')
+        entry = re.compile(rb'\s*(\d{10})\s+(\d{5})\s+([nf])')
+        while True:
+            m = header.match(data, pos)
+            if not m:
+                break
+            first, count = int(m.group(1)), int(m.group(2))
+            pos = m.end()
+            for objnum in range(first, first + count):
+                e = entry.match(data, pos)
+                if not e:
+                    raise ProbeError("malformed xref entry")
+                pos = e.end()
+                if e.group(3) == b'n':
+                    self._record(self.offsets, objnum, int(e.group(1)))
+        m = re.compile(rb'\s*trailer').match(data, pos)
+        if not m:
+            raise ProbeError("trailer not found")
+        begin, end = _dict_span(data, m.end())
+        return bytes(data[begin:end])
+
+    def _load_stream(self, offset):
+        if not _OBJ_RE.match(self.data, offset):
+            raise ProbeError("startxref does not point at an xref section")
+        begin, end = _dict_span(self.data, offset)
+        dictionary = bytes(self.data[begin:end])
+        if _find_name(dictionary, b'Type') != 'XRef':
+            raise ProbeError("object at startxref is not an xref stream")
+        widths = _find_ints(dictionary, b'W')
+        size = _find_int(dictionary, b'Size')
+        if not widths or len(widths) != 3 or size is None:
+            raise ProbeError("xref stream lacks /W or /Size")
+        index = _find_ints(dictionary, b'Index') or [0, size]
+        payload = _read_stream(self.data, dictionary, end)
+
+        w0, w1, w2 = widths
+        row = w0 + w1 + w2
+        pos = 0
+        for start, count in zip(index[0::2], index[1::2]):
+            for objnum in range(start, start + count):
+                if pos + row > len(payload):
+                    raise ProbeError("xref stream truncated")
+                kind = int.from_bytes(payload[pos:pos + w0], 'big') if w0 else 1
+                f1 = int.from_bytes(payload[pos + w0:pos + w0 + w1], 'big')
+                f2 = int.from_bytes(payload[pos + w0 + w1:pos + row], 'big')
+                pos += row
+                if kind == 1:
+                    self._record(self.offsets, objnum, f1)
+                elif kind == 2:
+                    self._record(self.compressed, objnum, (f1, f2))
+        return dictionary
+
+    def object_dict(self, ref):
+        """The dictionary of indirect object `ref`"""
+        objnum = ref[0]
+        if objnum in self.offsets:
+            offset = self.offsets[objnum]
+            m = _OBJ_RE.match(self.data, offset)
+            if not m or int(m.group(1)) != objnum:
+                raise ProbeError(f"xref offset for object {objnum} is wrong")
+            begin, end = _dict_span(self.data, m.end())
+            return bytes(self.data[begin:end])
+        if objnum in self.compressed:
+            if self.encrypted:
+                raise ProbeError("object streams of encrypted files are left to PyMuPDF")
+            return self._compressed_dict(objnum, *self.compressed[objnum])
+        raise ProbeError(f"object {objnum} is not in the xref")
+
+    def _compressed_dict(self, objnum, stream_num, index):
+        offset = self.offsets.get(stream_num)
+        if offset is None:
+            raise ProbeError("object stream not found")
+        begin, end = _dict_span(self.data, offset)
+        dictionary = bytes(self.data[begin:end])
+        first, count = _find_int(dictionary, b'First'), _find_int(dictionary, b'N')
+        if first is None or count is None or index >= count:
+            raise ProbeError("malformed object stream")
+        payload = _read_stream(self.data, dictionary, end)
+        header = payload[:first].split()
+        if int(header[2 * index]) != objnum:
+            raise ProbeError("object stream index mismatch")
+        start = first + int(header[2 * index + 1])
+        begin, end = _dict_span(payload, start)
+        return payload[begin:end]
+
+
+# ============================================================================
+# PUBLIC API
+# ============================================================================
+
+def _fast_probe(data):
+    header = _HEADER_RE.search(bytes(data[:HEADER_WINDOW]))
+    if not header:
+        raise ProbeError("not a PDF")
+    version = header.group(1).decode()
+
+    tail_start = max(0, len(data) - TRAILER_WINDOW)
+    matches = list(_STARTXREF_RE.finditer(bytes(data[tail_start:])))
+    if not matches:
+        raise ProbeError("startxref not found")
+    xref = _XRef(data)
+    xref.load(int(matches[-1].group(1)))
+
+    root_ref = _find_ref(xref.trailer, b'Root')
+    if root_ref is None:
+        raise ProbeError("trailer has no /Root")
+    catalog = xref.object_dict(root_ref)
+    pages_ref = _find_ref(catalog, b'Pages')
+    if pages_ref is None:
+        raise ProbeError("catalog has no /Pages")
+    pages = xref.object_dict(pages_ref)
+    count = None if _find_ref(pages, b'Count') else _find_int(pages, b'Count')
+    if _find_name(pages, b'Type') != 'Pages' or count is None:
+        raise ProbeError("page tree root has no /Count")
+
+    # A catalog /Version overrides the header when it is newer
+    catalog_version = _find_name(catalog, b'Version')
+    if catalog_version and re.fullmatch(r'\d\.\d', catalog_version) and catalog_version > version:
+        version = catalog_version
+
+    return PdfInfo(page_count=count, size=len(data), encrypted=xref.encrypted, version=version, method='trailer')
+
+
+def _fitz_probe(data, path):
+    if path is not None:
+        doc = fitz.open(path, filetype="pdf")
+    else:
+        doc = fitz.open(stream=data if isinstance(data, (bytes, bytearray)) else bytes(data), filetype="pdf")
+    with doc:
+        # Metadata is unavailable until a password-protected file is opened
+        metadata = doc.metadata or {}
+        header = _HEADER_RE.search(bytes(data[:HEADER_WINDOW]))
+        version = (metadata.get('format') or '').replace('PDF ', '')
+        return PdfInfo(
+            page_count=doc.page_count,
+            size=len(data),
+            encrypted=bool(doc.needs_pass or metadata.get('encryption')),
+            version=version or (header.group(1).decode() if header else 'unknown'),
+            method='pymupdf',
+        )
+
+
+def probe_pdf(data, path=None) -> PdfInfo:
+    """Page count, size, encryption flag and version of a PDF.
+
+    `data` may be bytes or a memory map; pass the file's `path` as well when
+    there is one so the fallback can open it without copying. Raises
+    ValueError when neither the fast path nor PyMuPDF can read it.
+    """
+    try:
+        return _fast_probe(data)
+    except (ProbeError, ValueError, IndexError):
+        pass
+    try:
+        return _fitz_probe(data, path)
+    except Exception as e:
+        raise ValueError(f"Could not read PDF: {e}") from e
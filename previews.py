@@ -0,0 +1,66 @@
+"""On-demand page thumbnails.
+
+Pages are rendered one at a time with PyMuPDF, converted from raw pixmap
+samples straight into PIL images, and kept in a process-wide LRU keyed by
+(document hash, page, zoom) so scrolling back over a document is free.
+Rendering borrows a parsed document of its own, so a preview never waits
+for a merge holding the engine's copy of the same file.
+"""
+import os
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from doc_cache import DocumentCache, document_cache
+from pdf_engine import FITZ_COST_FACTOR, FITZ_PATH_COST_FACTOR, PdfReadError, open_fitz
+
+THUMBNAIL_ZOOM = 0.4
+PLACEHOLDER_SIZE = (150, 200)
+
+thumbnail_cache = DocumentCache(int(os.environ.get("PDF_THUMBNAIL_CACHE_MB", "128")) * 1024 * 1024)
+
+
+def pixmap_to_image(pix):
+    """Wrap a pixmap's samples in a PIL image without a PNG round trip"""
+    modes = {(1, False): "L", (3, False): "RGB", (2, True): "LA", (4, True): "RGBA"}
+    return Image.frombytes(modes[pix.n, bool(pix.alpha)], (pix.width, pix.height), pix.samples)
+
+
+def image_cost(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def preview_fitz(source):
+    """Borrow the PyMuPDF document used for previews of a source (use as a context manager)"""
+    return document_cache.lease(
+        ('fitz-preview', source.content_hash()),
+        lambda: open_fitz(source.data, source.path),
+        int(source.size * (FITZ_PATH_COST_FACTOR if source.path else FITZ_COST_FACTOR)),
+    )
+
+
+def render_thumbnail(source, page_index, zoom=THUMBNAIL_ZOOM):
+    """Render one zero-based page of a source, cached across sessions"""
+    def render():
+        with preview_fitz(source) as doc:
+            pix = doc[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+            return pixmap_to_image(pix)
+
+    with thumbnail_cache.lease((source.content_hash(), page_index, zoom), render, image_cost) as image:
+        return image
+
+
+def render_thumbnails(source, page_indices, zoom=THUMBNAIL_ZOOM):
+    """Yield (page index, image) for each requested page as it is rendered.
+
+    Pages that fail to render are replaced by a grey placeholder so one bad
+    page does not hide the rest. Raises PdfReadError if the document itself
+    cannot be opened.
+    """
+    for page_index in page_indices:
+        try:
+            yield page_index, render_thumbnail(source, page_index, zoom)
+        except PdfReadError:
+            raise
+        except Exception:
+            yield page_index, Image.new('RGB', PLACEHOLDER_SIZE, color='lightgray')
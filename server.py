@@ -0,0 +1,535 @@
+"""HTTP service exposing the merge and page-removal engine to other programs.
+
+Usage::
+
+    python server.py [--host 127.0.0.1] [--port 8502] [-j WORKERS] [--max-queue N]
+                     [--max-request-mb MB] [--timeout SECONDS]
+
+Endpoints:
+
+``POST /merge``
+    ``multipart/form-data`` with one file part per PDF and a ``manifest``
+    field in the format of ``pdf_engine.load_manifest``, whose paths name
+    the file parts::
+
+        {"mother": {"path": "report", "remove_pages": "1"},
+         "insertions": [{"path": "appendix", "after_page": 4}]}
+
+``POST /remove?pages=2-4,last``
+    The PDF as the raw request body, or ``multipart/form-data`` with a
+    ``file`` part and a ``pages`` field.
+
+``GET /health``
+    Worker count, requests in flight and the queue limit, as JSON.
+
+Both POST endpoints take ``optimize=<profile>`` (merge only) and
+``linearize=1`` query parameters, and answer with the PDF itself, or with
+a JSON error: 422 for a document or manifest that cannot be processed, 504
+past ``--timeout`` and 500 when a worker crashes. Request bodies, fixed-length or chunked, are streamed to a temporary directory and
+never held in memory. The work runs on a pool of worker processes; once
+every worker is busy and ``--max-queue`` more requests are waiting, new
+requests get 429 with a Retry-After header. Clients that send
+"Expect: 100-continue" (curl does for large uploads) hear this before
+uploading anything.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import batch
+import pdf_engine
+
+CHUNK_SIZE = 1024 * 1024
+
+# Worker processes running merges and removals (0 = one per CPU)
+DEFAULT_WORKERS = int(os.environ.get("PDF_SERVER_WORKERS", "0")) or os.cpu_count() or 1
+
+# Requests allowed to wait for a worker before new ones are turned away
+DEFAULT_MAX_QUEUE = int(os.environ.get("PDF_SERVER_MAX_QUEUE", "16"))
+
+# Largest request body accepted, uploads included
+DEFAULT_MAX_REQUEST_BYTES = int(os.environ.get("PDF_SERVER_MAX_REQUEST_MB", "512")) * 1024 * 1024
+
+# Multipart fields that are not files are kept in memory up to this size
+MAX_FIELD_BYTES = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+# Seconds a client is told to wait after a 429
+RETRY_AFTER_SECONDS = 2
+
+
+class RequestError(Exception):
+    """A request that cannot be served; carries the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================================
+# REQUEST BODIES
+# ============================================================================
+
+class LimitedReader:
+    """Body of a request with a Content-Length, raising 413 past the limit"""
+
+    def __init__(self, stream, length, limit):
+        if length > limit:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request body exceeds {limit // (1024 * 1024)} MB")
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size=CHUNK_SIZE):
+        if self.remaining <= 0:
+            return b''
+        data = self.stream.read(min(size, self.remaining))
+        if not data:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Request body ended early")
+        self.remaining -= len(data)
+        return data
+
+
+class ChunkedReader:
+    """Body sent with Transfer-Encoding: chunked, raising 413 past the limit"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.total = 0
+        self.left_in_chunk = 0
+        self.finished = False
+
+    def _next_chunk(self):
+        line = self.stream.readline(1024)
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed chunked body") from None
+        if size == 0:
+            # Skip any trailer headers up to the final blank line
+            while self.stream.readline(1024) not in (b"\r\n", b"\n", b""):
+                pass
+            self.finished = True
+        self.left_in_chunk = size
+
+    def read(self, size=CHUNK_SIZE):
+        if self.finished:
+            return b''
+        if self.left_in_chunk == 0:
+            self._next_chunk()
+            if self.finished:
+                return b''
+        data = self.stream.read(min(size, self.left_in_chunk))
+        if not data:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Request body ended early")
+        self.left_in_chunk -= len(data)
+        self.total += len(data)
+        if self.total > self.limit:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                               f"Request body exceeds {self.limit // (1024 * 1024)} MB")
+        if self.left_in_chunk == 0:
+            self.stream.readline(16)  # CRLF after the chunk data
+        return data
+
+
+def save_body(reader, path):
+    """Stream a request body into a file; returns its size"""
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in iter(reader.read, b''):
+            f.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def header_parameter(value, name):
+    """Parameter of a header value, e.g. the boundary of a Content-Type"""
+    match = re.search(rf'{name}="([^"]*)"|{name}=([^;\s]+)', value, re.IGNORECASE)
+    return (match.group(1) if match.group(1) is not None else match.group(2)) if match else None
+
+
+def safe_name(name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)[:100] or "part"
+
+
+def parse_multipart(reader, boundary, directory):
+    """Stream a multipart/form-data body apart.
+
+    File parts are written to `directory`, named after their (sanitized)
+    field names with an ``upload_`` prefix; other fields are returned as text. Returns (fields, files)
+    where `files` maps field names to paths.
+    """
+    delimiter = b"\r\n--" + boundary.encode('latin-1')
+    # A leading CRLF lets the first boundary match the same delimiter as the rest
+    buffer = b"\r\n"
+    fields, files = {}, {}
+
+    def fill():
+        nonlocal buffer
+        data = reader.read(CHUNK_SIZE)
+        buffer += data
+        return bool(data)
+
+    # Skip the preamble
+    while delimiter not in buffer:
+        buffer = buffer[-len(delimiter):]
+        if not fill():
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Multipart body has no parts")
+    buffer = buffer[buffer.index(delimiter) + len(delimiter):]
+
+    while True:
+        while len(buffer) < 2:
+            if not fill():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Multipart body ended early")
+        if buffer.startswith(b"--"):
+            return fields, files
+
+        while b"\r\n\r\n" not in buffer:
+            if len(buffer) > MAX_HEADER_BYTES or not fill():
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed multipart part headers")
+        head, buffer = buffer.split(b"\r\n\r\n", 1)
+        headers = {}
+        for line in head.decode('utf-8', 'replace').split("\r\n"):
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        disposition = headers.get("content-disposition", "")
+        name = header_parameter(disposition, "name")
+        if not name:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Multipart part without a field name")
+        is_file = header_parameter(disposition, "filename") is not None
+
+        out = open(os.path.join(directory, "upload_" + safe_name(name)), 'wb') if is_file else None
+        value = bytearray()
+        try:
+            while True:
+                end = buffer.find(delimiter)
+                # Keep a delimiter's length back in case it straddles two reads
+                ready = end if end >= 0 else max(0, len(buffer) - len(delimiter))
+                if out is not None:
+                    out.write(buffer[:ready])
+                else:
+                    value += buffer[:ready]
+                    if len(value) > MAX_FIELD_BYTES:
+                        raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Field {name!r} is too large")
+                if end >= 0:
+                    buffer = buffer[end + len(delimiter):]
+                    break
+                buffer = buffer[ready:]
+                if not fill():
+                    raise RequestError(HTTPStatus.BAD_REQUEST, "Multipart body ended early")
+        finally:
+            if out is not None:
+                out.close()
+        if is_file:
+            files[name] = out.name
+        else:
+            fields[name] = value.decode('utf-8', 'replace')
+
+
+# ============================================================================
+# WORKER SIDE
+# ============================================================================
+
+def remove_file(path, pages, output, linearize=False, timeout=batch.DEFAULT_TIMEOUT):
+    """Delete pages from one uploaded PDF; runs in a worker process and never raises"""
+    started = time.perf_counter()
+
+    def progress(stage, done, total):
+        if timeout and time.perf_counter() - started > timeout:
+            raise batch.JobTimedOut(f"Stopped after {timeout:g}s while {stage.lower()}")
+
+    try:
+        source = pdf_engine.source_from_path(path)
+        result = pdf_engine.delete_pages(source, pdf_engine.parse_page_numbers(pages), output,
+                                         progress=progress, linearize=linearize)
+        row = {'status': batch.DONE, 'output': output, 'pages': result.page_count, 'size': result.size}
+    except batch.JobTimedOut as e:
+        row = {'status': batch.TIMED_OUT, 'error': str(e)}
+    except (pdf_engine.PdfEngineError, OSError) as e:
+        row = {'status': batch.FAILED, 'error': str(e)}
+    except Exception as e:
+        row = {'status': batch.FAILED, 'error': f"{type(e).__name__}: {e}"}
+    row['seconds'] = round(time.perf_counter() - started, 4)
+    return row
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class MergeService:
+    """Worker pool plus the count of requests it has admitted"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE,
+                 max_request_bytes=DEFAULT_MAX_REQUEST_BYTES, timeout=batch.DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_request_bytes = max_request_bytes
+        self.timeout = timeout
+        self.pool = batch.WorkerPool(workers)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+
+    def admit(self):
+        """Reserve room for a request, or False when the queue is full"""
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.served += 1
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'max_queue': self.max_queue, 'in_flight': self.in_flight,
+                    'served': self.served, 'rejected': self.rejected}
+
+    def run(self, fn, *args):
+        """Run `fn` on a worker and wait for its result row.
+
+        A job still running `batch.KILL_GRACE_SECONDS` after its timeout has
+        its worker killed (504); a worker that dies, say out of memory or in
+        a MuPDF crash, answers 500. Only that worker is replaced.
+        """
+        deadline = self.timeout + batch.KILL_GRACE_SECONDS if self.timeout else None
+        try:
+            return self.pool.run(deadline, fn, *args)
+        except batch.WorkerKilled as e:
+            raise RequestError(HTTPStatus.GATEWAY_TIMEOUT, str(e)) from e
+        except batch.WorkerFailed as e:
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Worker process failed: {e}") from e
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "PDFToolsHub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def send_json(self, status, payload, **headers):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_pdf(self, row):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(os.path.getsize(row['output'])))
+        self.send_header("X-Page-Count", str(row['pages']))
+        self.send_header("X-Processing-Seconds", str(row['seconds']))
+        self.end_headers()
+        with open(row['output'], 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+    def body_reader(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            return ChunkedReader(self.rfile, self.service.max_request_bytes)
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise RequestError(HTTPStatus.LENGTH_REQUIRED, "Send a Content-Length or a chunked body") from None
+        return LimitedReader(self.rfile, length, self.service.max_request_bytes)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/health":
+            self.send_json(HTTPStatus.OK, self.service.stats())
+        else:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': "Not found"})
+
+    def handle_expect_100(self):
+        """Turn away a request sent with "Expect: 100-continue" before its body is uploaded"""
+        if urlsplit(self.path).path in ("/merge", "/remove"):
+            self.admitted = self.service.admit()
+            if not self.admitted:
+                self.reject_busy()
+                return False
+        return super().handle_expect_100()
+
+    def reject_busy(self):
+        self.close_connection = True
+        self.send_json(HTTPStatus.TOO_MANY_REQUESTS, {'error': "Server busy, retry later"},
+                       Retry_After=RETRY_AFTER_SECONDS, Connection="close")
+
+    def discard_body(self):
+        """Read and drop a body that will not be processed.
+
+        Closing a socket with unread data resets the connection, and most
+        clients lose the response when that happens mid-upload.
+        """
+        try:
+            reader = self.body_reader()
+            while reader.read():
+                pass
+        except (RequestError, OSError):
+            pass
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        handlers = {"/merge": self.handle_merge, "/remove": self.handle_remove}
+        admitted, self.admitted = getattr(self, 'admitted', False), False
+        if url.path not in handlers:
+            self.close_connection = True
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': "Not found"}, Connection="close")
+            return
+        if not admitted and not self.service.admit():
+            self.reject_busy()
+            self.discard_body()
+            return
+
+        try:
+            with tempfile.TemporaryDirectory(prefix="pdf_server_") as directory:
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                row = handlers[url.path](self.body_reader(), directory, query)
+                if row['status'] == batch.DONE:
+                    self.send_pdf(row)
+                else:
+                    # Clients have no use for the server's temporary paths
+                    error = row['error'].replace(directory + os.sep, "")
+                    status = HTTPStatus.GATEWAY_TIMEOUT if row['status'] == batch.TIMED_OUT \
+                        else HTTPStatus.UNPROCESSABLE_ENTITY
+                    self.send_json(status, {'error': error})
+        except RequestError as e:
+            self.close_connection = True
+            self.send_json(e.status, {'error': str(e)}, Connection="close")
+        except (pdf_engine.PdfEngineError, json.JSONDecodeError) as e:
+            self.close_connection = True
+            self.send_json(HTTPStatus.BAD_REQUEST, {'error': str(e)}, Connection="close")
+        except Exception as e:
+            # A bug must still get the client an answer rather than a dropped connection
+            self.log_error("Unhandled error in %s: %r\n%s", url.path, e, traceback.format_exc())
+            self.close_connection = True
+            try:
+                self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"},
+                               Connection="close")
+            except OSError:
+                pass
+        finally:
+            self.service.release()
+
+    def read_form(self, reader, directory):
+        content_type = self.headers.get("Content-Type", "")
+        boundary = header_parameter(content_type, "boundary")
+        if not content_type.lower().startswith("multipart/form-data") or not boundary:
+            raise RequestError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Expected multipart/form-data")
+        return parse_multipart(reader, boundary, directory)
+
+    def handle_merge(self, reader, directory, query):
+        fields, files = self.read_form(reader, directory)
+        if 'manifest' not in fields:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Missing 'manifest' field")
+        manifest = json.loads(fields['manifest'])
+        if not isinstance(manifest, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "The manifest must be a JSON object")
+
+        insertions = manifest.get('insertions') or []
+        if not isinstance(insertions, list):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "The manifest's 'insertions' must be a list")
+
+        # Paths may only name uploaded parts, never files on the server
+        for entry in [manifest.get('mother')] + insertions:
+            if not isinstance(entry, dict) or not isinstance(entry.get('path'), str) or entry['path'] not in files:
+                raise RequestError(HTTPStatus.BAD_REQUEST,
+                                   f"Manifest paths must name uploaded file parts ({', '.join(files) or 'none sent'})")
+            entry['path'] = os.path.basename(files[entry['path']])
+        manifest['output'] = "merged.pdf"
+        manifest_path = os.path.join(directory, "manifest.json")
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        profile = query.get('optimize')
+        if profile is not None and profile not in pdf_engine.OPTIMIZATION_PROFILES:
+            raise RequestError(HTTPStatus.BAD_REQUEST,
+                               f"Unknown optimization profile (choose from {', '.join(pdf_engine.OPTIMIZATION_PROFILES)})")
+        options = {'profile': profile, 'linearize': query.get('linearize') == "1"}
+        return self.service.run(batch.run_manifest, manifest_path, None, self.service.timeout, options, False)
+
+    def handle_remove(self, reader, directory, query):
+        if self.headers.get("Content-Type", "").lower().startswith("multipart/form-data"):
+            fields, files = self.read_form(reader, directory)
+            if 'file' not in files:
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Missing 'file' part")
+            path, pages = files['file'], fields.get('pages', query.get('pages', ""))
+        else:
+            path, pages = os.path.join(directory, "input.pdf"), query.get('pages', "")
+            save_body(reader, path)
+        if not pages:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Say which pages to remove with 'pages'")
+        output = os.path.join(directory, "output.pdf")
+        return self.service.run(remove_file, path, pages, output, query.get('linearize') == "1", self.service.timeout)
+
+
+def make_server(host, port, service, quiet=False):
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.service = service
+    server.quiet = quiet
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="server.py", description="PDF Tools Hub HTTP merge service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502, help="0 picks a free port")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes (default: PDF_SERVER_WORKERS or one per CPU)")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="requests that may wait for a worker before 429s (default: PDF_SERVER_MAX_QUEUE or 16)")
+    parser.add_argument("--max-request-mb", type=int, default=DEFAULT_MAX_REQUEST_BYTES // (1024 * 1024),
+                        help="largest request body (default: PDF_SERVER_MAX_REQUEST_MB or 512)")
+    parser.add_argument("--timeout", type=float, default=batch.DEFAULT_TIMEOUT,
+                        help="seconds per merge or removal, 0 for no limit "
+                             "(default: PDF_BATCH_TIMEOUT_SECONDS or 600)")
+    parser.add_argument("--quiet", action="store_true", help="do not log each request")
+    args = parser.parse_args(argv)
+
+    service = MergeService(args.workers, args.max_queue, args.max_request_mb * 1024 * 1024, args.timeout)
+    server = make_server(args.host, args.port, service, args.quiet)
+    host, port = server.server_address[:2]
+    # Let `kill` shut the worker pool down as Ctrl+C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on http://{host}:{port} with {args.workers} worker(s)", flush=True)
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
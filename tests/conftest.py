@@ -0,0 +1,32 @@
+import os
+import sys
+
+import fitz
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pdf_bytes(pages, label):
+    """A PDF whose page i reads "<label><i>", 1-based"""
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label}{i + 1}")
+    return doc.tobytes()
+
+
+def page_texts(path):
+    with fitz.open(path) as doc:
+        return [page.get_text().strip() for page in doc]
+
+
+@pytest.fixture
+def make_source(tmp_path):
+    """Write a labelled PDF into the test directory and return it as a PdfSource"""
+    import pdf_engine
+
+    def make(pages, label):
+        path = tmp_path / f"{label}.pdf"
+        path.write_bytes(pdf_bytes(pages, label))
+        return pdf_engine.source_from_path(str(path))
+    return make
@@ -0,0 +1,26 @@
+import io
+import os
+
+import pytest
+
+import blob_store
+
+
+def test_trimmed_copies_count_against_the_quota_and_give_way_to_uploads(tmp_path):
+    store = blob_store.BlobStore(str(tmp_path), session_quota=1000)
+    store.put("s", "a.pdf", io.BytesIO(b"a" * 400))
+    prepared = store.prepared_dir("s")
+    os.makedirs(prepared)
+    for i, name in enumerate(["old.pdf", "new.pdf"]):
+        with open(os.path.join(prepared, name), 'wb') as f:
+            f.write(b"p" * 300)
+        os.utime(os.path.join(prepared, name), (i, i))
+    assert store.usage("s") == 1000
+
+    # The upload fits next to the other upload; the least recently used copy makes room
+    store.put("s", "b.pdf", io.BytesIO(b"b" * 300))
+    assert sorted(os.listdir(prepared)) == ["new.pdf"]
+    assert store.usage("s") == 1000
+
+    with pytest.raises(blob_store.QuotaExceeded):
+        store.put("s", "c.pdf", io.BytesIO(b"c" * 301))
@@ -0,0 +1,73 @@
+import fitz
+import pytest
+
+import pdf_engine
+from conftest import page_texts
+
+
+def first_revision(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data[:data.index(b"%%EOF") + len(b"%%EOF")]
+
+
+def test_update_that_adds_pages_is_incremental(make_source, tmp_path):
+    mother, insert = make_source(6, "M"), make_source(3, "A")
+    first = pdf_engine.merge_pdfs(pdf_engine.MergeJob(mother, []), str(tmp_path / "one.pdf"))
+    second = pdf_engine.merge_pdfs(pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 6)]),
+                                   str(tmp_path / "two.pdf"), base=first.base)
+
+    assert second.reused_pages == 6
+    assert page_texts(second.path) == ["M1", "M2", "M3", "M4", "M5", "M6", "A1", "A2", "A3"]
+
+
+def test_update_that_removes_pages_keeps_no_earlier_revision(make_source, tmp_path):
+    mother, insert = make_source(6, "SECRETM"), make_source(40, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 2)])
+    first = pdf_engine.merge_pdfs(job, str(tmp_path / "one.pdf"))
+    job.mother_remove_pages = pdf_engine.parse_page_numbers("5")
+    second = pdf_engine.merge_pdfs(job, str(tmp_path / "two.pdf"), base=first.base)
+
+    assert second.reused_pages == 45
+    assert "SECRETM5" not in page_texts(second.path)
+    with fitz.open("pdf", first_revision(second.path)) as doc:
+        assert not any("SECRETM5" in page.get_text() for page in doc)
+
+
+def test_large_file_merge_drops_removed_pages(make_source, tmp_path):
+    mother, insert = make_source(30, "SECRETM"), make_source(2, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 1)], pdf_engine.parse_page_numbers("5"))
+    result = pdf_engine.merge_pdfs(job, str(tmp_path / "merged.pdf"), large_file=True)
+
+    assert result.large_file
+    assert page_texts(result.path)[:4] == ["SECRETM1", "A1", "A2", "SECRETM2"]
+    with open(result.path, 'rb') as f:
+        assert f.read().count(b"%%EOF") == 1
+    with fitz.open("pdf", first_revision(result.path)) as doc:
+        assert not any("SECRETM5" in page.get_text() for page in doc)
+
+
+def apply_edits(old, new, edits):
+    pages = list(old)
+    for position, deleted, start, end in edits:
+        pages[position:position + deleted] = new[start:end]
+    return pages
+
+
+@pytest.mark.parametrize("old, new", [
+    ("abcdef", "abcdef"),
+    ("abcdef", "abXcdefY"),
+    ("abcdef", "bcf"),
+    ("abcdef", "aXdeYYf"),
+    ("abcdef", "fabcde"),
+    ("", "abc"),
+    ("abc", ""),
+])
+def test_page_edits_turn_the_old_pages_into_the_new(old, new):
+    old = [("d1" if page.islower() else "d2", ord(page)) for page in old]
+    new = [("d1" if page.islower() else "d2", ord(page)) for page in new]
+    edits = pdf_engine.page_edits(old, new)
+
+    assert apply_edits(old, new, edits) == new
+    if old == new:
+        assert edits == []
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+import pdf_engine
+
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / "job.json"
+    path.write_text(json.dumps(manifest))
+    return str(path)
+
+
+def test_manifest_paths_are_relative_to_the_manifest(make_source, tmp_path):
+    make_source(3, "M")
+    make_source(2, "A")
+    job = pdf_engine.load_manifest(write_manifest(tmp_path, {
+        'mother': {'path': "M.pdf", 'remove_pages': "2"},
+        'insertions': [{'path': "A.pdf", 'after_page': 1, 'remove_pages': "last"}],
+        'output': "out.pdf",
+    }))
+
+    assert job.mother.name == "M.pdf"
+    assert job.insertions[0].after_page == 1
+    assert list(job.insertions[0].remove_pages.resolve(2)) == [2]
+    assert job.output == str(tmp_path / "out.pdf")
+
+
+@pytest.mark.parametrize("manifest", [
+    [],
+    {'mother': {'path': "M.pdf", 'remove_pages': 3}},
+    {'mother': {'path': "M.pdf"}, 'insertions': [{'path': "M.pdf", 'after_page': 1, 'remove_pages': [1]}]},
+    {'mother': {'path': 7}},
+    {'mother': {'path': "M.pdf"}, 'insertions': [{'path': "M.pdf"}]},
+    {'mother': {'path': "M.pdf"}, 'insertions': 5},
+    {'mother': {'path': "M.pdf"}, 'output': 3},
+])
+def test_malformed_manifests_raise_manifest_error(make_source, tmp_path, manifest):
+    make_source(3, "M")
+    with pytest.raises(pdf_engine.ManifestError):
+        pdf_engine.load_manifest(write_manifest(tmp_path, manifest))
@@ -0,0 +1,29 @@
+import pytest
+
+import pdf_engine
+
+
+def test_insertions_follow_the_trimmed_mother(make_source):
+    mother, insert = make_source(4, "M"), make_source(2, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 2)], pdf_engine.parse_page_numbers("1"))
+    plan = pdf_engine.build_merge_plan(job.mother, job.insertions, job.mother_remove_pages)
+
+    assert [(segment.source.name, segment.page_indices) for segment in plan] == [
+        ("M.pdf", [1, 2]), ("A.pdf", [0, 1]), ("M.pdf", [3])]
+
+
+@pytest.mark.parametrize("backend", ["pypdf", "pymupdf"])
+def test_merge_with_no_pages_left_is_rejected(make_source, tmp_path, backend):
+    mother, insert = make_source(2, "M"), make_source(1, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 1, pdf_engine.parse_page_numbers("1"))],
+                              pdf_engine.parse_page_numbers("1-2"))
+
+    with pytest.raises(pdf_engine.PageSelectionError):
+        pdf_engine.merge_pdfs(job, str(tmp_path / "merged.pdf"), backend=backend)
+
+
+@pytest.mark.parametrize("backend", ["pypdf", "pymupdf"])
+def test_backends_reject_an_empty_plan(make_source, tmp_path, backend):
+    plan = [pdf_engine.Segment(make_source(2, "M"), [])]
+    with open(tmp_path / "merged.pdf", 'wb') as f, pytest.raises(pdf_engine.PageSelectionError):
+        pdf_engine.BACKENDS[backend].write_plan(plan, f, pdf_engine.no_progress)
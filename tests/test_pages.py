@@ -0,0 +1,41 @@
+import pytest
+
+import pdf_engine
+
+
+def test_open_range_and_last_resolve_against_the_page_count():
+    pages = pdf_engine.parse_page_numbers("2, 4-5, 9-, last")
+
+    assert str(pages) == "2, 4-5, 9-, last"
+    assert list(pages.resolve(12)) == [2, 4, 5, 9, 10, 11, 12]
+    assert list(pages.resolve(6)) == [2, 4, 5, 6]
+    assert list(pages.resolve(1)) == [1]
+    assert list(pdf_engine.parse_page_numbers("5-").resolve(3)) == []
+
+
+def test_unresolved_selections_cannot_be_counted_or_iterated():
+    for text in ("3-", "last"):
+        pages = pdf_engine.parse_page_numbers(text)
+        assert pages and not pages.is_resolved
+        with pytest.raises(ValueError):
+            len(pages)
+        with pytest.raises(ValueError):
+            list(pages)
+
+
+def test_membership_of_unresolved_selections():
+    open_ended = pdf_engine.parse_page_numbers("2, 5-")
+    assert 2 in open_ended and 5 in open_ended and 1000 in open_ended
+    assert 3 not in open_ended
+
+    with_last = pdf_engine.parse_page_numbers("2, last")
+    assert 2 in with_last
+    with pytest.raises(ValueError):
+        3 in with_last
+    assert 3 not in with_last.resolve(5) and 5 in with_last.resolve(5)
+
+
+def test_overlapping_ranges_are_merged():
+    pages = pdf_engine.parse_page_numbers("7-9, 1-3, 2-5, 6, 12-, 15-20")
+    assert pages.ranges() == [(1, 9)]
+    assert str(pages) == "1-9, 12-"
@@ -0,0 +1,35 @@
+import pdf_engine
+from conftest import page_texts
+
+
+def test_prepared_merge_without_any_mother_page(make_source, tmp_path):
+    mother, insert = make_source(4, "M"), make_source(3, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 2)], pdf_engine.parse_page_numbers("1-last"))
+    result = pdf_engine.merge_pdfs(job, str(tmp_path / "merged.pdf"), prepare_dir=str(tmp_path / "prepared"),
+                                   workers=1)
+
+    assert page_texts(result.path) == ["A1", "A2", "A3"]
+
+
+def test_prepared_insertion_without_any_page_is_skipped(make_source, tmp_path):
+    mother, insert = make_source(2, "M"), make_source(3, "A")
+    job = pdf_engine.MergeJob(mother, [pdf_engine.Insertion(insert, 1, pdf_engine.parse_page_numbers("1-3"))])
+    result = pdf_engine.merge_pdfs(job, str(tmp_path / "merged.pdf"), prepare_dir=str(tmp_path / "prepared"),
+                                   workers=1)
+
+    assert page_texts(result.path) == ["M1", "M2"]
+
+
+def test_concurrent_callers_share_one_pool_of_fixed_size(make_source, tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_engine, "PREPARE_POOL_WORKERS", 4)
+    pool = pdf_engine.prepare_pool()
+    assert list(pdf_engine.pool_map(pow, [(2, n) for n in range(6)], workers=2)) == [1, 2, 4, 8, 16, 32]
+
+    # A merge with a different worker count must not replace the pool under other callers
+    sources = [make_source(3, label) for label in "MABCD"]
+    job = pdf_engine.MergeJob(sources[0], [pdf_engine.Insertion(source, 1, pdf_engine.parse_page_numbers("1"))
+                                           for source in sources[1:]])
+    pdf_engine.merge_pdfs(job, str(tmp_path / "merged.pdf"), prepare_dir=str(tmp_path / "prepared"), workers=3)
+
+    assert pdf_engine.prepare_pool() is pool
+    assert pool.submit(pow, 3, 2).result() == 9
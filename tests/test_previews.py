@@ -0,0 +1,27 @@
+import threading
+
+import pdf_engine
+import previews
+
+
+def test_preview_does_not_wait_for_a_merge_lease(make_source):
+    source = make_source(3, "P")
+    leased, release = threading.Event(), threading.Event()
+
+    def merge_in_progress():
+        with pdf_engine.cached_fitz(source):
+            leased.set()
+            release.wait(10)
+
+    holder = threading.Thread(target=merge_in_progress)
+    holder.start()
+    leased.wait(10)
+    try:
+        rendered = []
+        renderer = threading.Thread(target=lambda: rendered.append(previews.render_thumbnail(source, 1)))
+        renderer.start()
+        renderer.join(5)
+        assert rendered, "preview blocked behind the merge's document lease"
+    finally:
+        release.set()
+        holder.join()
@@ -0,0 +1,54 @@
+import io
+
+import fitz
+import pytest
+
+import pdf_engine
+import pdf_probe
+from conftest import pdf_bytes
+
+
+def test_classic_xref_table():
+    info = pdf_probe.probe_pdf(pdf_bytes(4, "P"))
+    assert (info.page_count, info.encrypted, info.method) == (4, False, "trailer")
+
+
+def test_object_streams():
+    with fitz.open(stream=pdf_bytes(7, "P")) as doc:
+        data = doc.tobytes(garbage=3, use_objstms=1)
+    assert b"/ObjStm" in data
+
+    info = pdf_probe.probe_pdf(data)
+    assert (info.page_count, info.method) == (7, "trailer")
+
+
+def test_linearized_file_with_predicted_xref_streams():
+    pikepdf = pytest.importorskip("pikepdf")
+    with pikepdf.open(io.BytesIO(pdf_bytes(9, "P"))) as pdf:
+        output = io.BytesIO()
+        pdf.save(output, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    data = output.getvalue()
+    assert b"/Linearized" in data[:1024] and b"/Predictor 12" in data
+
+    info = pdf_probe.probe_pdf(data)
+    assert (info.page_count, info.method) == (9, "trailer")
+
+
+@pytest.mark.skipif(pdf_engine.pikepdf is None and pdf_engine.QPDF is None, reason="needs pikepdf or qpdf")
+def test_linearized_output_of_the_engine():
+    info = pdf_probe.probe_pdf(pdf_engine.linearize_bytes(pdf_bytes(3, "P")))
+    assert (info.page_count, info.method) == (3, "trailer")
+
+
+def test_damaged_xref_falls_back_to_pymupdf():
+    data = pdf_bytes(5, "P")
+    offset = data.rindex(b"startxref") + len(b"startxref\n")
+    damaged = data[:offset] + b"12" + data[offset:]
+
+    info = pdf_probe.probe_pdf(damaged)
+    assert (info.page_count, info.method) == (5, "pymupdf")
+
+
+def test_not_a_pdf():
+    with pytest.raises(ValueError):
+        pdf_probe.probe_pdf(b"plain text, no header")
@@ -0,0 +1,26 @@
+import pytest
+
+import pdf_engine
+from conftest import page_texts
+
+
+@pytest.mark.parametrize("backend", ["pypdf", "pymupdf"])
+def test_removal_paths_agree(make_source, tmp_path, backend):
+    source = make_source(5, "P")
+    pages = pdf_engine.parse_page_numbers("2,last")
+
+    result = pdf_engine.delete_pages(source, pages, str(tmp_path / "deleted.pdf"), backend=backend)
+    (tmp_path / "removed.pdf").write_bytes(pdf_engine.remove_pages(source, pages, backend=backend))
+
+    assert (result.pages_before, result.page_count) == (5, 3)
+    assert page_texts(tmp_path / "deleted.pdf") == page_texts(tmp_path / "removed.pdf") == ["P1", "P3", "P4"]
+
+
+@pytest.mark.parametrize("backend", ["pypdf", "pymupdf"])
+def test_removing_every_page_is_rejected(make_source, tmp_path, backend):
+    source = make_source(2, "P")
+    with pytest.raises(pdf_engine.PageSelectionError):
+        pdf_engine.delete_pages(source, pdf_engine.parse_page_numbers("1-"), str(tmp_path / "out.pdf"),
+                                backend=backend)
+    with pytest.raises(pdf_engine.PageSelectionError):
+        pdf_engine.remove_pages(source, pdf_engine.parse_page_numbers("1-"), backend=backend)
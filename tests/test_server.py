@@ -0,0 +1,125 @@
+import http.client
+import io
+import json
+import random
+import threading
+
+import pytest
+
+import server
+
+BOUNDARY = "b0undary"
+
+
+class TrickleReader:
+    """Hands the body out a few bytes at a time, so boundaries straddle reads"""
+
+    def __init__(self, data, seed):
+        self.stream = io.BytesIO(data)
+        self.random = random.Random(seed)
+
+    def read(self, size=server.CHUNK_SIZE):
+        return self.stream.read(min(size, self.random.randint(1, 40)))
+
+
+def multipart(fields, files):
+    parts = [f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+             for name, value in fields.items()]
+    parts += [f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.pdf"\r\n'
+              f'Content-Type: application/pdf\r\n\r\n'.encode() + data + b"\r\n"
+              for name, data in files.items()]
+    return b"preamble\r\n" + b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_multipart_boundaries_split_across_reads(tmp_path, seed):
+    rng = random.Random(seed)
+    # Content that looks like a delimiter up to its last byte
+    files = {f"part{i}": rng.randbytes(rng.randint(0, 3000)) + f"\r\n--{BOUNDARY[:-1]}".encode()
+             for i in range(rng.randint(1, 3))}
+    fields = {'manifest': '{"mother": {"path": "part0"}}', 'pages': "1\r\n2"}
+
+    parsed, paths = server.parse_multipart(TrickleReader(multipart(fields, files), seed), BOUNDARY, str(tmp_path))
+
+    assert parsed == fields
+    assert set(paths) == set(files)
+    for name, data in files.items():
+        with open(paths[name], 'rb') as f:
+            assert f.read() == data
+
+
+def test_multipart_without_closing_boundary_is_rejected(tmp_path):
+    body = multipart({}, {'file': b"%PDF-1.7"})[:-len(f"--{BOUNDARY}--\r\n")]
+    with pytest.raises(server.RequestError):
+        server.parse_multipart(TrickleReader(body, 0), BOUNDARY, str(tmp_path))
+
+
+def chunked(data, sizes):
+    out, position = [], 0
+    for size in sizes:
+        out.append(f"{size:x};ext=1\r\n".encode() + data[position:position + size] + b"\r\n")
+        position += size
+    return b"".join(out) + b"0\r\nX-Trailer: 1\r\n\r\n"
+
+
+def test_chunked_body_is_reassembled():
+    data = random.Random(1).randbytes(5000)
+    reader = server.ChunkedReader(io.BytesIO(chunked(data, [1, 999, 3000, 1000]) + b"NEXT"), limit=10 ** 6)
+
+    received = b"".join(iter(lambda: reader.read(700), b""))
+    assert received == data
+    # The trailer is consumed, so a keep-alive connection can read its next request
+    assert reader.stream.read() == b"NEXT"
+
+
+def test_chunked_body_past_the_limit_is_rejected():
+    reader = server.ChunkedReader(io.BytesIO(chunked(b"x" * 300, [100, 200])), limit=250)
+    with pytest.raises(server.RequestError) as raised:
+        while reader.read():
+            pass
+    assert raised.value.status == server.HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+
+def test_malformed_chunk_size_is_rejected():
+    with pytest.raises(server.RequestError) as raised:
+        server.ChunkedReader(io.BytesIO(b"zz\r\nabc\r\n0\r\n\r\n"), limit=100).read()
+    assert raised.value.status == server.HTTPStatus.BAD_REQUEST
+
+
+@pytest.fixture
+def serve():
+    """A server on a free port with one worker; yields a function posting to it"""
+    service = server.MergeService(workers=1, max_queue=1, timeout=60)
+    httpd = server.make_server("127.0.0.1", 0, service, quiet=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    def post(path, body, content_type):
+        connection = http.client.HTTPConnection(*httpd.server_address[:2], timeout=60)
+        connection.request("POST", path, body, {'Content-Type': content_type})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    yield post
+    httpd.shutdown()
+    httpd.server_close()
+    service.shutdown()
+
+
+@pytest.mark.parametrize("manifest", [
+    {'mother': {'path': "m"}, 'insertions': 5},
+    {'mother': {'path': ["m"]}},
+    {'mother': {'path': "m"}, 'insertions': [{'path': {'m': 1}, 'after_page': 1}]},
+])
+def test_malformed_manifests_answer_400(serve, manifest):
+    body = multipart({'manifest': json.dumps(manifest)}, {'m': b"%PDF-1.7"})
+    status, payload = serve("/merge", body, f"multipart/form-data; boundary={BOUNDARY}")
+    assert status == 400 and payload['error']
+
+
+def test_unexpected_errors_answer_500(serve, monkeypatch):
+    def broken(self, reader, directory, query):
+        raise TypeError("boom")
+    monkeypatch.setattr(server.Handler, "handle_remove", broken)
+
+    status, payload = serve("/remove?pages=1", b"%PDF-1.7", "application/pdf")
+    assert status == 500 and "boom" not in payload['error']
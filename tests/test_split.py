@@ -0,0 +1,23 @@
+import os
+import zipfile
+
+import pdf_engine
+
+
+def test_chunk_names_cannot_leave_the_scratch_directory():
+    for stem in ("../../../tmp/evil", "..", "a/../b", "..\\..\\evil"):
+        for chunk in pdf_engine.split_by_page_count(20, 10, stem):
+            assert "/" not in chunk.name and "\\" not in chunk.name and ".." not in chunk.name
+            assert chunk.name.endswith(".pdf")
+
+
+def test_split_with_a_hostile_stem_writes_only_inside_the_archive(make_source, tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    chunks = pdf_engine.split_by_page_count(4, 2, "../../escaped")
+    pdf_engine.split_pdf(make_source(4, "P"), chunks, str(work / "split.zip"), workers=1)
+
+    assert sorted(os.listdir(work)) == ["split.zip"]
+    assert sorted(os.listdir(tmp_path)) == ["P.pdf", "work"]
+    with zipfile.ZipFile(work / "split.zip") as archive:
+        assert archive.namelist() == ["escaped_001_p1-2.pdf", "escaped_002_p3-4.pdf"]